@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Usuario, Autor, Livro, Categoria, Emprestimo, Reserva
+from .models import Usuario, Autor, Livro, Categoria, Emprestimo, Reserva, FilaEspera, MovimentoEstoque
 
 
 @admin.register(Usuario)
@@ -59,3 +59,29 @@ class ReservaAdmin(admin.ModelAdmin):
     list_filter = ('status', 'data_reserva')
     search_fields = ('usuario__username', 'livro__titulo')
     readonly_fields = ('data_reserva',)
+
+
+@admin.register(FilaEspera)
+class FilaEsperaAdmin(admin.ModelAdmin):
+    list_display = ('livro', 'usuario', 'posicao', 'status', 'data_entrada')
+    list_filter = ('status', 'data_entrada')
+    search_fields = ('usuario__username', 'livro__titulo')
+    readonly_fields = ('data_entrada',)
+
+
+@admin.register(MovimentoEstoque)
+class MovimentoEstoqueAdmin(admin.ModelAdmin):
+    list_display = ('id', 'livro', 'tipo', 'delta', 'data')
+    list_filter = ('tipo', 'data')
+    search_fields = ('livro__titulo',)
+    raw_id_fields = ('livro',)
+
+    # O razão só cresce: nada de criar, alterar ou apagar pelo admin
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,113 @@
+"""
+Aquecimento do processo antes de atender a primeira requisição.
+
+Com ``preload_app`` (gunicorn.conf.py) o processo mestre chama ``aquecer()``
+depois de carregar a aplicação e antes de criar os workers: URLconf, views,
+templates compilados, traduções e metadados dos modelos ficam prontos e são
+herdados pelos workers via fork. A conexão com o banco não pode ser
+herdada, então cada worker abre a sua em ``conectar()`` (hook post_fork).
+"""
+import logging
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.urls import URLPattern, URLResolver, get_resolver, resolve, reverse
+from django.utils import translation
+
+from .registro import registrar_evento
+from .views import ViewPreguicosa
+
+
+logger = logging.getLogger(__name__)
+
+# Valores de exemplo para os conversores de path() usados no reverse()
+_EXEMPLOS_CONVERSORES = {'int': 1, 'str': 'a', 'slug': 'a', 'uuid': '00000000-0000-0000-0000-000000000000', 'path': 'a'}
+
+
+def _padroes(resolver, namespace=''):
+    for padrao in resolver.url_patterns:
+        if isinstance(padrao, URLResolver):
+            filho = f'{namespace}{padrao.namespace}:' if padrao.namespace else namespace
+            yield from _padroes(padrao, filho)
+        elif isinstance(padrao, URLPattern) and padrao.name:
+            yield namespace + padrao.name, padrao
+
+
+def resolver_urls():
+    """Faz reverse() e resolve() de cada URL nomeada e importa a view. Devolve quantas foram resolvidas."""
+    resolvidas = 0
+    for nome, padrao in _padroes(get_resolver()):
+        conversores = getattr(padrao.pattern, 'converters', {})
+        kwargs = {
+            parametro: _EXEMPLOS_CONVERSORES.get(type(conversor).__name__.replace('Converter', '').lower(), 1)
+            for parametro, conversor in conversores.items()
+        }
+        try:
+            match = resolve(reverse(nome, kwargs=kwargs or None))
+            if isinstance(match.func, ViewPreguicosa):
+                # Importa o grupo aqui, no mestre, e não no primeiro request de cada worker
+                match.func.view
+        except Exception:
+            # URLs com regex ou conversores próprios: o resolver já foi
+            # populado pelas outras, então basta seguir
+            continue
+        resolvidas += 1
+    return resolvidas
+
+
+def compilar_templates():
+    """Carrega (e com o loader em cache, compila) todos os templates do projeto."""
+    compilados = 0
+    for engine in engines.all():
+        for diretorio in engine.template_dirs:
+            for raiz, _, arquivos in os.walk(diretorio):
+                for arquivo in arquivos:
+                    if not arquivo.endswith(('.html', '.txt', '.xml')):
+                        continue
+                    nome = os.path.relpath(os.path.join(raiz, arquivo), diretorio).replace(os.sep, '/')
+                    try:
+                        engine.get_template(nome)
+                    except (TemplateDoesNotExist, TemplateSyntaxError):
+                        continue
+                    compilados += 1
+    return compilados
+
+
+def carregar_metadados():
+    """Relações reversas dos modelos, traduções e o manifesto dos estáticos."""
+    for modelo in apps.get_models():
+        modelo._meta.get_fields()
+    translation.activate(settings.LANGUAGE_CODE)
+    translation.gettext('Dashboard')
+    translation.deactivate()
+    # Instanciar o storage lê o manifesto gerado pelo collectstatic
+    from django.contrib.staticfiles.storage import staticfiles_storage
+    staticfiles_storage.location
+
+
+def conectar():
+    """Abre as conexões de banco deste processo e deixa o catálogo no cache de páginas do banco."""
+    for conexao in connections.all():
+        conexao.ensure_connection()
+    from .models import Livro
+    list(Livro.objects.select_related('autor').order_by('titulo').values_list('id', flat=True)[:12])
+
+
+def aquecer():
+    """Aquece o processo e registra quanto tempo cada etapa levou."""
+    etapas = {}
+    inicio = time.perf_counter()
+    etapas['urls'] = resolver_urls()
+    etapas['templates'] = compilar_templates()
+    carregar_metadados()
+    registrar_evento(
+        logger, 'servidor.aquecido',
+        pid=os.getpid(),
+        duracao_ms=round((time.perf_counter() - inicio) * 1000, 1),
+        **etapas,
+    )
+    return etapas
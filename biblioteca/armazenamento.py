@@ -0,0 +1,77 @@
+"""
+Storage dos arquivos estáticos: nomes com hash do conteúdo (manifesto) e
+cópias pré-comprimidas em gzip e, se o pacote ``brotli`` estiver instalado,
+em brotli. O ``ArquivosEstaticosMiddleware`` serve essas cópias.
+"""
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Formatos que já vêm comprimidos (imagens, fontes woff) não ganham nada
+EXTENSOES_COMPRIMIVEIS = (
+    '.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico', '.ttf', '.eot',
+)
+TAMANHO_MINIMO = 256
+
+
+def comprimir_arquivo(caminho):
+    """
+    Grava ``caminho.gz`` (e ``caminho.br``) ao lado do arquivo, só quando a
+    versão comprimida for realmente menor. Devolve as extensões gravadas.
+    """
+    with open(caminho, 'rb') as f:
+        conteudo = f.read()
+    if len(conteudo) < TAMANHO_MINIMO:
+        return []
+
+    variantes = [('.gz', lambda dados: gzip.compress(dados, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variantes.append(('.br', lambda dados: brotli.compress(dados, quality=11)))
+
+    gravadas = []
+    for extensao, comprimir in variantes:
+        comprimido = comprimir(conteudo)
+        # Menos de 5% de ganho não compensa o Content-Encoding
+        if len(comprimido) < len(conteudo) * 0.95:
+            with open(caminho + extensao, 'wb') as f:
+                f.write(comprimido)
+            gravadas.append(extensao)
+    return gravadas
+
+
+class ArmazenamentoEstatico(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        nomes = set(self.hashed_files) | set(self.hashed_files.values())
+        for nome in sorted(nomes):
+            if nome.lower().endswith(EXTENSOES_COMPRIMIVEIS) and self.exists(nome):
+                comprimir_arquivo(self.path(nome))
+
+    # Lido uma vez, no __init__ (load_manifest)
+    sem_manifesto = False
+
+    def read_manifest(self):
+        conteudo = super().read_manifest()
+        self.sem_manifesto = conteudo is None
+        return conteudo
+
+    def save_manifest(self):
+        super().save_manifest()
+        self.sem_manifesto = False
+
+    def stored_name(self, name):
+        # Sem o manifesto (collectstatic não rodou, como nos testes) usa o
+        # nome original em vez de quebrar a renderização do template. Com
+        # ele, um arquivo fora do manifesto continua sendo erro (ValueError)
+        if self.sem_manifesto:
+            return name
+        return super().stored_name(name)
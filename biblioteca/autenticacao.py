@@ -0,0 +1,27 @@
+"""
+Backend de autenticação que guarda o Usuario da sessão em cache.
+
+Sem ele, toda requisição autenticada faz um SELECT em biblioteca_usuario
+só para montar ``request.user``. A chave inclui uma versão que muda quando
+o usuário é salvo (ver ``invalidar_cache_usuario``), então alterações de
+senha, permissões ou ``is_active`` descartam a cópia em cache. A invalidação
+só alcança todos os workers com um cache compartilhado (Redis); com o cache
+em memória de cada processo, USUARIO_CACHE_SEGUNDOS fica em poucos segundos.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .models import chave_cache_usuario
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        chave = chave_cache_usuario(user_id)
+        usuario = cache.get(chave)
+        if usuario is None:
+            usuario = super().get_user(user_id)
+            if usuario is None:
+                return None
+            cache.set(chave, usuario, settings.USUARIO_CACHE_SEGUNDOS)
+        return usuario if self.user_can_authenticate(usuario) else None
@@ -0,0 +1,47 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from .utils import normalizar_nome
+
+
+def mesclar_duplicados(Autor, Livro, dry_run=False):
+    """
+    Junta os autores cujo nome normalizado é igual: o mais antigo (menor id)
+    fica, os livros dos outros passam para ele com um UPDATE por grupo e os
+    duplicados são apagados. Depois grava nome_normalizado de quem mudou.
+
+    Recebe as classes de modelo para poder ser usada também nas migrações.
+
+    Returns:
+        dict: nome normalizado -> [id mantido, ids removidos...] de cada grupo
+    """
+    grupos = defaultdict(list)
+    atuais = {}
+    for autor_id, nome, nome_normalizado in (
+        Autor.objects.order_by('id')
+        .values_list('id', 'nome', 'nome_normalizado')
+        .iterator(chunk_size=10000)
+    ):
+        chave = normalizar_nome(nome)
+        grupos[chave].append(autor_id)
+        atuais[autor_id] = (chave, nome_normalizado)
+
+    duplicados = {chave: ids for chave, ids in grupos.items() if len(ids) > 1}
+    if dry_run:
+        return duplicados
+
+    with transaction.atomic():
+        for ids in duplicados.values():
+            manter, remover = ids[0], ids[1:]
+            Livro.objects.filter(autor_id__in=remover).update(autor_id=manter)
+            Autor.objects.filter(id__in=remover).delete()
+
+        alterados = [
+            Autor(id=ids[0], nome_normalizado=chave)
+            for chave, ids in grupos.items()
+            if atuais[ids[0]][1] != chave
+        ]
+        Autor.objects.bulk_update(alterados, ['nome_normalizado'], batch_size=500)
+
+    return duplicados
@@ -0,0 +1,257 @@
+"""
+Operações de balcão em lote: várias devoluções ou empréstimos validados com
+poucas consultas e aplicados em uma única transação.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import BooleanField, Count, ExpressionWrapper, F, Q
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+
+from .disponibilidade import notificar_disponibilidades
+from .estoque import registrar_movimentos
+from . import metricas
+from .models import Emprestimo, FilaEspera, Livro, Usuario
+from .politicas import politica as politica_padrao
+from .popularidade import somar_emprestimos
+from .rollups import registrar_devolucoes, registrar_emprestimos
+
+
+def _aplicar_deltas(deltas, tipo):
+    """
+    Soma ``deltas`` ({livro_id: delta}) em quantidade_disponivel com um
+    UPDATE por valor de delta distinto, respeitando 0 <= disponível <= total.
+    Registra no razão do estoque a variação que de fato ocorreu, avisa o
+    stream de disponibilidade e devolve os livros afetados.
+    """
+    por_delta = defaultdict(list)
+    for livro_id, delta in deltas.items():
+        if delta:
+            por_delta[delta].append(livro_id)
+
+    livro_ids = [livro_id for ids in por_delta.values() for livro_id in ids]
+    if not livro_ids:
+        return livro_ids
+
+    antes = dict(
+        Livro.objects.select_for_update().filter(id__in=livro_ids).values_list('id', 'quantidade_disponivel')
+    )
+    for delta, ids in por_delta.items():
+        Livro.objects.filter(id__in=ids).update(
+            quantidade_disponivel=Greatest(
+                Least(F('quantidade_disponivel') + delta, F('quantidade')),
+                0,
+            )
+        )
+
+    depois = list(Livro.objects.filter(id__in=livro_ids).values_list('id', 'quantidade_disponivel'))
+    registrar_movimentos({livro_id: quantidade - antes[livro_id] for livro_id, quantidade in depois}, tipo)
+    notificar_disponibilidades(depois)
+    return livro_ids
+
+
+def _promover_filas(livro_ids):
+    """Promove o primeiro da fila de cada livro que ganhou exemplares e tem alguém esperando."""
+    livros = (
+        Livro.objects
+        .filter(id__in=livro_ids, quantidade_disponivel__gt=0, fila_espera__status='aguardando')
+        .distinct()
+    )
+    for livro in livros:
+        while livro.quantidade_disponivel > 0 and FilaEspera.promover_proximo(livro):
+            pass
+
+
+def devolver_em_lote(emprestimo_ids):
+    """
+    Devolve vários empréstimos de uma vez.
+
+    Returns:
+        list: um resultado por id, na ordem recebida, com ``sucesso`` e
+        ``erro`` ou ``data_devolucao``
+    """
+    emprestimo_ids = list(dict.fromkeys(emprestimo_ids))
+    agora = timezone.now()
+    resultados = []
+
+    with transaction.atomic():
+        encontrados = {
+            linha['id']: linha
+            for linha in Emprestimo.objects.select_for_update()
+            .filter(id__in=emprestimo_ids)
+            .values('id', 'status', 'livro_id', 'data_emprestimo',
+                    'data_devolucao_prevista', 'data_devolucao')
+        }
+
+        validos = []
+        for emprestimo_id in emprestimo_ids:
+            linha = encontrados.get(emprestimo_id)
+            if linha is None:
+                resultados.append({'id': emprestimo_id, 'sucesso': False, 'erro': 'Empréstimo não encontrado.'})
+            elif linha['data_devolucao'] or linha['status'] == 'devolvido':
+                resultados.append({'id': emprestimo_id, 'sucesso': False, 'erro': 'Este empréstimo já foi devolvido.'})
+            elif linha['status'] != 'ativo':
+                resultados.append({'id': emprestimo_id, 'sucesso': False, 'erro': f'Empréstimo com status "{linha["status"]}".'})
+            else:
+                linha['data_devolucao'] = agora
+                validos.append(linha)
+                resultados.append({'id': emprestimo_id, 'sucesso': True, 'data_devolucao': agora.isoformat()})
+
+        if validos:
+            Emprestimo.objects.filter(id__in=[linha['id'] for linha in validos]).update(
+                status='devolvido',
+                data_devolucao=agora,
+            )
+            livro_ids = _aplicar_deltas(Counter(linha['livro_id'] for linha in validos), 'devolucao')
+            registrar_devolucoes(validos)
+            metricas.emprestimos.inc(len(validos), evento='devolvido')
+            _promover_filas(livro_ids)
+
+    return resultados
+
+
+def emprestar_em_lote(pares, politica=politica_padrao):
+    """
+    Cria vários empréstimos a partir de pares (usuario_id, livro_id).
+
+    Returns:
+        list: um resultado por par, na ordem recebida, com ``sucesso`` e
+        ``erro`` ou ``emprestimo`` (id criado)
+    """
+    pares = [(int(usuario_id), int(livro_id)) for usuario_id, livro_id in pares]
+    usuario_ids = {usuario_id for usuario_id, _ in pares}
+    livro_ids = {livro_id for _, livro_id in pares}
+    resultados = [None] * len(pares)
+
+    with transaction.atomic():
+        usuarios_ativos = set(
+            Usuario.objects.filter(id__in=usuario_ids, is_active=True).values_list('id', flat=True)
+        )
+        disponiveis = dict(
+            Livro.objects.select_for_update()
+            .filter(id__in=livro_ids)
+            .values_list('id', 'quantidade_disponivel')
+        )
+        emprestimos_ativos = Counter(dict(
+            Emprestimo.objects
+            .filter(usuario_id__in=usuario_ids, status='ativo')
+            .values('usuario')
+            .annotate(total=Count('id'))
+            .values_list('usuario', 'total')
+        ))
+        ja_emprestados = set(
+            Emprestimo.objects
+            .filter(usuario_id__in=usuario_ids, livro_id__in=livro_ids, status='ativo')
+            .values_list('usuario_id', 'livro_id')
+        )
+
+        novos = []
+        posicoes = []
+        for posicao, (usuario_id, livro_id) in enumerate(pares):
+            erro = None
+            if usuario_id not in usuarios_ativos:
+                erro = 'Usuário não encontrado ou inativo.'
+            elif livro_id not in disponiveis:
+                erro = 'Livro não encontrado.'
+            elif (usuario_id, livro_id) in ja_emprestados:
+                erro = 'Este usuário já possui um empréstimo ativo deste livro.'
+            elif disponiveis[livro_id] <= 0:
+                erro = 'Este livro não está disponível para empréstimo.'
+                metricas.conflitos_disponibilidade.inc(operacao='emprestimo')
+            elif emprestimos_ativos[usuario_id] >= politica.max_emprestimos:
+                erro = f'Este usuário já atingiu o limite máximo de {politica.max_emprestimos} empréstimos ativos.'
+
+            if erro:
+                resultados[posicao] = {'usuario': usuario_id, 'livro': livro_id, 'sucesso': False, 'erro': erro}
+                continue
+
+            disponiveis[livro_id] -= 1
+            emprestimos_ativos[usuario_id] += 1
+            ja_emprestados.add((usuario_id, livro_id))
+            novos.append(Emprestimo(
+                usuario_id=usuario_id,
+                livro_id=livro_id,
+                data_devolucao_prevista=timezone.now() + politica.prazo_emprestimo,
+            ))
+            posicoes.append(posicao)
+
+        if novos:
+            Emprestimo.objects.bulk_create(novos)
+            _aplicar_deltas({
+                livro_id: -total
+                for livro_id, total in Counter(e.livro_id for e in novos).items()
+            }, 'emprestimo')
+            registrar_emprestimos(novos)
+            somar_emprestimos(novos)
+            metricas.emprestimos.inc(len(novos), evento='criado')
+
+        for posicao, emprestimo in zip(posicoes, novos):
+            resultados[posicao] = {
+                'usuario': emprestimo.usuario_id,
+                'livro': emprestimo.livro_id,
+                'sucesso': True,
+                'emprestimo': emprestimo.pk,
+            }
+
+    return resultados
+
+
+def renovar_todos(usuario, politica=politica_padrao):
+    """
+    Renova de uma vez todos os empréstimos elegíveis do usuário (ativos, com
+    menos renovações que o limite da política e atraso dentro da
+    tolerância), com um único UPDATE.
+
+    Returns:
+        dict: ``renovados`` (ids), ``nova_data_devolucao`` e ``ignorados``
+        (id, livro e motivo de cada empréstimo não renovado)
+    """
+    agora = timezone.now()
+    nova_data = agora + politica.prazo_emprestimo
+    # dias_atraso() <= tolerância equivale a atraso menor que tolerância + 1 dias
+    limite_atraso = agora - timedelta(days=politica.tolerancia_atraso_dias + 1)
+    elegivel = (
+        Q(status='ativo')
+        & Q(data_devolucao__isnull=True)
+        & Q(renovacoes__lt=politica.max_renovacoes)
+        & Q(data_devolucao_prevista__gt=limite_atraso)
+    )
+
+    with transaction.atomic():
+        # Travados até o UPDATE: uma devolução ou renovação concorrente não
+        # pode tirar um candidato da lista depois de ele ser contado como renovado
+        pendentes = list(
+            Emprestimo.objects
+            .select_for_update(of=('self',))
+            .filter(usuario=usuario, data_devolucao__isnull=True)
+            .exclude(status='devolvido')
+            .annotate(elegivel=ExpressionWrapper(elegivel, output_field=BooleanField()))
+            .values('id', 'status', 'renovacoes', 'data_devolucao_prevista', 'livro__titulo', 'elegivel')
+        )
+        candidatos = [linha['id'] for linha in pendentes if linha['elegivel']]
+        if candidatos:
+            renovados = Emprestimo.objects.filter(elegivel, id__in=candidatos).update(
+                renovacoes=F('renovacoes') + 1,
+                data_devolucao_prevista=nova_data,
+            )
+            metricas.emprestimos.inc(renovados, evento='renovado')
+
+    ignorados = []
+    for linha in pendentes:
+        if linha['elegivel']:
+            continue
+        if linha['status'] != 'ativo':
+            motivo = f'Empréstimo com status "{linha["status"]}".'
+        elif linha['renovacoes'] >= politica.max_renovacoes:
+            motivo = f'Limite de {politica.max_renovacoes} renovações atingido.'
+        else:
+            motivo = f'Atraso maior que {politica.tolerancia_atraso_dias} dias.'
+        ignorados.append({'id': linha['id'], 'livro': linha['livro__titulo'], 'motivo': motivo})
+
+    return {
+        'renovados': candidatos,
+        'nova_data_devolucao': nova_data,
+        'ignorados': ignorados,
+    }
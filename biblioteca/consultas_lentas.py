@@ -0,0 +1,182 @@
+"""
+Log de consultas lentas com o plano de execução.
+
+Com ``CONSULTAS_LENTAS_ATIVO`` o ``ConsultasLentasMiddleware`` instala
+``monitorar(request)`` como execute_wrapper em todas as conexões. Cada
+consulta acima de ``CONSULTAS_LENTAS_LIMITE_MS`` vira um registro com a
+impressão digital do SQL normalizado, a duração, a view e a linha de
+``biblioteca`` que disparou a consulta. Os registros vão para um buffer
+circular (página "Consultas lentas" da administração) e para o log.
+
+O EXPLAIN roda uma única vez por impressão digital: consultas repetidas
+reaproveitam o plano já capturado.
+
+A duração medida é a do ``execute``. Num SELECT grande, parte do trabalho
+acontece depois, quando as linhas são lidas.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .registro import registrar_evento
+
+
+logger = logging.getLogger(__name__)
+
+_PACOTE = os.path.dirname(os.path.abspath(__file__))
+# Arquivos que só repassam a consulta (os próprios execute_wrappers)
+_ARQUIVOS_IGNORADOS = {os.path.join(_PACOTE, 'consultas_lentas.py'), os.path.join(_PACOTE, 'middleware.py')}
+
+_explicando = ContextVar('explicando_consulta', default=False)
+
+_LITERAIS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE), 'IN (...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def normalizar_sql(sql):
+    """SQL sem valores: literais e parâmetros viram ``?`` e listas de IN viram ``(...)``."""
+    for padrao, troca in _LITERAIS:
+        sql = padrao.sub(troca, sql)
+    return sql.strip()
+
+
+def impressao_digital(sql_normalizado):
+    return hashlib.sha1(sql_normalizado.encode()).hexdigest()[:12]
+
+
+def origem_na_biblioteca():
+    """``arquivo:linha em função`` do quadro mais interno do app na pilha."""
+    for quadro in reversed(traceback.extract_stack()):
+        caminho = os.path.abspath(quadro.filename)
+        if caminho.startswith(_PACOTE) and caminho not in _ARQUIVOS_IGNORADOS:
+            relativo = os.path.relpath(caminho, os.path.dirname(_PACOTE))
+            return f'{relativo}:{quadro.lineno} em {quadro.name}'
+    return None
+
+
+def explicar(conexao, sql, params):
+    """Plano de execução de um SELECT, no formato do banco, ou None."""
+    # EXPLAIN sem ANALYZE não executa a consulta, mas só leituras interessam
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    token = _explicando.set(True)
+    try:
+        # Savepoint: um EXPLAIN com erro não pode abortar a transação da view
+        with transaction.atomic(using=conexao.alias):
+            with conexao.cursor() as cursor:
+                cursor.execute(f'{conexao.ops.explain_query_prefix()} {sql}', params)
+                linhas = cursor.fetchall()
+    except DatabaseError as e:
+        return f'EXPLAIN falhou: {e}'
+    finally:
+        _explicando.reset(token)
+    return '\n'.join(' | '.join(str(coluna) for coluna in linha) for linha in linhas)
+
+
+class RegistroConsultasLentas:
+    """Buffer circular das últimas consultas lentas e planos por impressão digital."""
+
+    def __init__(self, maximo=200, maximo_planos=500):
+        self.consultas = deque(maxlen=maximo)
+        self.planos = OrderedDict()
+        self.maximo_planos = maximo_planos
+        self._lock = threading.Lock()
+
+    def precisa_de_plano(self, impressao):
+        """Reserva a vez de capturar o plano de ``impressao``; True só na primeira chamada."""
+        with self._lock:
+            if impressao in self.planos:
+                return False
+            self.planos[impressao] = None
+            while len(self.planos) > self.maximo_planos:
+                self.planos.popitem(last=False)
+            return True
+
+    def guardar_plano(self, impressao, plano):
+        with self._lock:
+            self.planos[impressao] = plano
+
+    def adicionar(self, consulta):
+        with self._lock:
+            self.consultas.append(consulta)
+
+    def resumo(self):
+        """Consultas da mais recente para a mais antiga, com o plano de cada uma."""
+        with self._lock:
+            consultas = list(self.consultas)
+            planos = dict(self.planos)
+        return [{**consulta, 'plano': planos.get(consulta['impressao'])} for consulta in reversed(consultas)]
+
+    def limpar(self):
+        with self._lock:
+            self.consultas.clear()
+            self.planos.clear()
+
+
+buffer_consultas = RegistroConsultasLentas(maximo=getattr(settings, 'CONSULTAS_LENTAS_MAXIMO', 200))
+
+
+def monitorar(request=None):
+    """execute_wrapper que registra as consultas acima do limite configurado."""
+    limite_ms = getattr(settings, 'CONSULTAS_LENTAS_LIMITE_MS', 100)
+
+    def wrapper(execute, sql, params, many, context):
+        if _explicando.get():
+            return execute(sql, params, many, context)
+
+        inicio = time.perf_counter()
+        resultado = execute(sql, params, many, context)
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+        if duracao_ms >= limite_ms:
+            _registrar(context['connection'], sql, params, many, duracao_ms, request)
+        return resultado
+
+    return wrapper
+
+
+def _registrar(conexao, sql, params, many, duracao_ms, request):
+    normalizado = normalizar_sql(sql)
+    impressao = impressao_digital(normalizado)
+    match = getattr(request, 'resolver_match', None)
+    consulta = {
+        'impressao': impressao,
+        'sql': normalizado,
+        'duracao_ms': round(duracao_ms, 2),
+        'view': match.view_name if match else None,
+        'origem': origem_na_biblioteca(),
+        'banco': conexao.alias,
+        'data': timezone.now(),
+    }
+    buffer_consultas.adicionar(consulta)
+
+    plano = None
+    if not many and buffer_consultas.precisa_de_plano(impressao):
+        plano = explicar(conexao, sql, params)
+        buffer_consultas.guardar_plano(impressao, plano)
+
+    registrar_evento(
+        logger, 'consulta.lenta', nivel=logging.WARNING,
+        impressao=impressao,
+        duracao_ms=consulta['duracao_ms'],
+        view=consulta['view'],
+        origem=consulta['origem'],
+        banco=consulta['banco'],
+        sql=normalizado[:2000],
+        # O plano só vai para o log na primeira ocorrência da impressão
+        **({'plano': plano} if plano else {}),
+    )
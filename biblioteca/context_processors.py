@@ -0,0 +1,6 @@
+from .politicas import politica as politica_circulacao
+
+
+def politica(request):
+    """Disponibiliza os limites e prazos de circulação nos templates."""
+    return {'politica': politica_circulacao}
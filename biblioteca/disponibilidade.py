@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import weakref
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+
+class Broadcaster:
+    """
+    Distribui as mudanças de quantidade_disponivel para os streams SSE.
+
+    Dentro do processo os streams são acordados na hora: os síncronos por
+    uma ``threading.Condition`` e os assíncronos por um ``asyncio.Event``
+    do seu event loop, sem ocupar uma thread na espera. Entre processos (vários workers do gunicorn)
+    as mudanças passam pela tabela NotificacaoDisponibilidade, que cada
+    stream consulta a partir do último id visto, no máximo a cada
+    ``timeout`` segundos.
+    """
+
+    def __init__(self):
+        self._condicao = threading.Condition()
+        # Um Event por event loop: asyncio.Event não pode ser usado em outro loop
+        self._eventos = weakref.WeakKeyDictionary()
+        self._lock_eventos = threading.Lock()
+
+    def notificar(self, livro_id, quantidade_disponivel):
+        from .models import NotificacaoDisponibilidade
+
+        NotificacaoDisponibilidade.objects.create(
+            livro_id=livro_id,
+            quantidade_disponivel=quantidade_disponivel,
+        )
+        self._acordar()
+
+    def notificar_varios(self, quantidades):
+        """Publica várias mudanças de uma vez: ``quantidades`` é {livro_id: quantidade}."""
+        from .models import NotificacaoDisponibilidade
+
+        if not quantidades:
+            return
+        NotificacaoDisponibilidade.objects.bulk_create([
+            NotificacaoDisponibilidade(livro_id=livro_id, quantidade_disponivel=quantidade)
+            for livro_id, quantidade in quantidades.items()
+        ])
+        self._acordar()
+
+    def _acordar(self):
+        with self._condicao:
+            self._condicao.notify_all()
+        with self._lock_eventos:
+            eventos = list(self._eventos.items())
+        for loop, evento in eventos:
+            try:
+                # Chamado de qualquer thread; o Event só é mexido no seu loop
+                loop.call_soon_threadsafe(_disparar, evento)
+            except RuntimeError:
+                pass  # loop já fechado
+
+    def aguardar(self, timeout):
+        with self._condicao:
+            self._condicao.wait(timeout)
+
+    async def aguardar_async(self, timeout):
+        loop = asyncio.get_running_loop()
+        with self._lock_eventos:
+            evento = self._eventos.get(loop)
+            if evento is None:
+                evento = self._eventos[loop] = asyncio.Event()
+        try:
+            await asyncio.wait_for(evento.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def ultimo_id(self):
+        from .models import NotificacaoDisponibilidade
+
+        ultima = NotificacaoDisponibilidade.objects.order_by('-id').values_list('id', flat=True).first()
+        return ultima or 0
+
+    def mudancas_desde(self, ultimo_id, livro_ids):
+        """Retorna [(id, livro_id, quantidade_disponivel)] posteriores a ``ultimo_id``."""
+        from .models import NotificacaoDisponibilidade
+
+        return list(
+            NotificacaoDisponibilidade.objects
+            .filter(id__gt=ultimo_id, livro_id__in=livro_ids)
+            .order_by('id')
+            .values_list('id', 'livro_id', 'quantidade_disponivel')
+        )
+
+    def limpar(self, antes_de):
+        from .models import NotificacaoDisponibilidade
+
+        removidas, _ = NotificacaoDisponibilidade.objects.filter(data_criacao__lt=antes_de).delete()
+        return removidas
+
+
+def _disparar(evento):
+    # Acorda quem já espera e rearma o Event para a próxima espera
+    evento.set()
+    evento.clear()
+
+
+broadcaster = Broadcaster()
+
+
+def notificar_disponibilidade(livro_id, quantidade_disponivel):
+    """Publica a mudança só depois do commit, para não anunciar algo que pode ser desfeito."""
+    transaction.on_commit(
+        lambda: broadcaster.notificar(livro_id, quantidade_disponivel)
+    )
+
+
+def notificar_disponibilidades(quantidades):
+    """Versão em lote de notificar_disponibilidade para os caminhos de atualização em massa."""
+    quantidades = dict(quantidades)
+    transaction.on_commit(lambda: broadcaster.notificar_varios(quantidades))
+
+
+def limpar_notificacoes(minutos=60):
+    return broadcaster.limpar(timezone.now() - timedelta(minutes=minutos))
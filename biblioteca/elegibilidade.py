@@ -0,0 +1,87 @@
+"""
+Responde "o usuário U pode emprestar/reservar o livro L?" com uma única
+consulta: a linha do livro com subconsultas para os totais do usuário.
+"""
+from django.db.models import Exists, OuterRef
+
+from . import metricas
+from .models import Emprestimo, Livro, Reserva
+from .politicas import politica as politica_padrao
+from .utils import subconsulta_contagem
+
+
+class Elegibilidade:
+    """Fatos de limite de um par (usuário, livro) e as regras aplicadas sobre eles."""
+
+    def __init__(self, politica, quantidade_disponivel, emprestimos_ativos,
+                 emprestimo_do_livro, reservas_ativas, reserva_do_livro):
+        self.politica = politica
+        self.quantidade_disponivel = quantidade_disponivel
+        self.emprestimos_ativos = emprestimos_ativos
+        self.emprestimo_do_livro = emprestimo_do_livro
+        self.reservas_ativas = reservas_ativas
+        self.reserva_do_livro = reserva_do_livro
+
+    @classmethod
+    def consultar(cls, usuario, livro, politica=politica_padrao):
+        fatos = (
+            Livro.objects
+            .filter(pk=getattr(livro, 'pk', livro))
+            .annotate(
+                emprestimos_ativos=subconsulta_contagem(
+                    Emprestimo.objects.filter(usuario=usuario, status='ativo')
+                ),
+                emprestimo_do_livro=Exists(
+                    Emprestimo.objects.filter(usuario=usuario, livro=OuterRef('pk'), status='ativo')
+                ),
+                reservas_ativas=subconsulta_contagem(
+                    Reserva.objects.filter(usuario=usuario, status='ativa')
+                ),
+                reserva_do_livro=Exists(
+                    Reserva.objects.filter(usuario=usuario, livro=OuterRef('pk'), status='ativa')
+                ),
+            )
+            .values(
+                'quantidade_disponivel', 'emprestimos_ativos', 'emprestimo_do_livro',
+                'reservas_ativas', 'reserva_do_livro',
+            )
+            .get()
+        )
+        return cls(politica, **fatos)
+
+    @property
+    def atingiu_limite_reservas(self):
+        return self.reservas_ativas >= self.politica.max_reservas
+
+    def erro_emprestimo(self):
+        """Mensagem do primeiro impedimento para emprestar, ou None."""
+        if self.emprestimo_do_livro:
+            return 'Este usuário já possui um empréstimo ativo deste livro.'
+        if self.quantidade_disponivel <= 0:
+            metricas.conflitos_disponibilidade.inc(operacao='emprestimo')
+            return 'Este livro não está disponível para empréstimo.'
+        if self.emprestimos_ativos >= self.politica.max_emprestimos:
+            return (
+                f'Este usuário já atingiu o limite máximo de '
+                f'{self.politica.max_emprestimos} empréstimos ativos.'
+            )
+        return None
+
+    def erro_reserva(self):
+        """Mensagem do primeiro impedimento para reservar, ou None."""
+        if self.atingiu_limite_reservas:
+            return 'O usuário não pode fazer mais reservas ativas.'
+        if self.quantidade_disponivel <= 0:
+            metricas.conflitos_disponibilidade.inc(operacao='reserva')
+            return 'O livro não está disponível para reserva.'
+        if self.reserva_do_livro:
+            return 'Já existe uma reserva ativa para este livro por este usuário.'
+        return None
+
+    def erro_fila(self):
+        """Mensagem do impedimento para entrar na fila de espera, ou None."""
+        if self.reserva_do_livro:
+            return 'Você já possui uma reserva ativa para este livro.'
+        if self.emprestimo_do_livro:
+            return 'Você já está com um exemplar deste livro emprestado.'
+        return None
@@ -0,0 +1,158 @@
+"""
+Livro-razão do estoque (MovimentoEstoque) e seus snapshots.
+
+Toda mudança de ``Livro.quantidade_disponivel`` é registrada como um
+movimento: pelo ``Livro.save()`` ou, nos caminhos em lote que usam UPDATE
+direto, por ``registrar_movimentos``. O motivo vem do contexto em que a
+mudança acontece::
+
+    with motivo('devolucao'):
+        emprestimo.livro.recalcular_quantidade_disponivel()
+
+A disponibilidade pelo razão é o snapshot do livro mais os movimentos
+posteriores a ele, então a reconciliação só olha o que mudou desde o
+último snapshot em vez de recontar todo o histórico de empréstimos.
+
+O razão é a trilha de auditoria da coluna, não a fonte das leituras:
+``is_available``, as views e o stream de disponibilidade continuam lendo
+``quantidade_disponivel``, gravada na mesma transação do movimento.
+``reconciliar_estoque`` compara as duas e aponta (ou corrige) divergências.
+Um ``save()`` de um livro carregado sem a coluna (``only``/``defer``) não
+gera movimento, porque o valor anterior é desconhecido; a divergência, se
+houver, aparece na reconciliação.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, IntegerField, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Livro, MovimentoEstoque, SnapshotEstoque
+
+
+_motivo = ContextVar('motivo_estoque', default='ajuste')
+
+
+@contextmanager
+def motivo(tipo):
+    """Define o tipo dos movimentos registrados dentro do bloco."""
+    token = _motivo.set(tipo)
+    try:
+        yield
+    finally:
+        _motivo.reset(token)
+
+
+def registrar_movimento(livro_id, delta, tipo=None):
+    if delta:
+        MovimentoEstoque.objects.create(livro_id=livro_id, delta=delta, tipo=tipo or _motivo.get())
+
+
+def registrar_movimentos(deltas, tipo=None):
+    """Registra vários movimentos ({livro_id: delta}) com um bulk_create."""
+    tipo = tipo or _motivo.get()
+    MovimentoEstoque.objects.bulk_create(
+        [
+            MovimentoEstoque(livro_id=livro_id, delta=delta, tipo=tipo)
+            for livro_id, delta in deltas.items()
+            if delta
+        ],
+        batch_size=1000,
+    )
+
+
+def anotar_razao(queryset):
+    """
+    Anota ``quantidade_razao`` em uma consulta de Livro: snapshot mais a
+    soma dos movimentos de id maior que o último consolidado. Cada soma
+    percorre só o trecho recente do índice (livro, id).
+    """
+    movimentos = (
+        MovimentoEstoque.objects
+        .filter(
+            livro=OuterRef('pk'),
+            id__gt=Coalesce(OuterRef('snapshot_estoque__ultimo_movimento'), 0),
+        )
+        .order_by()
+        .values('livro')
+        .annotate(soma=Sum('delta'))
+        .values('soma')
+    )
+    return queryset.annotate(
+        quantidade_razao=(
+            Coalesce(F('snapshot_estoque__quantidade_disponivel'), 0)
+            + Coalesce(Subquery(movimentos, output_field=IntegerField()), Value(0))
+        )
+    )
+
+
+def quantidade_pelo_razao(livro_id):
+    return anotar_razao(Livro.objects.filter(pk=livro_id)).values_list('quantidade_razao', flat=True).get()
+
+
+def divergencias():
+    """Livros cuja quantidade_disponivel difere do valor do razão."""
+    return (
+        anotar_razao(Livro.objects.all())
+        .exclude(quantidade_disponivel=F('quantidade_razao'))
+        .order_by('id')
+        .values('id', 'titulo', 'quantidade_disponivel', 'quantidade_razao')
+    )
+
+
+def tirar_snapshots(margem=timedelta(seconds=60)):
+    """
+    Consolida nos snapshots os movimentos registrados desde a última vez.
+
+    Cada execução leva todos os livros com movimentos novos até o mesmo id,
+    então os movimentos pendentes são exatamente os de id maior que o maior
+    ``ultimo_movimento`` já gravado: uma faixa da chave primária. Movimentos
+    mais novos que ``margem`` ficam para a próxima execução, para não pular
+    um id reservado por uma transação que ainda não terminou.
+
+    Returns:
+        int: número de livros cujo snapshot mudou
+    """
+    with transaction.atomic():
+        inicio = SnapshotEstoque.objects.aggregate(ultimo=Max('ultimo_movimento'))['ultimo'] or 0
+        # Percorre a chave primária de trás para frente até o primeiro
+        # movimento antigo o bastante
+        fim = (
+            MovimentoEstoque.objects
+            .filter(data__lte=timezone.now() - margem)
+            .order_by('-id')
+            .values_list('id', flat=True)
+            .first()
+        ) or 0
+        if fim <= inicio:
+            return 0
+
+        somas = dict(
+            MovimentoEstoque.objects
+            .filter(id__gt=inicio, id__lte=fim)
+            .values('livro')
+            .annotate(soma=Sum('delta'))
+            .values_list('livro', 'soma')
+        )
+        existentes = SnapshotEstoque.objects.in_bulk(list(somas))
+
+        agora = timezone.now()
+        alterados, novos = [], []
+        for livro_id, soma in somas.items():
+            snapshot = existentes.get(livro_id)
+            if snapshot is None:
+                novos.append(SnapshotEstoque(livro_id=livro_id, quantidade_disponivel=soma, ultimo_movimento=fim))
+            else:
+                snapshot.quantidade_disponivel += soma
+                snapshot.ultimo_movimento = fim
+                snapshot.data = agora
+                alterados.append(snapshot)
+
+        SnapshotEstoque.objects.bulk_create(novos, batch_size=1000)
+        SnapshotEstoque.objects.bulk_update(
+            alterados, ['quantidade_disponivel', 'ultimo_movimento', 'data'], batch_size=500
+        )
+    return len(somas)
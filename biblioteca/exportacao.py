@@ -0,0 +1,65 @@
+"""
+Exportação das reservas em CSV, Excel e PDF.
+
+openpyxl e WeasyPrint são opcionais e pesados (o WeasyPrint carrega cairo e
+pango): são importados dentro de ``planilha_reservas`` e ``pdf_reservas``,
+só quando uma exportação é pedida, nunca na subida do processo. A falta de
+um deles vira ``ExportacaoIndisponivel`` com a mensagem para o usuário.
+"""
+from importlib import import_module
+
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+
+CABECALHO_RESERVAS = [
+    'ID', 'Usuário', 'Email', 'Tipo Usuário', 'Livro', 'Autor',
+    'Status', 'Data Reserva', 'Data Expiração'
+]
+
+
+class ExportacaoIndisponivel(Exception):
+    """A biblioteca opcional do formato pedido não está instalada."""
+
+
+def _importar(modulo, pacote, formato):
+    try:
+        return import_module(modulo)
+    except ImportError:
+        raise ExportacaoIndisponivel(f'Biblioteca {pacote} não está instalada para exportação {formato}.')
+
+
+def linha_reserva(reserva):
+    return [
+        reserva.id,
+        reserva.usuario.get_full_name() or reserva.usuario.username,
+        reserva.usuario.email,
+        reserva.usuario.get_tipo_usuario_display(),
+        reserva.livro.titulo,
+        reserva.livro.autor.nome,
+        reserva.get_status_display(),
+        reserva.data_reserva.strftime('%d/%m/%Y %H:%M'),
+        reserva.data_expiracao.strftime('%d/%m/%Y %H:%M') if reserva.data_expiracao else 'N/A'
+    ]
+
+
+def planilha_reservas(queryset, destino):
+    """Grava em ``destino`` (arquivo ou HttpResponse) a planilha .xlsx das reservas."""
+    openpyxl = _importar('openpyxl', 'openpyxl', 'Excel')
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Reservas"
+    ws.append(CABECALHO_RESERVAS)
+    for reserva in queryset:
+        ws.append(linha_reserva(reserva))
+    wb.save(destino)
+
+
+def pdf_reservas(queryset):
+    """PDF das reservas (bytes) a partir do template reserva_pdf.html."""
+    weasyprint = _importar('weasyprint', 'WeasyPrint', 'PDF')
+    html_string = render_to_string('biblioteca/reserva_pdf.html', {
+        'reservas': queryset,
+        'data_exportacao': timezone.now()
+    })
+    return weasyprint.HTML(string=html_string).write_pdf()
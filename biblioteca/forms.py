@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth import get_user_model
 from .models import Livro, Autor, Categoria, Emprestimo, Reserva, Usuario
+from .elegibilidade import Elegibilidade
 
 User = get_user_model()
 
@@ -138,34 +139,10 @@ class EmprestimoForm(forms.ModelForm):
         livro = cleaned_data.get('livro')
         
         if usuario and livro:
-            # Verificar se o usuário já tem empréstimo ativo do mesmo livro
-            emprestimo_ativo = Emprestimo.objects.filter(
-                usuario=usuario,
-                livro=livro,
-                status='ativo'
-            ).exists()
-            
-            if emprestimo_ativo:
-                raise forms.ValidationError(
-                    'Este usuário já possui um empréstimo ativo deste livro.'
-                )
-            
-            # Verificar se o livro está disponível
-            if livro.quantidade_disponivel <= 0:
-                raise forms.ValidationError(
-                    'Este livro não está disponível para empréstimo.'
-                )
-            
-            # Verificar se o usuário pode fazer mais empréstimos
-            emprestimos_ativos = Emprestimo.objects.filter(
-                usuario=usuario,
-                status='ativo'
-            ).count()
-            
-            if emprestimos_ativos >= 3:
-                raise forms.ValidationError(
-                    'Este usuário já atingiu o limite máximo de 3 empréstimos ativos.'
-                )
+            # Empréstimo duplicado, disponibilidade e limite em uma consulta
+            erro = Elegibilidade.consultar(usuario, livro).erro_emprestimo()
+            if erro:
+                raise forms.ValidationError(erro)
         
         return cleaned_data
 
@@ -0,0 +1,77 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from biblioteca.middleware import codificacoes_disponiveis, comprimir, comprimir_iterador
+from biblioteca.models import Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede, para cada tipo de página, quantos bytes a compressão economiza '
+        'e quanto tempo de CPU ela custa por resposta'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usuario',
+            help='Administrador usado nas páginas restritas. Padrão: o primeiro administrador',
+        )
+        parser.add_argument(
+            '--repeticoes',
+            type=int,
+            default=20,
+            help='Quantas vezes cada resposta é comprimida para medir a CPU',
+        )
+
+    def handle(self, *args, **options):
+        admins = Usuario.objects.filter(tipo_usuario='admin', is_active=True)
+        if options['usuario']:
+            admins = admins.filter(username=options['usuario'])
+        admin = admins.order_by('id').first()
+        if admin is None:
+            raise CommandError('Nenhum administrador encontrado.')
+
+        paginas = [
+            ('Lista de livros (HTML)', reverse('biblioteca:livro_list')),
+            ('Lista de reservas (HTML)', reverse('biblioteca:reserva_list')),
+            ('Lista de usuários (HTML)', reverse('biblioteca:usuario_list')),
+            ('Disponibilidade (JSON)', reverse('biblioteca:livros_disponiveis')),
+            ('Exportação de reservas (CSV, streaming)', reverse('biblioteca:exportar_reservas') + '?format=csv'),
+        ]
+
+        # Sem Accept-Encoding o corpo volta sem compressão; a compressão é
+        # medida à parte com as mesmas funções do CompressaoMiddleware
+        with override_settings(ALLOWED_HOSTS=['*']):
+            client = Client()
+            client.force_login(admin)
+            for nome, url in paginas:
+                response = client.get(url)
+                if response.status_code != 200:
+                    self.stdout.write(self.style.WARNING(f'{nome}: HTTP {response.status_code}, ignorada'))
+                    continue
+                if response.streaming:
+                    partes = list(response.streaming_content)
+                else:
+                    partes = [response.content]
+                self.relatar(nome, partes, response.streaming, options['repeticoes'])
+
+    def relatar(self, nome, partes, streaming, repeticoes):
+        original = sum(len(parte) for parte in partes)
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{nome}: {original / 1024:.1f} KiB'))
+        for codificacao in codificacoes_disponiveis():
+            inicio = time.process_time()
+            for _ in range(repeticoes):
+                if streaming:
+                    comprimido = sum(len(p) for p in comprimir_iterador(iter(partes), codificacao))
+                else:
+                    comprimido = len(comprimir(partes[0], codificacao))
+            cpu_ms = (time.process_time() - inicio) / repeticoes * 1000
+            economia = 100 - comprimido * 100 / original if original else 0
+            self.stdout.write(
+                f'  {codificacao:5} {comprimido / 1024:8.1f} KiB  '
+                f'economia {economia:5.1f}%  CPU {cpu_ms:7.2f} ms/resposta'
+            )
@@ -0,0 +1,91 @@
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Dispara requisições concorrentes contra os endpoints de polling de '
+        'disponibilidade de um servidor em execução (compare gunicorn sync x uvicorn)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://127.0.0.1:8000',
+            help='Endereço base do servidor a ser testado',
+        )
+        parser.add_argument(
+            '--livro',
+            type=int,
+            default=1,
+            help='ID do livro usado em verificar-disponibilidade',
+        )
+        parser.add_argument(
+            '--concorrencia',
+            type=int,
+            default=50,
+            help='Número de clientes simultâneos',
+        )
+        parser.add_argument(
+            '--requisicoes',
+            type=int,
+            default=2000,
+            help='Total de requisições por endpoint',
+        )
+
+    def handle(self, *args, **options):
+        base = options['url'].rstrip('/')
+        endpoints = [
+            f'{base}/ajax/verificar-disponibilidade/{options["livro"]}/',
+            f'{base}/ajax/livros-disponiveis/',
+        ]
+
+        self.stdout.write(
+            f'Concorrência: {options["concorrencia"]}, '
+            f'requisições por endpoint: {options["requisicoes"]}'
+        )
+
+        for url in endpoints:
+            latencias, erros, duracao = self.medir(
+                url, options['concorrencia'], options['requisicoes']
+            )
+            self.relatar(url, latencias, erros, duracao)
+
+    def medir(self, url, concorrencia, total):
+        def requisitar(_):
+            inicio = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=30) as resposta:
+                    resposta.read()
+                return time.perf_counter() - inicio, None
+            except Exception as e:
+                return time.perf_counter() - inicio, e
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+            resultados = list(executor.map(requisitar, range(total)))
+        duracao = time.perf_counter() - inicio
+
+        latencias = sorted(r[0] for r in resultados if r[1] is None)
+        erros = sum(1 for r in resultados if r[1] is not None)
+        return latencias, erros, duracao
+
+    def relatar(self, url, latencias, erros, duracao):
+        self.stdout.write(self.style.MIGRATE_HEADING(url))
+        if not latencias:
+            self.stdout.write(self.style.ERROR(f'Todas as requisições falharam ({erros}).'))
+            return
+
+        def percentil(p):
+            return latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000
+
+        self.stdout.write(
+            f'  req/s: {len(latencias) / duracao:.1f}  '
+            f'p50: {percentil(0.50):.1f} ms  '
+            f'p95: {percentil(0.95):.1f} ms  '
+            f'p99: {percentil(0.99):.1f} ms  '
+            f'erros: {erros}'
+        )
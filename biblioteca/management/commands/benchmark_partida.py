@@ -0,0 +1,139 @@
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from biblioteca.models import Livro
+
+
+class Command(BaseCommand):
+    help = (
+        'Sobe o gunicorn com e sem o gunicorn.conf.py e mede a latência das '
+        'requisições logo após a partida e com os workers sendo reciclados'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--perfil',
+            choices=['padrao', 'configurado', 'ambos'],
+            default='ambos',
+            help='"padrao": gunicorn sem configuração; "configurado": gunicorn.conf.py',
+        )
+        parser.add_argument('--rodadas', type=int, default=5, help='Quantas partidas medir por perfil')
+        parser.add_argument('--porta', type=int, default=8765)
+        parser.add_argument(
+            '--paralelas',
+            type=int,
+            default=2,
+            help='Requisições simultâneas',
+        )
+        parser.add_argument(
+            '--requisicoes',
+            type=int,
+            default=200,
+            help='Requisições por rodada depois da primeira rajada',
+        )
+        parser.add_argument(
+            '--max-requests',
+            type=int,
+            default=25,
+            help='max_requests dos dois perfis durante a medição, para forçar a reciclagem de workers',
+        )
+
+    def handle(self, *args, **options):
+        livro = Livro.objects.order_by('id').values_list('id', flat=True).first()
+        if livro is None:
+            raise CommandError('Cadastre ao menos um livro antes de medir.')
+        # Páginas públicas de tamanho normal; a lista de livros e a de
+        # disponíveis (centenas de KB) mediriam a renderização, não a partida
+        self.caminhos = [
+            '/login/', '/register/', f'/livros/{livro}/',
+            f'/api/livros/disponibilidade/{livro}/', f'/livros/{livro}/fila/posicao/',
+        ]
+
+        perfis = ['padrao', 'configurado'] if options['perfil'] == 'ambos' else [options['perfil']]
+        with tempfile.NamedTemporaryFile('w', suffix='.py') as vazio:
+            for perfil in perfis:
+                config = str(settings.BASE_DIR / 'gunicorn.conf.py') if perfil == 'configurado' else vazio.name
+                primeira, reciclagem = [], []
+                for _ in range(options['rodadas']):
+                    frias, continuas = self.rodada(config, options)
+                    primeira.extend(frias)
+                    reciclagem.extend(continuas)
+                self.stdout.write(self.style.MIGRATE_HEADING(f'{perfil}:'))
+                self.relatar('desde a partida', primeira)
+                self.relatar(f'reciclando a cada {options["max_requests"]}', reciclagem)
+
+    def rodada(self, config, options):
+        porta = options['porta']
+        comando = [
+            sys.executable, '-m', 'gunicorn', '-c', config,
+            '-b', f'127.0.0.1:{porta}',
+            '--max-requests', str(options['max_requests']),
+            '--max-requests-jitter', str(options['max_requests'] // 5),
+            'bibliotecasenac.wsgi:application',
+        ]
+        inicio = time.perf_counter()
+        processo = subprocess.Popen(
+            comando, cwd=settings.BASE_DIR, env={**os.environ, 'DJANGO_LOG_LEVEL': 'WARNING'},
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            self.aguardar_porta(porta, processo)
+            urls = [f'http://127.0.0.1:{porta}{caminho}' for caminho in self.caminhos]
+            with ThreadPoolExecutor(options['paralelas']) as executor:
+                # A primeira rajada conta desde o início do processo: é o que
+                # o usuário sente logo depois de um deploy
+                frias = list(executor.map(lambda url: self.medir(url, inicio), urls * options['paralelas']))
+                continuas = list(executor.map(
+                    self.medir,
+                    [urls[i % len(urls)] for i in range(options['requisicoes'])],
+                ))
+        finally:
+            processo.terminate()
+            try:
+                processo.wait(30)
+            except subprocess.TimeoutExpired:
+                processo.kill()
+                processo.wait()
+        return frias, continuas
+
+    def aguardar_porta(self, porta, processo, limite=60):
+        fim = time.monotonic() + limite
+        while time.monotonic() < fim:
+            if processo.poll() is not None:
+                raise CommandError('O gunicorn terminou antes de abrir a porta.')
+            try:
+                socket.create_connection(('127.0.0.1', porta), timeout=0.2).close()
+                return
+            except OSError:
+                time.sleep(0.02)
+        raise CommandError('O gunicorn não abriu a porta a tempo.')
+
+    def medir(self, url, inicio=None):
+        inicio = inicio or time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=30) as resposta:
+                resposta.read()
+        except urllib.error.HTTPError:
+            pass
+        return time.perf_counter() - inicio
+
+    def relatar(self, nome, latencias):
+        latencias.sort()
+
+        def percentil(p):
+            return latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000
+
+        self.stdout.write(
+            f'  {nome:22} p50 {percentil(0.50):6.0f} ms   p99 {percentil(0.99):6.0f} ms   '
+            f'máx {latencias[-1] * 1000:6.0f} ms   (n={len(latencias)})'
+        )
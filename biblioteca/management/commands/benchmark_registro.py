@@ -0,0 +1,82 @@
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from biblioteca.registro import FormatadorJSON, ManipuladorFila, registrar_evento
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede quanto um evento de circulação custa à requisição: print() antigo, '
+        'log JSON gravado na hora e log JSON pela fila (ManipuladorFila)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--eventos',
+            type=int,
+            default=20000,
+            help='Quantos eventos registrar em cada cenário',
+        )
+
+    def handle(self, *args, **options):
+        eventos = options['eventos']
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, 'eventos.log')
+
+            with open(os.path.join(pasta, 'print.log'), 'w') as saida:
+                inicio = time.perf_counter()
+                for i in range(eventos):
+                    print(f'Empréstimo {i} devolvido por admin em {time.time()}', file=saida, flush=True)
+                self.relatar('print() com flush', inicio, eventos)
+
+            direto = logging.FileHandler(os.path.join(pasta, 'direto.log'), delay=True)
+            direto.setFormatter(FormatadorJSON())
+            self.medir('JSON direto no arquivo', direto, eventos)
+
+            fila = ManipuladorFila(arquivo=arquivo)
+            # Sem stderr na medição: só o arquivo
+            fila.parar()
+            fila.destinos = fila.destinos[1:]
+            fila.iniciar()
+            self.medir('JSON pela fila', fila, eventos, fechar=False)
+            self.drenar(fila)
+
+            # Custo de enfileirar sozinho: é o que a requisição paga quando a
+            # thread grava nos intervalos entre requisições
+            fila.parar()
+            self.medir('JSON, só enfileirar', fila, eventos, fechar=False)
+            fila.iniciar()
+            self.drenar(fila)
+
+    def drenar(self, fila):
+        inicio = time.perf_counter()
+        fila.parar()
+        self.stdout.write(
+            f'  (a thread de gravação terminou a fila em {(time.perf_counter() - inicio) * 1000:.0f} ms, '
+            f'fora da requisição)'
+        )
+
+    def medir(self, nome, manipulador, eventos, fechar=True):
+        logger = logging.getLogger(f'biblioteca.benchmark.{id(manipulador)}')
+        logger.handlers = [manipulador]
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        inicio = time.perf_counter()
+        for i in range(eventos):
+            registrar_evento(
+                logger, 'emprestimo.devolvido',
+                usuario='admin', emprestimo=i, livro=i % 97, latencia_ms=1.5,
+            )
+        self.relatar(nome, inicio, eventos)
+        if fechar:
+            manipulador.close()
+
+    def relatar(self, nome, inicio, eventos):
+        total = time.perf_counter() - inicio
+        self.stdout.write(f'{nome:25} {total / eventos * 1_000_000:7.1f} µs/evento')
+        sys.stdout.flush()
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from biblioteca import recomendacoes
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcula as recomendações "quem pegou este também pegou". Por padrão só '
+        'recalcula os livros afetados pelos empréstimos desde a última execução'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Recalcula todos os livros a partir de todo o histórico',
+        )
+        parser.add_argument(
+            '--vizinhos',
+            type=int,
+            default=recomendacoes.VIZINHOS,
+            help=f'Recomendações guardadas por livro (padrão {recomendacoes.VIZINHOS})',
+        )
+        parser.add_argument(
+            '--minimo',
+            type=int,
+            default=recomendacoes.MINIMO_EM_COMUM,
+            help=(
+                'Usuários em comum para que um livro seja recomendado '
+                f'(padrão {recomendacoes.MINIMO_EM_COMUM})'
+            ),
+        )
+        parser.add_argument(
+            '--tamanho-bloco',
+            type=int,
+            default=5000,
+            help='Linhas lidas do banco por vez',
+        )
+
+    def handle(self, *args, **options):
+        if options['vizinhos'] < 1 or options['minimo'] < 1:
+            raise CommandError('--vizinhos e --minimo precisam ser positivos.')
+
+        calcular = recomendacoes.reconstruir if options['completo'] else recomendacoes.atualizar
+        self.stdout.write(f'Calculando recomendações ({recomendacoes.motor()})...')
+        execucao = calcular(
+            k=options['vizinhos'],
+            minimo=options['minimo'],
+            tamanho_bloco=options['tamanho_bloco'],
+        )
+        tipo = 'completa' if execucao.completa else 'incremental'
+        self.stdout.write(self.style.SUCCESS(
+            f'Execução {tipo}: {execucao.livros_atualizados} livros atualizados em '
+            f'{execucao.duracao:.2f}s (empréstimos até #{execucao.ultimo_emprestimo}).'
+        ))
@@ -0,0 +1,62 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from biblioteca.circulacao import devolver_em_lote, emprestar_em_lote
+
+
+class Command(BaseCommand):
+    help = 'Processa devoluções e empréstimos em lote (balcão de circulação)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--devolver',
+            nargs='+',
+            type=int,
+            default=[],
+            metavar='EMPRESTIMO_ID',
+            help='IDs dos empréstimos a devolver',
+        )
+        parser.add_argument(
+            '--emprestar',
+            nargs='+',
+            default=[],
+            metavar='USUARIO_ID:LIVRO_ID',
+            help='Pares usuário:livro a emprestar',
+        )
+        parser.add_argument(
+            '--arquivo',
+            help='Arquivo JSON no formato {"devolucoes": [...], "emprestimos": [[usuario, livro], ...]}',
+        )
+
+    def handle(self, *args, **options):
+        devolucoes = list(options['devolver'])
+        try:
+            emprestimos = [tuple(int(v) for v in par.split(':')) for par in options['emprestar']]
+        except ValueError:
+            raise CommandError('Use o formato USUARIO_ID:LIVRO_ID em --emprestar.')
+
+        if options['arquivo']:
+            try:
+                with open(options['arquivo'], encoding='utf-8') as arquivo:
+                    dados = json.load(arquivo)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Não foi possível ler o arquivo: {e}')
+            devolucoes += [int(pk) for pk in dados.get('devolucoes', [])]
+            emprestimos += [tuple(par) for par in dados.get('emprestimos', [])]
+
+        if not devolucoes and not emprestimos:
+            raise CommandError('Nada a processar. Use --devolver, --emprestar ou --arquivo.')
+
+        if devolucoes:
+            self.relatar('Devoluções', devolver_em_lote(devolucoes))
+        if emprestimos:
+            self.relatar('Empréstimos', emprestar_em_lote(emprestimos))
+
+    def relatar(self, titulo, resultados):
+        sucessos = sum(1 for r in resultados if r['sucesso'])
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{titulo}: {sucessos}/{len(resultados)} processados'))
+        for resultado in resultados:
+            if not resultado['sucesso']:
+                item = resultado.get('id') or f"{resultado['usuario']}:{resultado['livro']}"
+                self.stdout.write(self.style.WARNING(f'  {item}: {resultado["erro"]}'))
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from biblioteca import popularidade
+
+
+class Command(BaseCommand):
+    help = (
+        'Aplica o decaimento às pontuações de popularidade dos livros. '
+        'Deve rodar uma vez por noite'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recalcular',
+            action='store_true',
+            help='Refaz as pontuações a partir de todo o histórico de empréstimos',
+        )
+
+    def handle(self, *args, **options):
+        meia_vida = settings.POPULARIDADE_MEIA_VIDA_DIAS
+        if options['recalcular']:
+            self.stdout.write(f'Recalculando a popularidade (meia-vida de {meia_vida:g} dias)...')
+            total = popularidade.recalcular()
+            self.stdout.write(self.style.SUCCESS(f'{total} livros com pontuação.'))
+            return
+
+        decaimento, removidos = popularidade.decair()
+        self.stdout.write(self.style.SUCCESS(
+            f'Pontuações multiplicadas por {decaimento.fator:.4f} '
+            f'(meia-vida de {meia_vida:g} dias); {removidos} livros saíram do ranking.'
+        ))
@@ -0,0 +1,276 @@
+import csv
+import io
+import json
+import sys
+from collections import defaultdict
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+
+from biblioteca.disponibilidade import notificar_disponibilidades
+from biblioteca.estoque import registrar_movimentos
+from biblioteca.models import Autor, Livro
+from biblioteca.utils import normalizar_nome
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa o acervo de um arquivo CSV ou JSONL com as colunas '
+        'titulo, autor, genero e quantidade, em lotes e sem carregar o arquivo inteiro'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'arquivo',
+            help='Caminho do arquivo (.csv ou .jsonl); use "-" para ler da entrada padrão',
+        )
+        parser.add_argument(
+            '--formato',
+            choices=['csv', 'jsonl'],
+            help='Formato do arquivo. Padrão: deduzido pela extensão',
+        )
+        parser.add_argument(
+            '--delimitador',
+            default=',',
+            help='Delimitador do CSV',
+        )
+        parser.add_argument(
+            '--tamanho-lote',
+            type=int,
+            default=5000,
+            help='Linhas por lote (uma transação por lote)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Valida e mostra o que seria importado sem gravar nada',
+        )
+        parser.add_argument(
+            '--max-erros-lote',
+            type=int,
+            default=10,
+            help='Quantidade de erros exibidos por lote',
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.max_erros = options['max_erros_lote']
+        formato = options['formato'] or ('jsonl' if options['arquivo'].endswith('.jsonl') else 'csv')
+
+        if self.dry_run:
+            self.stdout.write(self.style.WARNING('Modo DRY-RUN - Nenhuma alteração será feita'))
+
+        self.generos = {}
+        for chave, rotulo in Livro.TIPO_GENERO:
+            self.generos[normalizar_nome(chave)] = chave
+            self.generos[normalizar_nome(rotulo)] = chave
+
+        # Mapa nome normalizado -> id do autor, preenchido com uma única consulta
+        self.autores = {}
+        for autor_id, nome_normalizado in Autor.objects.values_list('id', 'nome_normalizado').iterator(chunk_size=10000):
+            self.autores[nome_normalizado] = autor_id
+        self.proximo_id_simulado = -1
+
+        totais = {'linhas': 0, 'autores': 0, 'criados': 0, 'atualizados': 0, 'erros': 0}
+        try:
+            arquivo = self.abrir(options['arquivo'])
+        except OSError as e:
+            raise CommandError(f'Não foi possível abrir o arquivo: {e}')
+
+        with arquivo:
+            linhas = self.ler(arquivo, formato, options['delimitador'])
+            numero_lote = 0
+            while True:
+                lote = list(islice(linhas, options['tamanho_lote']))
+                if not lote:
+                    break
+                numero_lote += 1
+                resultado = self.processar_lote(lote)
+                self.relatar_lote(numero_lote, resultado)
+                totais['linhas'] += len(lote)
+                for chave in ('autores', 'criados', 'atualizados'):
+                    totais[chave] += resultado[chave]
+                totais['erros'] += len(resultado['erros'])
+
+        prefixo = 'DRY-RUN: ' if self.dry_run else ''
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{prefixo}{totais["linhas"]} linhas lidas, {totais["autores"]} autores novos, '
+                f'{totais["criados"]} livros criados, {totais["atualizados"]} atualizados, '
+                f'{totais["erros"]} erros'
+            )
+        )
+
+    def abrir(self, caminho):
+        if caminho == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        return open(caminho, encoding='utf-8-sig', newline='')
+
+    def ler(self, arquivo, formato, delimitador):
+        """Gera (número da linha, dicionário) sem carregar o arquivo na memória."""
+        if formato == 'csv':
+            leitor = csv.DictReader(arquivo, delimiter=delimitador)
+            for registro in leitor:
+                yield leitor.line_num, registro
+        else:
+            for numero, linha in enumerate(arquivo, 1):
+                if not linha.strip():
+                    continue
+                try:
+                    yield numero, json.loads(linha)
+                except ValueError as e:
+                    yield numero, {'_erro': f'JSON inválido: {e}'}
+
+    def validar(self, registro):
+        if '_erro' in registro:
+            raise ValueError(registro['_erro'])
+        titulo = (registro.get('titulo') or '').strip()
+        autor = ' '.join((registro.get('autor') or '').split())
+        if not titulo:
+            raise ValueError('Título vazio.')
+        if len(titulo) > 200:
+            raise ValueError('Título com mais de 200 caracteres.')
+        if not autor:
+            raise ValueError('Autor vazio.')
+        if len(autor) > 100:
+            raise ValueError('Nome do autor com mais de 100 caracteres.')
+        genero = self.generos.get(normalizar_nome(str(registro.get('genero') or '')))
+        if genero is None:
+            raise ValueError(f'Gênero desconhecido: {registro.get("genero")!r}.')
+        try:
+            quantidade = int(registro.get('quantidade') or 0)
+        except (TypeError, ValueError):
+            raise ValueError(f'Quantidade inválida: {registro.get("quantidade")!r}.')
+        if quantidade < 0:
+            raise ValueError('Quantidade negativa.')
+        return titulo, autor, genero, quantidade
+
+    def processar_lote(self, lote):
+        resultado = {'autores': 0, 'criados': 0, 'atualizados': 0, 'erros': []}
+
+        validos = []
+        for numero, registro in lote:
+            try:
+                validos.append(self.validar(registro))
+            except ValueError as e:
+                resultado['erros'].append((numero, str(e)))
+        if not validos:
+            return resultado
+
+        try:
+            with transaction.atomic():
+                autores_criados = self.gravar_lote(validos, resultado)
+        except DatabaseError as e:
+            primeira = lote[0][0]
+            resultado['erros'].append((primeira, f'Lote não gravado: {e}'))
+            resultado['autores'] = resultado['criados'] = resultado['atualizados'] = 0
+        else:
+            # Só depois do commit: os autores de um lote desfeito não existem,
+            # e o próximo lote que os citar precisa criá-los de novo
+            self.autores.update(autores_criados)
+        return resultado
+
+    def gravar_lote(self, validos, resultado):
+        """Grava o lote e devolve os autores criados nele ({nome normalizado: id})."""
+        # Autores novos: um bulk_create por lote
+        autores_criados = {}
+        novos_autores = {}
+        for _, autor, _, _ in validos:
+            chave = normalizar_nome(autor)
+            if chave not in self.autores:
+                novos_autores.setdefault(chave, autor)
+        if novos_autores:
+            if self.dry_run:
+                for chave in novos_autores:
+                    autores_criados[chave] = self.proximo_id_simulado
+                    self.proximo_id_simulado -= 1
+            else:
+                # bulk_create não chama save(), então o nome normalizado vai junto
+                criados = Autor.objects.bulk_create([
+                    Autor(nome=' '.join(nome.split()), nome_normalizado=chave)
+                    for chave, nome in novos_autores.items()
+                ])
+                for chave, autor in zip(novos_autores, criados):
+                    autores_criados[chave] = autor.pk
+            resultado['autores'] = len(novos_autores)
+
+        # Uma linha por (título, autor); a última ocorrência no lote vale
+        livros = {}
+        for titulo, autor, genero, quantidade in validos:
+            chave = normalizar_nome(autor)
+            autor_id = autores_criados[chave] if chave in autores_criados else self.autores[chave]
+            livros[(titulo, autor_id)] = (genero, quantidade)
+
+        autor_ids = {autor_id for _, autor_id in livros if autor_id > 0}
+        existentes = {}
+        if autor_ids:
+            for livro in Livro.objects.filter(
+                autor_id__in=autor_ids,
+                titulo__in={titulo for titulo, _ in livros},
+            ).only('id', 'titulo', 'autor_id', 'genero', 'quantidade', 'quantidade_disponivel'):
+                existentes.setdefault((livro.titulo, livro.autor_id), livro)
+
+        criar = []
+        atualizar = []
+        disponibilidade = {}
+        movimentos = {}
+        for (titulo, autor_id), (genero, quantidade) in livros.items():
+            livro = existentes.get((titulo, autor_id))
+            if livro is None:
+                criar.append(Livro(
+                    titulo=titulo,
+                    autor_id=autor_id,
+                    genero=genero,
+                    quantidade=quantidade,
+                    quantidade_disponivel=quantidade,
+                ))
+                continue
+            # Mantém os exemplares emprestados/reservados: soma só a diferença do total
+            disponivel = max(0, min(quantidade, livro.quantidade_disponivel + quantidade - livro.quantidade))
+            if disponivel != livro.quantidade_disponivel:
+                disponibilidade[livro.pk] = disponivel
+                movimentos[livro.pk] = disponivel - livro.quantidade_disponivel
+            livro.genero = genero
+            livro.quantidade = quantidade
+            livro.quantidade_disponivel = disponivel
+            atualizar.append(livro)
+
+        if not self.dry_run:
+            Livro.objects.bulk_create(criar, batch_size=1000)
+            self.atualizar_livros(atualizar)
+            # Os UPDATEs diretos não passam pelo save(): o razão do estoque
+            # recebe aqui a entrada dos livros novos e a variação dos antigos
+            movimentos.update((livro.pk, livro.quantidade_disponivel) for livro in criar)
+            registrar_movimentos(movimentos, 'ajuste')
+            notificar_disponibilidades(disponibilidade)
+        resultado['criados'] = len(criar)
+        resultado['atualizados'] = len(atualizar)
+        return autores_criados
+
+    def atualizar_livros(self, livros):
+        """
+        Um UPDATE por combinação distinta de (gênero, quantidade, disponível).
+        Num acervo essas combinações são poucas, e isso é muito mais rápido
+        que o UPDATE com CASE por linha do bulk_update.
+        """
+        grupos = defaultdict(list)
+        for livro in livros:
+            grupos[(livro.genero, livro.quantidade, livro.quantidade_disponivel)].append(livro.pk)
+        for (genero, quantidade, disponivel), ids in grupos.items():
+            for inicio in range(0, len(ids), 900):
+                Livro.objects.filter(id__in=ids[inicio:inicio + 900]).update(
+                    genero=genero,
+                    quantidade=quantidade,
+                    quantidade_disponivel=disponivel,
+                )
+
+    def relatar_lote(self, numero, resultado):
+        self.stdout.write(
+            f'Lote {numero}: {resultado["criados"]} criados, {resultado["atualizados"]} atualizados, '
+            f'{resultado["autores"]} autores novos, {len(resultado["erros"])} erros'
+        )
+        for linha, erro in resultado['erros'][:self.max_erros]:
+            self.stdout.write(self.style.WARNING(f'  linha {linha}: {erro}'))
+        if len(resultado['erros']) > self.max_erros:
+            self.stdout.write(self.style.WARNING(f'  ... e mais {len(resultado["erros"]) - self.max_erros} erros'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from biblioteca.disponibilidade import limpar_notificacoes
+
+
+class Command(BaseCommand):
+    help = 'Remove as notificações de disponibilidade antigas usadas pelo stream SSE'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minutos',
+            type=int,
+            default=60,
+            help='Remove notificações mais antigas que este número de minutos',
+        )
+
+    def handle(self, *args, **options):
+        removidas = limpar_notificacoes(options['minutos'])
+        self.stdout.write(
+            self.style.SUCCESS(f'{removidas} notificações removidas.')
+        )
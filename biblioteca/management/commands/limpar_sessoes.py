@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Remove as sessões expiradas da tabela de sessões em lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=5000,
+            help='Número de sessões removidas por DELETE',
+        )
+        parser.add_argument(
+            '--pausa',
+            type=float,
+            default=0.0,
+            help='Segundos de espera entre os lotes, para não disputar o banco com as requisições',
+        )
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE.endswith('signed_cookies'):
+            self.stdout.write('Sessões em cookies assinados: não há tabela para limpar.')
+            return
+
+        lote = options['lote']
+        agora = timezone.now()
+        removidas = 0
+        # Um DELETE curto por lote em vez de um único DELETE na tabela inteira,
+        # que prenderia o banco enquanto as sessões ativas são lidas
+        while True:
+            chaves = list(
+                Session.objects.filter(expire_date__lt=agora)
+                .values_list('session_key', flat=True)[:lote]
+            )
+            if not chaves:
+                break
+            removidas += Session.objects.filter(session_key__in=chaves).delete()[0]
+            if options['pausa']:
+                time.sleep(options['pausa'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'{removidas} sessões expiradas removidas.')
+        )
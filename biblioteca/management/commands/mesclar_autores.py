@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from biblioteca.autores import mesclar_duplicados
+from biblioteca.models import Autor, Livro
+
+
+class Command(BaseCommand):
+    help = 'Junta autores duplicados (mesmo nome normalizado) e move os livros para o autor mantido'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas lista os grupos de duplicados, sem alterar o banco',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Modo DRY-RUN - Nenhuma alteração será feita'))
+
+        duplicados = mesclar_duplicados(Autor, Livro, dry_run=dry_run)
+
+        for chave, ids in duplicados.items():
+            self.stdout.write(f'{chave}: mantido #{ids[0]}, removidos {", ".join(f"#{i}" for i in ids[1:])}')
+
+        removidos = sum(len(ids) - 1 for ids in duplicados.values())
+        verbo = 'seriam removidos' if dry_run else 'removidos'
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(duplicados)} grupo(s) de duplicados, {removidos} autor(es) {verbo}.'
+        ))
@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from biblioteca.disponibilidade import notificar_disponibilidades
+from biblioteca.estoque import divergencias, tirar_snapshots
+from biblioteca.models import Livro
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a quantidade disponível de cada livro com o razão do estoque '
+        '(snapshot + movimentos) e consolida os movimentos novos nos snapshots'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corrigir',
+            action='store_true',
+            help='Grava nos livros divergentes o valor calculado pelo razão',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Só relata as divergências, sem corrigir nem tirar snapshots',
+        )
+        parser.add_argument(
+            '--margem',
+            type=int,
+            default=60,
+            help='Segundos: movimentos mais novos que isso ficam para o próximo snapshot',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Modo DRY-RUN - Nenhuma alteração será feita'))
+
+        with transaction.atomic():
+            encontradas = list(divergencias())
+            for linha in encontradas:
+                self.stdout.write(
+                    f'Livro "{linha["titulo"]}" (id {linha["id"]}): '
+                    f'coluna {linha["quantidade_disponivel"]}, razão {linha["quantidade_razao"]}'
+                )
+
+            if options['corrigir'] and not dry_run and encontradas:
+                # UPDATE direto: a correção alinha a coluna ao razão e por
+                # isso não gera um movimento novo
+                for linha in encontradas:
+                    Livro.objects.filter(pk=linha['id']).update(quantidade_disponivel=linha['quantidade_razao'])
+                notificar_disponibilidades(
+                    (linha['id'], linha['quantidade_razao']) for linha in encontradas
+                )
+
+        if not encontradas:
+            self.stdout.write(self.style.SUCCESS('Nenhuma divergência entre os livros e o razão.'))
+        elif options['corrigir'] and not dry_run:
+            self.stdout.write(self.style.SUCCESS(f'{len(encontradas)} livros corrigidos pelo razão.'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(encontradas)} livros divergem do razão.'))
+
+        if not dry_run:
+            consolidados = tirar_snapshots(timedelta(seconds=options['margem']))
+            self.stdout.write(f'{consolidados} snapshots atualizados.')
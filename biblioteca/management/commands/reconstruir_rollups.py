@@ -0,0 +1,30 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from biblioteca.rollups import reconstruir
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói os totais diários de circulação usados pelos relatórios'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--inicio',
+            help='Primeiro dia a reconstruir (AAAA-MM-DD). Padrão: todo o histórico',
+        )
+        parser.add_argument(
+            '--fim',
+            help='Último dia a reconstruir (AAAA-MM-DD). Padrão: todo o histórico',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            inicio = datetime.date.fromisoformat(options['inicio']) if options['inicio'] else None
+            fim = datetime.date.fromisoformat(options['fim']) if options['fim'] else None
+        except ValueError as e:
+            raise CommandError(f'Data inválida: {e}')
+
+        self.stdout.write('Reconstruindo totais diários...')
+        reconstruir(inicio, fim)
+        self.stdout.write(self.style.SUCCESS('Totais diários reconstruídos com sucesso!'))
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from biblioteca.models import Autor, Livro, Categoria
+from biblioteca.utils import normalizar_nome
 
 User = get_user_model()
 
@@ -60,7 +61,10 @@ class Command(BaseCommand):
         ]
         
         for nome_autor in autores_exemplo:
-            autor, created = Autor.objects.get_or_create(nome=nome_autor)
+            autor, created = Autor.objects.get_or_create(
+                nome_normalizado=normalizar_nome(nome_autor),
+                defaults={'nome': nome_autor}
+            )
             if created:
                 self.stdout.write(f'Autor criado: {autor.nome}')
         
@@ -100,7 +104,7 @@ class Command(BaseCommand):
         
         for livro_data in livros_exemplo:
             try:
-                autor = Autor.objects.get(nome=livro_data['autor'])
+                autor = Autor.objects.get(nome_normalizado=normalizar_nome(livro_data['autor']))
                 livro, created = Livro.objects.get_or_create(
                     titulo=livro_data['titulo'],
                     autor=autor,
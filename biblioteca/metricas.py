@@ -0,0 +1,353 @@
+"""
+Métricas da aplicação no formato de exposição de texto do Prometheus.
+
+Contadores e histogramas são declarados uma vez neste módulo e atualizados
+nos pontos de circulação (``metricas.emprestimos.inc(evento='criado')``) e
+pelo ``MetricasMiddleware``. O endpoint ``/metrics`` devolve o texto gerado
+por ``exposicao()``.
+
+Com ``METRICAS_DIR`` configurado (obrigatório com vários workers do
+gunicorn) cada processo grava os seus valores num arquivo mapeado em memória
+naquele diretório, e a exposição soma os arquivos de todos os processos.
+Quando um worker sai, o mestre (hook ``child_exit`` do gunicorn) soma os
+contadores e histogramas dele em ``metricas_consolidado.db`` e apaga o
+arquivo, para que a reciclagem de workers não acumule arquivos.
+Sem ``METRICAS_DIR`` os valores ficam em um dicionário do próprio processo.
+"""
+import fcntl
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+
+
+class ArquivoMetricas:
+    """
+    Valores float64 indexados por chave num arquivo mapeado em memória.
+
+    Formato: 8 bytes com o número de bytes em uso e, em seguida, entradas
+    ``[u32 tamanho da chave][chave utf-8][alinhamento][f64 valor]``. Uma
+    entrada nova é escrita inteira antes de o cabeçalho ser atualizado, então
+    um leitor de outro processo nunca vê uma entrada pela metade.
+    """
+
+    TAMANHO_INICIAL = 64 * 1024
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._arquivo = open(caminho, 'a+b')
+        tamanho = os.fstat(self._arquivo.fileno()).st_size
+        if tamanho == 0:
+            tamanho = self.TAMANHO_INICIAL
+            self._arquivo.truncate(tamanho)
+        self._capacidade = tamanho
+        self._mapa = mmap.mmap(self._arquivo.fileno(), self._capacidade)
+        self._usado = struct.unpack_from('Q', self._mapa, 0)[0]
+        if self._usado == 0:
+            self._usado = 8
+            struct.pack_into('Q', self._mapa, 0, self._usado)
+        self._posicoes = {chave: posicao for chave, _, posicao in ler_entradas(self._mapa, self._usado)}
+
+    def somar(self, chave, valor):
+        posicao = self._posicoes.get(chave)
+        if posicao is None:
+            posicao = self._alocar(chave)
+        atual = struct.unpack_from('d', self._mapa, posicao)[0]
+        struct.pack_into('d', self._mapa, posicao, atual + valor)
+
+    def _alocar(self, chave):
+        dados = chave.encode()
+        inicio = self._usado
+        posicao = (inicio + 4 + len(dados) + 7) & ~7
+        fim = posicao + 8
+        if fim > self._capacidade:
+            while fim > self._capacidade:
+                self._capacidade *= 2
+            self._mapa.close()
+            self._arquivo.truncate(self._capacidade)
+            self._mapa = mmap.mmap(self._arquivo.fileno(), self._capacidade)
+
+        struct.pack_into('I', self._mapa, inicio, len(dados))
+        self._mapa[inicio + 4:inicio + 4 + len(dados)] = dados
+        struct.pack_into('d', self._mapa, posicao, 0.0)
+        self._usado = fim
+        struct.pack_into('Q', self._mapa, 0, fim)
+        self._posicoes[chave] = posicao
+        return posicao
+
+    def fechar(self):
+        self._mapa.close()
+        self._arquivo.close()
+
+
+def ler_entradas(buffer, usado):
+    """Percorre as entradas de um ArquivoMetricas: (chave, valor, posição do valor)."""
+    posicao = 8
+    while posicao < usado:
+        tamanho = struct.unpack_from('I', buffer, posicao)[0]
+        chave = bytes(buffer[posicao + 4:posicao + 4 + tamanho]).decode()
+        posicao = (posicao + 4 + tamanho + 7) & ~7
+        yield chave, struct.unpack_from('d', buffer, posicao)[0], posicao
+        posicao += 8
+
+
+class ValoresProcesso:
+    """Valores de um único processo (desenvolvimento, testes)."""
+
+    def __init__(self):
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def somar(self, chave, valor):
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0.0) + valor
+
+    def valores(self):
+        with self._lock:
+            return dict(self._valores)
+
+
+class ValoresMultiprocesso:
+    """Um ArquivoMetricas por processo em ``diretorio``; a leitura soma todos."""
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        os.makedirs(diretorio, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._arquivo = None
+
+    def somar(self, chave, valor):
+        with self._lock:
+            # Depois de um fork o worker abre o seu próprio arquivo
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._arquivo = ArquivoMetricas(os.path.join(self.diretorio, f'metricas_{self._pid}.db'))
+            self._arquivo.somar(chave, valor)
+
+    def valores(self):
+        # A trava compartilhada impede que a leitura pegue um worker morto
+        # já somado no consolidado mas ainda não apagado (ou o contrário)
+        total = {}
+        with _trava(self.diretorio, fcntl.LOCK_SH):
+            for caminho in glob.glob(os.path.join(self.diretorio, 'metricas_*.db')):
+                for chave, valor in _ler_arquivo(caminho).items():
+                    total[chave] = total.get(chave, 0.0) + valor
+        return total
+
+
+def _ler_arquivo(caminho):
+    try:
+        with open(caminho, 'rb') as f:
+            buffer = f.read()
+    except FileNotFoundError:
+        return {}
+    if len(buffer) < 8:
+        return {}
+    usado = struct.unpack_from('Q', buffer, 0)[0]
+    return {chave: valor for chave, valor, _ in ler_entradas(buffer, usado)}
+
+
+class _trava:
+    """flock em ``metricas.lock`` no diretório das métricas."""
+
+    def __init__(self, diretorio, modo):
+        self.caminho = os.path.join(diretorio, 'metricas.lock')
+        self.modo = modo
+
+    def __enter__(self):
+        self._arquivo = open(self.caminho, 'a')
+        fcntl.flock(self._arquivo, self.modo)
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._arquivo, fcntl.LOCK_UN)
+        self._arquivo.close()
+
+
+def _amostras_cumulativas():
+    """Amostras de contadores e histogramas: as únicas que sobrevivem ao processo."""
+    nomes = set()
+    for metrica in _metricas:
+        if metrica.tipo == 'counter':
+            nomes.add(metrica.nome)
+        elif metrica.tipo == 'histogram':
+            nomes.update(metrica.nome + sufixo for sufixo in ('_bucket', '_sum', '_count'))
+    return nomes
+
+
+def consolidar_processo(pid, diretorio=None):
+    """
+    Soma o arquivo do processo ``pid``, que já terminou, em
+    ``metricas_consolidado.db`` e o apaga. Contadores e histogramas continuam
+    valendo depois que o worker sai; gauges (valores do momento) do processo
+    morto são descartados. Chamado pelo mestre do gunicorn em ``child_exit``.
+    """
+    diretorio = diretorio or getattr(settings, 'METRICAS_DIR', None)
+    if not diretorio:
+        return
+    caminho = os.path.join(diretorio, f'metricas_{pid}.db')
+    if not os.path.exists(caminho):
+        return
+
+    cumulativas = _amostras_cumulativas()
+    with _trava(diretorio, fcntl.LOCK_EX):
+        consolidado = ArquivoMetricas(os.path.join(diretorio, 'metricas_consolidado.db'))
+        try:
+            for chave, valor in _ler_arquivo(caminho).items():
+                if valor and json.loads(chave)[0] in cumulativas:
+                    consolidado.somar(chave, valor)
+        finally:
+            consolidado.fechar()
+        os.remove(caminho)
+
+
+def limpar_diretorio(diretorio=None):
+    """Apaga os arquivos de uma execução anterior; chamar antes de subir os workers."""
+    diretorio = diretorio or getattr(settings, 'METRICAS_DIR', None)
+    if diretorio:
+        for caminho in glob.glob(os.path.join(diretorio, 'metricas_*.db')):
+            os.remove(caminho)
+
+
+_valores = None
+_valores_lock = threading.Lock()
+
+
+def armazenamento():
+    global _valores
+    if _valores is None:
+        with _valores_lock:
+            if _valores is None:
+                diretorio = getattr(settings, 'METRICAS_DIR', None)
+                _valores = ValoresMultiprocesso(diretorio) if diretorio else ValoresProcesso()
+    return _valores
+
+
+# Todas as métricas declaradas, na ordem da exposição
+_metricas = []
+
+
+def _chave(amostra, rotulos):
+    return json.dumps([amostra, sorted(rotulos.items())], ensure_ascii=False)
+
+
+class Metrica:
+    tipo = None
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        _metricas.append(self)
+
+    def _validar(self, rotulos):
+        if set(rotulos) != set(self.rotulos):
+            raise ValueError(f'{self.nome} espera os rótulos {self.rotulos}, recebeu {tuple(rotulos)}')
+        return {nome: str(valor) for nome, valor in rotulos.items()}
+
+
+class Contador(Metrica):
+    tipo = 'counter'
+
+    def inc(self, valor=1, **rotulos):
+        if valor:
+            armazenamento().somar(_chave(self.nome, self._validar(rotulos)), valor)
+
+    def amostras(self, valores):
+        for (amostra, rotulos), valor in sorted(valores.items()):
+            if amostra == self.nome:
+                yield self.nome, rotulos, valor
+
+
+class Histograma(Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, rotulos=(), limites=()):
+        super().__init__(nome, ajuda, rotulos)
+        self.limites = tuple(sorted(limites)) + (math.inf,)
+
+    def observar(self, valor, **rotulos):
+        rotulos = self._validar(rotulos)
+        loja = armazenamento()
+        # Cada observação soma 1 só no seu intervalo; a exposição acumula
+        limite = self.limites[bisect_left(self.limites, valor)]
+        loja.somar(_chave(self.nome + '_bucket', {**rotulos, 'le': _formatar(limite)}), 1)
+        loja.somar(_chave(self.nome + '_sum', rotulos), valor)
+        loja.somar(_chave(self.nome + '_count', rotulos), 1)
+
+    def amostras(self, valores):
+        por_serie = {}
+        for (amostra, rotulos), valor in valores.items():
+            if amostra == self.nome + '_bucket':
+                le = dict(rotulos)['le']
+                serie = tuple((k, v) for k, v in rotulos if k != 'le')
+                por_serie.setdefault(serie, {})[le] = valor
+        for serie, intervalos in sorted(por_serie.items()):
+            acumulado = 0.0
+            for limite in self.limites:
+                acumulado += intervalos.get(_formatar(limite), 0.0)
+                yield self.nome + '_bucket', serie + (('le', _formatar(limite)),), acumulado
+            yield self.nome + '_sum', serie, valores.get((self.nome + '_sum', serie), 0.0)
+            yield self.nome + '_count', serie, valores.get((self.nome + '_count', serie), 0.0)
+
+
+def _formatar(valor):
+    if valor == math.inf:
+        return '+Inf'
+    return repr(float(valor))
+
+
+def _escapar(valor):
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def exposicao():
+    """Texto no formato de exposição do Prometheus (versão 0.0.4)."""
+    valores = {}
+    for chave, valor in armazenamento().valores().items():
+        amostra, rotulos = json.loads(chave)
+        valores[(amostra, tuple(tuple(par) for par in rotulos))] = valor
+
+    linhas = []
+    for metrica in _metricas:
+        linhas.append(f'# HELP {metrica.nome} {metrica.ajuda}')
+        linhas.append(f'# TYPE {metrica.nome} {metrica.tipo}')
+        for amostra, rotulos, valor in metrica.amostras(valores):
+            texto_rotulos = ','.join(f'{nome}="{_escapar(v)}"' for nome, v in rotulos)
+            linhas.append(f'{amostra}{{{texto_rotulos}}} {_formatar(valor)}' if rotulos else f'{amostra} {_formatar(valor)}')
+    return '\n'.join(linhas) + '\n'
+
+
+reservas = Contador(
+    'biblioteca_reservas_total',
+    'Reservas por evento (criada, cancelada, expirada).',
+    rotulos=('evento',),
+)
+emprestimos = Contador(
+    'biblioteca_emprestimos_total',
+    'Empréstimos por evento (criado, devolvido, renovado).',
+    rotulos=('evento',),
+)
+conflitos_disponibilidade = Contador(
+    'biblioteca_conflitos_disponibilidade_total',
+    'Pedidos recusados porque o livro estava sem exemplares disponíveis.',
+    rotulos=('operacao',),
+)
+latencia_requisicao = Histograma(
+    'biblioteca_requisicao_segundos',
+    'Tempo de resposta por view (até o início da resposta, em streaming).',
+    rotulos=('view', 'metodo'),
+    limites=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+consultas_requisicao = Histograma(
+    'biblioteca_requisicao_consultas',
+    'Consultas SQL executadas por requisição, por view.',
+    rotulos=('view',),
+    limites=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
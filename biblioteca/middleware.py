@@ -0,0 +1,450 @@
+import json
+import mimetypes
+import os
+import time
+import zlib
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.text import compress_sequence, compress_string
+
+from . import metricas
+from .consultas_lentas import monitorar
+from .routers import usar_replica
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class MiddlewareHibrido:
+    """
+    Base dos middlewares do app, que funcionam nas duas pilhas: sob WSGI o
+    Django chama ``atender``; sob ASGI, ``__acall__`` direto no event loop,
+    sem passar a requisição inteira para uma thread (o que aconteceria com
+    um único middleware só síncrono na pilha).
+    """
+
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.atender(request)
+
+    def atender(self, request):
+        raise NotImplementedError
+
+    async def __acall__(self, request):
+        raise NotImplementedError
+
+
+def _instalar_wrappers(pilha, wrapper):
+    for conexao in connections.all():
+        pilha.enter_context(conexao.execute_wrapper(wrapper))
+
+
+async def _instalar_wrappers_async(pilha, wrapper):
+    # As conexões são por thread: sob ASGI as consultas da requisição (ORM
+    # assíncrono, views síncronas) rodam na thread do seu
+    # ThreadSensitiveContext, e é nela que os wrappers precisam entrar e sair
+    await sync_to_async(_instalar_wrappers)(pilha, wrapper)
+
+
+class ReplicaMiddleware(MiddlewareHibrido):
+    """
+    Liga o roteamento para a réplica nas views marcadas com
+    ``usar_replica = True``.
+
+    Depois de uma escrita bem-sucedida (POST, PUT, PATCH, DELETE) o cliente
+    recebe um cookie que fixa as leituras no primário por alguns segundos,
+    para que ele sempre veja o que acabou de gravar.
+    """
+
+    METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.cookie = getattr(settings, 'REPLICA_COOKIE_FIXACAO', 'fixar_primario')
+        self.segundos = getattr(settings, 'REPLICA_FIXACAO_SEGUNDOS', 10)
+        if iscoroutinefunction(self):
+            # Um process_view síncrono seria chamado pelo handler ASGI em uma
+            # thread, e o ContextVar mudaria em outro contexto
+            self.process_view = self.process_view_async
+
+    def atender(self, request):
+        request._replica_token = None
+        try:
+            response = self.get_response(request)
+        finally:
+            self.restaurar(request)
+        return self.fixar_primario(request, response)
+
+    async def __acall__(self, request):
+        request._replica_token = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.restaurar(request)
+        return self.fixar_primario(request, response)
+
+    def restaurar(self, request):
+        if request._replica_token is not None:
+            usar_replica.reset(request._replica_token)
+
+    def fixar_primario(self, request, response):
+        if request.method not in self.METODOS_SEGUROS and response.status_code < 400:
+            response.set_cookie(
+                self.cookie, '1',
+                max_age=self.segundos,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.rotear(request, view_func)
+
+    async def process_view_async(self, request, view_func, view_args, view_kwargs):
+        self.rotear(request, view_func)
+
+    def rotear(self, request, view_func):
+        if request.method not in self.METODOS_SEGUROS:
+            return
+        if request.COOKIES.get(self.cookie):
+            return
+
+        view_class = getattr(view_func, 'view_class', None)
+        if getattr(view_class or view_func, 'usar_replica', False):
+            request._replica_token = usar_replica.set(True)
+
+
+class MetricasMiddleware(MiddlewareHibrido):
+    """
+    Alimenta os histogramas de latência e de número de consultas por view
+    (nome da URL). Em respostas em streaming a latência vai até o início do
+    corpo, não até o fim do stream.
+    """
+
+    def atender(self, request):
+        contar = ContadorConsultas()
+        inicio = time.perf_counter()
+        with ExitStack() as pilha:
+            _instalar_wrappers(pilha, contar)
+            response = self.get_response(request)
+        self.observar(request, time.perf_counter() - inicio, contar.total)
+        return response
+
+    async def __acall__(self, request):
+        contar = ContadorConsultas()
+        inicio = time.perf_counter()
+        pilha = ExitStack()
+        await _instalar_wrappers_async(pilha, contar)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(pilha.close)()
+        self.observar(request, time.perf_counter() - inicio, contar.total)
+        return response
+
+    def observar(self, request, duracao, consultas):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'nao_resolvida'
+        metricas.latencia_requisicao.observar(duracao, view=view, metodo=request.method)
+        metricas.consultas_requisicao.observar(consultas, view=view)
+
+
+class ContadorConsultas:
+    """execute_wrapper que só conta as consultas."""
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+class ConsultasLentasMiddleware(MiddlewareHibrido):
+    """
+    Registra as consultas mais lentas que CONSULTAS_LENTAS_LIMITE_MS (ver
+    biblioteca.consultas_lentas). Fica fora da pilha sem
+    CONSULTAS_LENTAS_ATIVO.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'CONSULTAS_LENTAS_ATIVO', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def atender(self, request):
+        with ExitStack() as pilha:
+            _instalar_wrappers(pilha, monitorar(request))
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        pilha = ExitStack()
+        await _instalar_wrappers_async(pilha, monitorar(request))
+        try:
+            return await self.get_response(request)
+        finally:
+            await sync_to_async(pilha.close)()
+
+
+def codificacoes_aceitas(cabecalho):
+    """
+    Accept-Encoding como {codificação: q}. ``gzip;q=0`` quer dizer "não
+    aceito", não "aceito".
+    """
+    aceitas = {}
+    for item in cabecalho.split(','):
+        nome, _, parametros = item.partition(';')
+        nome = nome.strip().lower()
+        if not nome:
+            continue
+        q = 1.0
+        for parametro in parametros.split(';'):
+            chave, _, valor = parametro.partition('=')
+            if chave.strip().lower() == 'q':
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        aceitas[nome] = q
+    return aceitas
+
+
+def escolher_codificacao(cabecalho, disponiveis):
+    """
+    A codificação de ``disponiveis`` com o maior q aceito (> 0), ou None. No
+    empate vale a ordem de ``disponiveis``.
+    """
+    aceitas = codificacoes_aceitas(cabecalho)
+    melhor, melhor_q = None, 0.0
+    for codificacao in disponiveis:
+        q = aceitas.get(codificacao, aceitas.get('*', 0.0))
+        if q > melhor_q:
+            melhor, melhor_q = codificacao, q
+    return melhor
+
+
+class ArquivosEstaticosMiddleware(MiddlewareHibrido):
+    """
+    Serve os arquivos de STATIC_ROOT (gerados pelo collectstatic) dentro da
+    própria aplicação, já que o deploy não tem um servidor web na frente.
+
+    Os arquivos são indexados uma vez na inicialização. Quando o navegador
+    aceita, a cópia pré-comprimida (.br ou .gz) é enviada no lugar do
+    original. Nomes com hash do manifesto nunca mudam de conteúdo e recebem
+    cache de um ano com ``immutable``; os demais recebem um cache curto e,
+    quando expiram, são revalidados com If-Modified-Since (304).
+    Sem collectstatic (ambiente de desenvolvimento) o middleware não faz nada
+    e o runserver continua servindo os estáticos.
+    """
+
+    CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+    CACHE_CURTO = 'public, max-age=60'
+    CODIFICACOES = (('br', '.br'), ('gzip', '.gz'))
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.prefixo = settings.STATIC_URL
+        self.arquivos = self.indexar(settings.STATIC_ROOT)
+
+    def indexar(self, raiz):
+        arquivos = {}
+        if not raiz or not os.path.isdir(raiz):
+            return arquivos
+
+        hashed = set()
+        manifesto = os.path.join(raiz, 'staticfiles.json')
+        if os.path.exists(manifesto):
+            with open(manifesto) as f:
+                hashed = set(json.load(f).get('paths', {}).values())
+
+        for diretorio, _, nomes in os.walk(raiz):
+            for nome in nomes:
+                if nome.endswith(('.gz', '.br')):
+                    continue
+                caminho = os.path.join(diretorio, nome)
+                relativo = os.path.relpath(caminho, raiz).replace(os.sep, '/')
+                variantes = {
+                    codificacao: caminho + extensao
+                    for codificacao, extensao in self.CODIFICACOES
+                    if os.path.exists(caminho + extensao)
+                }
+                arquivos[self.prefixo + relativo] = {
+                    'caminho': caminho,
+                    'variantes': variantes,
+                    'tipo': mimetypes.guess_type(nome)[0] or 'application/octet-stream',
+                    'mtime': int(os.path.getmtime(caminho)),
+                    'modificado': http_date(os.path.getmtime(caminho)),
+                    'cache': self.CACHE_IMUTAVEL if relativo in hashed else self.CACHE_CURTO,
+                }
+        return arquivos
+
+    def atender(self, request):
+        arquivo = self.localizar(request)
+        if arquivo is None:
+            return self.get_response(request)
+        return self.servir(request, arquivo)
+
+    async def __acall__(self, request):
+        arquivo = self.localizar(request)
+        if arquivo is None:
+            return await self.get_response(request)
+        return self.servir(request, arquivo)
+
+    def localizar(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        return self.arquivos.get(request.path_info)
+
+    def servir(self, request, arquivo):
+        desde = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        if desde is not None and arquivo['mtime'] <= desde:
+            response = HttpResponseNotModified()
+        else:
+            codificacao = escolher_codificacao(
+                request.META.get('HTTP_ACCEPT_ENCODING', ''), arquivo['variantes']
+            )
+            caminho = arquivo['variantes'][codificacao] if codificacao else arquivo['caminho']
+            response = FileResponse(open(caminho, 'rb'), content_type=arquivo['tipo'])
+            if 'Content-Disposition' in response:
+                del response['Content-Disposition']
+            if codificacao:
+                response['Content-Encoding'] = codificacao
+        if arquivo['variantes']:
+            response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = arquivo['cache']
+        response['Last-Modified'] = arquivo['modificado']
+        return response
+
+
+# Bytes aleatórios no cabeçalho gzip, como no GZipMiddleware do Django
+# (mitigação do ataque BREACH)
+MAX_BYTES_ALEATORIOS = 100
+# Qualidade do brotli para respostas dinâmicas: 11 é lento demais por requisição
+QUALIDADE_BROTLI = 5
+
+
+def codificacoes_disponiveis():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def comprimir(conteudo, codificacao):
+    if codificacao == 'br':
+        return brotli.compress(conteudo, quality=QUALIDADE_BROTLI)
+    return compress_string(conteudo, max_random_bytes=MAX_BYTES_ALEATORIOS)
+
+
+def comprimir_iterador(partes, codificacao):
+    """
+    Comprime um iterador de bytes parte a parte, liberando cada parte assim
+    que é produzida (sem acumular a resposta inteira na memória).
+    """
+    if codificacao == 'gzip':
+        yield from compress_sequence(partes, max_random_bytes=MAX_BYTES_ALEATORIOS)
+        return
+    compressor = brotli.Compressor(quality=QUALIDADE_BROTLI)
+    for parte in partes:
+        saida = compressor.process(parte) + compressor.flush()
+        if saida:
+            yield saida
+    yield compressor.finish()
+
+
+async def comprimir_iterador_async(partes, codificacao):
+    if codificacao == 'br':
+        compressor = brotli.Compressor(quality=QUALIDADE_BROTLI)
+        async for parte in partes:
+            saida = compressor.process(parte) + compressor.flush()
+            if saida:
+                yield saida
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+        async for parte in partes:
+            saida = compressor.compress(parte) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if saida:
+                yield saida
+        yield compressor.flush()
+
+
+class CompressaoMiddleware(MiddlewareHibrido):
+    """
+    Comprime as respostas em brotli (se o pacote estiver instalado) ou gzip,
+    conforme o Accept-Encoding.
+
+    Respostas em streaming (exportação CSV, por exemplo) são comprimidas
+    parte a parte, sem serem acumuladas. Ficam de fora respostas pequenas,
+    as que já têm Content-Encoding (estáticos pré-comprimidos), tipos que
+    já são comprimidos (imagens, PDF, planilhas) e o stream SSE, que precisa
+    chegar ao navegador evento a evento.
+    """
+
+    TAMANHO_MINIMO = 500
+    TIPOS_COMPRIMIVEIS = (
+        'text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+    )
+    TIPOS_IGNORADOS = ('text/event-stream',)
+
+    def atender(self, request):
+        return self.processar(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.processar(request, await self.get_response(request))
+
+    def processar(self, request, response):
+        tipo = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if not tipo.startswith(self.TIPOS_COMPRIMIVEIS) or tipo in self.TIPOS_IGNORADOS:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and len(response.content) < self.TAMANHO_MINIMO:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        codificacao = self.negociar(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if codificacao is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = comprimir_iterador_async(
+                    response.streaming_content, codificacao
+                )
+            else:
+                response.streaming_content = comprimir_iterador(
+                    response.streaming_content, codificacao
+                )
+            # O tamanho final só é conhecido no fim do stream
+            del response.headers['Content-Length']
+        else:
+            comprimido = comprimir(response.content, codificacao)
+            if len(comprimido) >= len(response.content):
+                return response
+            response.content = comprimido
+            response.headers['Content-Length'] = str(len(comprimido))
+
+        # ETag forte vira fraca: o corpo mudou, mas a representação é a mesma
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = codificacao
+        return response
+
+    def negociar(self, aceitas):
+        return escolher_codificacao(aceitas, codificacoes_disponiveis())
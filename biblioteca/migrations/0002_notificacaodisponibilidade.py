@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacaoDisponibilidade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantidade_disponivel', models.PositiveIntegerField(verbose_name='Quantidade Disponível')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Data de Criação')),
+                ('livro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificacoes_disponibilidade', to='biblioteca.livro', verbose_name='Livro')),
+            ],
+            options={
+                'verbose_name': 'Notificação de Disponibilidade',
+                'verbose_name_plural': 'Notificações de Disponibilidade',
+                'ordering': ['id'],
+            },
+        ),
+    ]
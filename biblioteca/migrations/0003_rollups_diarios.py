@@ -0,0 +1,103 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+
+
+def preencher_rollups(apps, schema_editor):
+    Emprestimo = apps.get_model('biblioteca', 'Emprestimo')
+    RollupCirculacaoDia = apps.get_model('biblioteca', 'RollupCirculacaoDia')
+    RollupLivroDia = apps.get_model('biblioteca', 'RollupLivroDia')
+    RollupUsuarioDia = apps.get_model('biblioteca', 'RollupUsuarioDia')
+
+    emprestimos = Emprestimo.objects.annotate(dia=TruncDate('data_emprestimo')).order_by()
+    devolvidos = Q(status='devolvido')
+    RollupCirculacaoDia.objects.bulk_create(
+        [
+            RollupCirculacaoDia(**linha)
+            for linha in emprestimos.values('dia').annotate(
+                emprestimos=Count('id'),
+                devolvidos_no_prazo=Count('id', filter=devolvidos & Q(data_devolucao__lte=F('data_devolucao_prevista'))),
+                devolvidos_atrasados=Count('id', filter=devolvidos & Q(data_devolucao__gt=F('data_devolucao_prevista'))),
+            )
+        ],
+        batch_size=1000,
+    )
+    RollupLivroDia.objects.bulk_create(
+        [
+            RollupLivroDia(dia=linha['dia'], livro_id=linha['livro'], emprestimos=linha['total'])
+            for linha in emprestimos.values('dia', 'livro').annotate(total=Count('id'))
+        ],
+        batch_size=1000,
+    )
+    RollupUsuarioDia.objects.bulk_create(
+        [
+            RollupUsuarioDia(dia=linha['dia'], usuario_id=linha['usuario'])
+            for linha in emprestimos.values('dia', 'usuario').distinct()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0002_notificacaodisponibilidade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCirculacaoDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(unique=True, verbose_name='Dia')),
+                ('emprestimos', models.PositiveIntegerField(default=0, verbose_name='Empréstimos')),
+                ('devolvidos_no_prazo', models.PositiveIntegerField(default=0, verbose_name='Devolvidos no Prazo')),
+                ('devolvidos_atrasados', models.PositiveIntegerField(default=0, verbose_name='Devolvidos com Atraso')),
+            ],
+            options={
+                'verbose_name': 'Circulação Diária',
+                'verbose_name_plural': 'Circulação Diária',
+                'ordering': ['dia'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupUsuarioDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Dia')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups_diarios', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Usuário Ativo por Dia',
+                'verbose_name_plural': 'Usuários Ativos por Dia',
+                'ordering': ['dia'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupLivroDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Dia')),
+                ('emprestimos', models.PositiveIntegerField(default=0, verbose_name='Empréstimos')),
+                ('livro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups_diarios', to='biblioteca.livro', verbose_name='Livro')),
+            ],
+            options={
+                'verbose_name': 'Empréstimos do Livro por Dia',
+                'verbose_name_plural': 'Empréstimos dos Livros por Dia',
+                'ordering': ['dia'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='rollupusuariodia',
+            constraint=models.UniqueConstraint(fields=('dia', 'usuario'), name='unique_rollup_usuario_dia'),
+        ),
+        migrations.AddConstraint(
+            model_name='rolluplivrodia',
+            constraint=models.UniqueConstraint(fields=('dia', 'livro'), name='unique_rollup_livro_dia'),
+        ),
+        migrations.RunPython(preencher_rollups, migrations.RunPython.noop),
+    ]
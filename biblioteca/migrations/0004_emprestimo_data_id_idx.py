@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0003_rollups_diarios'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emprestimo',
+            index=models.Index(fields=['-data_emprestimo', '-id'], name='emprestimo_data_id_idx'),
+        ),
+    ]
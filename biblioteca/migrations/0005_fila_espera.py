@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0004_emprestimo_data_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilaEspera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicao', models.PositiveBigIntegerField(verbose_name='Ordem de Chegada')),
+                ('status', models.CharField(choices=[('aguardando', 'Aguardando'), ('promovida', 'Promovida'), ('cancelada', 'Cancelada')], default='aguardando', max_length=10, verbose_name='Status')),
+                ('data_entrada', models.DateTimeField(auto_now_add=True, verbose_name='Data de Entrada')),
+                ('livro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fila_espera', to='biblioteca.livro', verbose_name='Livro')),
+                ('reserva', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='origem_fila', to='biblioteca.reserva', verbose_name='Reserva Gerada')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='filas_espera', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Fila de Espera',
+                'verbose_name_plural': 'Filas de Espera',
+                'ordering': ['livro', 'posicao'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='filaespera',
+            constraint=models.UniqueConstraint(fields=('livro', 'posicao'), name='unique_posicao_fila_por_livro'),
+        ),
+        migrations.AddConstraint(
+            model_name='filaespera',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'aguardando')), fields=('usuario', 'livro'), name='unique_usuario_aguardando_por_livro'),
+        ),
+    ]
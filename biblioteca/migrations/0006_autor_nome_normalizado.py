@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+def preencher_nome_normalizado(apps, schema_editor):
+    from biblioteca.autores import mesclar_duplicados
+
+    Autor = apps.get_model('biblioteca', 'Autor')
+    Livro = apps.get_model('biblioteca', 'Livro')
+    mesclar_duplicados(Autor, Livro)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0005_fila_espera'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='autor',
+            name='nome_normalizado',
+            field=models.CharField(editable=False, max_length=100, null=True, verbose_name='Nome Normalizado'),
+        ),
+        migrations.RunPython(preencher_nome_normalizado, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='autor',
+            name='nome_normalizado',
+            field=models.CharField(editable=False, max_length=100, unique=True, verbose_name='Nome Normalizado'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def criar_snapshots_iniciais(apps, schema_editor):
+    # O razão começa com um snapshot da disponibilidade atual de cada livro
+    Livro = apps.get_model('biblioteca', 'Livro')
+    SnapshotEstoque = apps.get_model('biblioteca', 'SnapshotEstoque')
+    lote = []
+    for livro_id, quantidade in Livro.objects.values_list('id', 'quantidade_disponivel').iterator(chunk_size=5000):
+        lote.append(SnapshotEstoque(livro_id=livro_id, quantidade_disponivel=quantidade))
+        if len(lote) == 5000:
+            SnapshotEstoque.objects.bulk_create(lote)
+            lote = []
+    SnapshotEstoque.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0006_autor_nome_normalizado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotEstoque',
+            fields=[
+                ('livro', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot_estoque', serialize=False, to='biblioteca.livro', verbose_name='Livro')),
+                ('quantidade_disponivel', models.IntegerField(verbose_name='Quantidade Disponível')),
+                ('ultimo_movimento', models.BigIntegerField(default=0, verbose_name='Último Movimento')),
+                ('data', models.DateTimeField(auto_now=True, verbose_name='Data')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Estoque',
+                'verbose_name_plural': 'Snapshots de Estoque',
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimentoEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('emprestimo', 'Empréstimo'), ('devolucao', 'Devolução'), ('reserva', 'Reserva'), ('cancelamento', 'Cancelamento'), ('expiracao', 'Expiração'), ('ajuste', 'Ajuste')], max_length=15, verbose_name='Tipo')),
+                ('delta', models.IntegerField(verbose_name='Variação')),
+                ('data', models.DateTimeField(auto_now_add=True, verbose_name='Data')),
+                ('livro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimentos_estoque', to='biblioteca.livro', verbose_name='Livro')),
+            ],
+            options={
+                'verbose_name': 'Movimento de Estoque',
+                'verbose_name_plural': 'Movimentos de Estoque',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['livro', 'id'], name='movimento_livro_id_idx')],
+            },
+        ),
+        migrations.RunPython(criar_snapshots_iniciais, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0007_livro_razao_estoque'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExecucaoRecomendacoes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ultimo_emprestimo', models.BigIntegerField(verbose_name='Último Empréstimo')),
+                ('completa', models.BooleanField(default=False, verbose_name='Reconstrução Completa')),
+                ('livros_atualizados', models.PositiveIntegerField(default=0, verbose_name='Livros Atualizados')),
+                ('duracao', models.FloatField(default=0, verbose_name='Duração (s)')),
+                ('data', models.DateTimeField(auto_now_add=True, verbose_name='Data')),
+            ],
+            options={
+                'verbose_name': 'Execução de Recomendações',
+                'verbose_name_plural': 'Execuções de Recomendações',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LivroRecomendado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicao', models.PositiveSmallIntegerField(verbose_name='Posição')),
+                ('pontuacao', models.FloatField(verbose_name='Pontuação')),
+                ('usuarios_em_comum', models.PositiveIntegerField(verbose_name='Usuários em Comum')),
+                ('livro', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recomendacoes', to='biblioteca.livro', verbose_name='Livro')),
+                ('recomendado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='biblioteca.livro', verbose_name='Livro Recomendado')),
+            ],
+            options={
+                'verbose_name': 'Livro Recomendado',
+                'verbose_name_plural': 'Livros Recomendados',
+                'ordering': ['livro', 'posicao'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='livrorecomendado',
+            constraint=models.UniqueConstraint(fields=('livro', 'posicao'), name='recomendacao_livro_posicao_uniq'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def calcular_popularidade_inicial(apps, schema_editor):
+    # Mesmo cálculo de popularidade.recalcular(), com os modelos históricos
+    Emprestimo = apps.get_model('biblioteca', 'Emprestimo')
+    PopularidadeLivro = apps.get_model('biblioteca', 'PopularidadeLivro')
+    DecaimentoPopularidade = apps.get_model('biblioteca', 'DecaimentoPopularidade')
+    agora = timezone.now()
+    meia_vida = settings.POPULARIDADE_MEIA_VIDA_DIAS * 86400
+    por_livro = defaultdict(float)
+    emprestimos = Emprestimo.objects.order_by().values_list('livro_id', 'data_emprestimo')
+    for livro_id, data in emprestimos.iterator(chunk_size=5000):
+        por_livro[livro_id] += 2 ** ((data - agora).total_seconds() / meia_vida)
+    PopularidadeLivro.objects.bulk_create(
+        (
+            PopularidadeLivro(livro_id=livro_id, pontuacao=pontuacao)
+            for livro_id, pontuacao in por_livro.items()
+            if pontuacao >= 0.01
+        ),
+        batch_size=5000,
+    )
+    DecaimentoPopularidade.objects.create(data=agora)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0008_livro_recomendado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DecaimentoPopularidade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateTimeField(verbose_name='Referência')),
+                ('fator', models.FloatField(default=1, verbose_name='Fator Aplicado')),
+            ],
+            options={
+                'verbose_name': 'Decaimento de Popularidade',
+                'verbose_name_plural': 'Decaimentos de Popularidade',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PopularidadeLivro',
+            fields=[
+                ('livro', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularidade', serialize=False, to='biblioteca.livro', verbose_name='Livro')),
+                ('pontuacao', models.FloatField(default=0, verbose_name='Pontuação')),
+            ],
+            options={
+                'verbose_name': 'Popularidade do Livro',
+                'verbose_name_plural': 'Popularidade dos Livros',
+                'indexes': [models.Index(fields=['-pontuacao', 'livro'], name='popularidade_pontuacao_idx')],
+            },
+        ),
+        migrations.RunPython(calcular_popularidade_inicial, migrations.RunPython.noop),
+    ]
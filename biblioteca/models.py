@@ -1,11 +1,19 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.functional import cached_property
+import logging
+import time
+from . import metricas
+from .politicas import politica
+from .utils import normalizar_nome, subconsulta_contagem
+
 # Create your models here.
 
+logger = logging.getLogger(__name__)
+
 
 class Usuario(AbstractUser):
     TIPO_USUARIO = (
@@ -38,30 +46,65 @@ class Usuario(AbstractUser):
     def __str__(self):
         return f"{self.username} ({self.get_tipo_usuario_display()})"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Descartar a cópia usada pelo CachedModelBackend
+        invalidar_cache_usuario(self.pk)
+
 
     def is_admin(self):
         return self.tipo_usuario == 'admin'
 
 
+    @cached_property
+    def estatisticas(self):
+        """
+        Totais de reservas e empréstimos do usuário, calculados com uma única
+        consulta no primeiro acesso. Como ``request.user`` é a mesma
+        instância durante toda a requisição, os métodos abaixo e os
+        templates reutilizam o resultado sem novas consultas.
+        """
+        # Um COUNT por subconsulta: juntar reservas e empréstimos no mesmo
+        # JOIN multiplicaria as linhas de um pelas do outro
+        reservas = Reserva.objects.filter(usuario_id=self.pk)
+        emprestimos = Emprestimo.objects.filter(usuario_id=self.pk)
+        return Usuario.objects.filter(pk=self.pk).values(
+            total_reservas=subconsulta_contagem(reservas),
+            reservas_ativas=subconsulta_contagem(reservas.filter(status='ativa')),
+            total_emprestimos=subconsulta_contagem(emprestimos),
+            emprestimos_ativos=subconsulta_contagem(emprestimos.filter(status='ativo')),
+        ).get()
+    
+    def invalidar_estatisticas(self):
+        """Descarta os totais memorizados após criar ou alterar reservas/empréstimos."""
+        self.__dict__.pop('estatisticas', None)
+
     def pode_reservar(self):
-        reservas_ativas = self.reservas.filter(status='ativa').count()
-        return reservas_ativas < 3
+        return self.estatisticas['reservas_ativas'] < politica.max_reservas
     
     def get_active_reservations(self):
-        return self.reservas.filter(status='ativa').count()
+        return self.estatisticas['reservas_ativas']
     
     def get_active_loans(self):
-        return self.emprestimos.filter(status='ativo').count()
+        return self.estatisticas['emprestimos_ativos']
     
     def get_total_reservations(self):
-        return self.reservas.count()
+        return self.estatisticas['total_reservas']
     
     def get_total_loans(self):
-        return self.emprestimos.count()
+        return self.estatisticas['total_emprestimos']
 
 
 class Autor(models.Model):
     nome = models.CharField(max_length=100, verbose_name='Nome do Autor')
+    # Nome sem acentos, em caixa baixa e com espaços colapsados; garante que
+    # "Machado de Assis" e "machado de assis" sejam o mesmo autor
+    nome_normalizado = models.CharField(
+        max_length=100,
+        unique=True,
+        editable=False,
+        verbose_name='Nome Normalizado'
+    )
     data_cadastro = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Data de Cadastro'
@@ -69,6 +112,16 @@ class Autor(models.Model):
     
     def __str__(self):
         return self.nome
+    
+    def clean(self):
+        nome_normalizado = normalizar_nome(self.nome)
+        if Autor.objects.filter(nome_normalizado=nome_normalizado).exclude(pk=self.pk).exists():
+            raise ValidationError("Já existe um autor cadastrado com este nome.")
+    
+    def save(self, *args, **kwargs):
+        self.nome = ' '.join(self.nome.split())
+        self.nome_normalizado = normalizar_nome(self.nome)
+        super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = 'Autor'
@@ -127,6 +180,18 @@ class Livro(models.Model):
     def __str__(self):
         return self.titulo
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guarda o valor lido do banco para detectar mudanças de disponibilidade
+        instance._quantidade_disponivel_original = instance.__dict__.get('quantidade_disponivel')
+        return instance
+    
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        if fields is None or 'quantidade_disponivel' in fields:
+            self._quantidade_disponivel_original = self.__dict__.get('quantidade_disponivel')
+    
     def save(self, *args, **kwargs):
         
         if not self.pk:
@@ -135,7 +200,25 @@ class Livro(models.Model):
         if self.quantidade_disponivel > self.quantidade:
             self.quantidade_disponivel = self.quantidade
         
-        super().save(*args, **kwargs)
+        if self._state.adding:
+            original = 0
+        else:
+            # None quando a coluna não foi carregada (only/defer): o valor
+            # anterior é desconhecido e a diferença não pode ir para o razão
+            original = getattr(self, '_quantidade_disponivel_original', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            
+            # Registrar a mudança no livro-razão do estoque
+            if original is not None and self.quantidade_disponivel != original:
+                from .estoque import registrar_movimento
+                registrar_movimento(self.pk, self.quantidade_disponivel - original)
+        
+        # Avisar os clientes conectados ao stream de disponibilidade
+        if self.quantidade_disponivel != original:
+            from .disponibilidade import notificar_disponibilidade
+            notificar_disponibilidade(self.pk, self.quantidade_disponivel)
+            self._quantidade_disponivel_original = self.quantidade_disponivel
     
     def clean(self):
         if self.quantidade_disponivel > self.quantidade:
@@ -174,13 +257,38 @@ class Livro(models.Model):
     def get_author_display(self):
         return  ", ".join([autor.nome for autor in self.autor.all()]) if self.autor else "Nenhum Autor"
     
+    @staticmethod
+    def anotar_circulacao(queryset):
+        """
+        Anota os totais de circulação de cada livro na própria consulta.
+        get_total_loans, get_active_loans e get_active_reservations usam as
+        anotações quando presentes em vez de fazer um COUNT cada.
+        """
+        return queryset.annotate(
+            qtd_emprestimos=subconsulta_contagem(
+                Emprestimo.objects.filter(livro=models.OuterRef('pk'))
+            ),
+            qtd_emprestimos_ativos=subconsulta_contagem(
+                Emprestimo.objects.filter(livro=models.OuterRef('pk'), status='ativo')
+            ),
+            qtd_reservas_ativas=subconsulta_contagem(
+                Reserva.objects.filter(livro=models.OuterRef('pk'), status='ativa')
+            ),
+        )
+    
     def get_total_loans(self):
+        if hasattr(self, 'qtd_emprestimos'):
+            return self.qtd_emprestimos
         return self.emprestimos.count()
     
     def get_active_reservations(self):
+        if hasattr(self, 'qtd_reservas_ativas'):
+            return self.qtd_reservas_ativas
         return self.reservas.filter(status='ativa').count()
     
     def get_active_loans(self):
+        if hasattr(self, 'qtd_emprestimos_ativos'):
+            return self.qtd_emprestimos_ativos
         return self.emprestimos.filter(status='ativo').count()
     
     def delete(self, *args, **kwargs):
@@ -244,27 +352,18 @@ class Reserva(models.Model):
         return f"Reserva de {self.usuario.username} para {self.livro.titulo} ({self.get_status_display()})"
 
     def clean(self):
-        if not self.pk and not self.usuario.pode_reservar():
-            raise ValidationError("O usuário não pode fazer mais reservas ativas.")
-
-        if not self.pk and not self.livro.is_available():
-            raise ValidationError("O livro não está disponível para reserva.")
-
         if not self.pk:
-            reserva_existente = Reserva.objects.filter(
-                usuario=self.usuario,
-                livro=self.livro,
-                status='ativa'
-            ).exists()
-            if reserva_existente:
-                raise ValidationError("Já existe uma reserva ativa para este livro por este usuário.")
+            from .elegibilidade import Elegibilidade
+            erro = Elegibilidade.consultar(self.usuario, self.livro).erro_reserva()
+            if erro:
+                raise ValidationError(erro)
 
     def save(self, *args, **kwargs):
         is_new = not self.pk
         
-        # Set expiration date for new reservations (7 days from now)
+        # Set expiration date for new reservations
         if is_new and not self.data_expiracao:
-            self.data_expiracao = timezone.now() + timedelta(days=7)
+            self.data_expiracao = timezone.now() + politica.validade_reserva
 
         if not is_new:
             old_instance = Reserva.objects.get(pk=self.pk)
@@ -272,8 +371,19 @@ class Reserva(models.Model):
         super().save(*args, **kwargs)
 
         if is_new and self.status == 'ativa':
-            self.livro.quantidade_disponivel -= 1
-            self.livro.save()
+            metricas.reservas.inc(evento='criada')
+        elif not is_new and old_instance.status == 'ativa' and self.status in ('cancelada', 'expirada'):
+            metricas.reservas.inc(evento=self.status)
+
+        # Só descarta os totais se o usuário já estiver carregado (ex.: request.user)
+        if Reserva.usuario.is_cached(self):
+            self.usuario.invalidar_estatisticas()
+
+        if is_new and self.status == 'ativa':
+            from .estoque import motivo
+            with motivo('reserva'):
+                self.livro.quantidade_disponivel -= 1
+                self.livro.save()
 
 
 class Categoria(models.Model):
@@ -345,15 +455,29 @@ class Emprestimo(models.Model):
         verbose_name = 'Empréstimo'
         verbose_name_plural = 'Empréstimos'
         ordering = ['-data_emprestimo']
+        indexes = [
+            models.Index(fields=['-data_emprestimo', '-id'], name='emprestimo_data_id_idx'),
+        ]
     
     def __str__(self):
         return f"Empréstimo de {self.livro.titulo} para {self.usuario.username}"
     
     def save(self, *args, **kwargs):
-        if not self.pk:
-            # Novo empréstimo - definir data de devolução prevista (15 dias)
-            self.data_devolucao_prevista = timezone.now() + timedelta(days=15)
+        is_new = not self.pk
+        if is_new:
+            # Novo empréstimo - definir data de devolução prevista
+            self.data_devolucao_prevista = timezone.now() + politica.prazo_emprestimo
         super().save(*args, **kwargs)
+        
+        if Emprestimo.usuario.is_cached(self):
+            self.usuario.invalidar_estatisticas()
+        
+        if is_new:
+            from .popularidade import somar_emprestimo
+            from .rollups import registrar_emprestimo
+            registrar_emprestimo(self)
+            somar_emprestimo(self)
+            metricas.emprestimos.inc(evento='criado')
     
     def devolver(self):
         """
@@ -371,25 +495,40 @@ class Emprestimo(models.Model):
             if self.status != 'ativo':
                 return False
             
-            # Marcar como devolvido
-            self.data_devolucao = timezone.now()
-            self.status = 'devolvido'
-            
-            # Recalcular quantidade disponível do livro
-            self.livro.recalcular_quantidade_disponivel()
-            
-            # Salvar o empréstimo
-            self.save()
+            with transaction.atomic():
+                # Marcar como devolvido
+                self.data_devolucao = timezone.now()
+                self.status = 'devolvido'
+                
+                # Salvar o empréstimo antes de recalcular, para que ele
+                # não seja mais contado como ativo
+                self.save()
+                
+                # Recalcular quantidade disponível do livro
+                from .estoque import motivo
+                with motivo('devolucao'):
+                    self.livro.recalcular_quantidade_disponivel()
+                
+                # Atualizar os totais diários dos relatórios
+                from .rollups import registrar_devolucao
+                registrar_devolucao(self)
+                
+                # Passar o exemplar liberado para o próximo da fila de espera
+                FilaEspera.promover_proximo(self.livro)
             
+            metricas.emprestimos.inc(evento='devolvido')
             return True
             
-        except Exception as e:
-            print(f"Erro ao devolver empréstimo {self.pk}: {str(e)}")
+        except Exception:
+            logger.exception(
+                'Erro ao devolver empréstimo %s', self.pk,
+                extra={'evento': 'emprestimo.devolver_erro', 'emprestimo': self.pk, 'livro': self.livro_id},
+            )
             return False
     
     def renovar(self):
         """
-        Renova o empréstimo por mais 15 dias.
+        Renova o empréstimo por mais um prazo de empréstimo.
         
         Returns:
             bool: True se renovado com sucesso, False caso contrário
@@ -399,8 +538,8 @@ class Emprestimo(models.Model):
             return False
         
         try:
-            # Calcular nova data de devolução (adicionar 15 dias à data atual)
-            nova_data = timezone.now() + timedelta(days=15)
+            # Calcular nova data de devolução (um prazo a partir de hoje)
+            nova_data = timezone.now() + politica.prazo_emprestimo
             self.data_devolucao_prevista = nova_data
             self.renovacoes += 1
             
@@ -409,10 +548,14 @@ class Emprestimo(models.Model):
                 self.status = 'ativo'
             
             self.save()
+            metricas.emprestimos.inc(evento='renovado')
             return True
             
-        except Exception as e:
-            print(f"Erro ao renovar empréstimo {self.pk}: {str(e)}")
+        except Exception:
+            logger.exception(
+                'Erro ao renovar empréstimo %s', self.pk,
+                extra={'evento': 'emprestimo.renovar_erro', 'emprestimo': self.pk, 'livro': self.livro_id},
+            )
             return False
     
     def pode_renovar(self):
@@ -427,7 +570,7 @@ class Emprestimo(models.Model):
             return False
         
         # Não pode renovar se já atingiu o limite de renovações
-        if self.renovacoes >= 2:
+        if self.renovacoes >= politica.max_renovacoes:
             return False
         
         # Não pode renovar se não estiver ativo
@@ -436,9 +579,9 @@ class Emprestimo(models.Model):
         
         # Pode renovar se não estiver atrasado ou se estiver atrasado mas dentro de tolerância
         if self.is_atrasado():
-            # Permitir renovação se atraso for menor que 7 dias (tolerância)
+            # Permitir renovação se o atraso estiver dentro da tolerância
             dias_atraso = self.dias_atraso()
-            if dias_atraso > 7:
+            if dias_atraso > politica.tolerancia_atraso_dias:
                 return False
         
         return True
@@ -450,7 +593,7 @@ class Emprestimo(models.Model):
         Returns:
             int: Número de renovações restantes
         """
-        return max(0, 2 - self.renovacoes)
+        return max(0, politica.max_renovacoes - self.renovacoes)
     
     def is_atrasado(self):
         """Verifica se o empréstimo está atrasado"""
@@ -462,4 +605,523 @@ class Emprestimo(models.Model):
         """Calcula quantos dias de atraso"""
         if self.is_atrasado():
             return (timezone.now() - self.data_devolucao_prevista).days
-        return 0
\ No newline at end of file
+        return 0
+
+
+class NotificacaoDisponibilidade(models.Model):
+    """
+    Canal de notificação entre processos: cada mudança de
+    quantidade_disponivel gera uma linha, lida pelos streams SSE de todos
+    os workers a partir do último id que já viram.
+    """
+    livro = models.ForeignKey(
+        Livro,
+        on_delete=models.CASCADE,
+        related_name='notificacoes_disponibilidade',
+        verbose_name='Livro'
+    )
+    
+    quantidade_disponivel = models.PositiveIntegerField(
+        verbose_name='Quantidade Disponível'
+    )
+    
+    data_criacao = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Data de Criação'
+    )
+    
+    class Meta:
+        verbose_name = 'Notificação de Disponibilidade'
+        verbose_name_plural = 'Notificações de Disponibilidade'
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"{self.livro_id}: {self.quantidade_disponivel}"
+
+
+class RollupCirculacaoDia(models.Model):
+    """
+    Totais diários de circulação, mantidos incrementalmente pelo módulo
+    ``rollups``. As devoluções são contadas no dia do empréstimo (coorte),
+    como o relatório sempre fez ao filtrar empréstimos pela data.
+    """
+    dia = models.DateField(unique=True, verbose_name='Dia')
+    emprestimos = models.PositiveIntegerField(default=0, verbose_name='Empréstimos')
+    devolvidos_no_prazo = models.PositiveIntegerField(default=0, verbose_name='Devolvidos no Prazo')
+    devolvidos_atrasados = models.PositiveIntegerField(default=0, verbose_name='Devolvidos com Atraso')
+    
+    class Meta:
+        verbose_name = 'Circulação Diária'
+        verbose_name_plural = 'Circulação Diária'
+        ordering = ['dia']
+    
+    def __str__(self):
+        return f"{self.dia}: {self.emprestimos} empréstimos"
+
+
+class RollupLivroDia(models.Model):
+    dia = models.DateField(verbose_name='Dia')
+    livro = models.ForeignKey(
+        Livro,
+        on_delete=models.CASCADE,
+        related_name='rollups_diarios',
+        verbose_name='Livro'
+    )
+    emprestimos = models.PositiveIntegerField(default=0, verbose_name='Empréstimos')
+    
+    class Meta:
+        verbose_name = 'Empréstimos do Livro por Dia'
+        verbose_name_plural = 'Empréstimos dos Livros por Dia'
+        ordering = ['dia']
+        constraints = [
+            models.UniqueConstraint(fields=['dia', 'livro'], name='unique_rollup_livro_dia')
+        ]
+    
+    def __str__(self):
+        return f"{self.dia} - {self.livro_id}: {self.emprestimos}"
+
+
+class RollupUsuarioDia(models.Model):
+    """Usuários que pegaram ao menos um livro emprestado em cada dia."""
+    dia = models.DateField(verbose_name='Dia')
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name='rollups_diarios',
+        verbose_name='Usuário'
+    )
+    
+    class Meta:
+        verbose_name = 'Usuário Ativo por Dia'
+        verbose_name_plural = 'Usuários Ativos por Dia'
+        ordering = ['dia']
+        constraints = [
+            models.UniqueConstraint(fields=['dia', 'usuario'], name='unique_rollup_usuario_dia')
+        ]
+    
+    def __str__(self):
+        return f"{self.dia} - {self.usuario_id}"
+
+
+
+class FilaEspera(models.Model):
+    """
+    Fila de espera (FIFO) por um livro sem exemplares disponíveis.
+
+    ``posicao`` é um número crescente por livro, atribuído na entrada; a
+    posição do usuário na fila é quantos ainda aguardam com posição menor
+    ou igual à dele.
+    """
+    STATUS_FILA = [
+        ('aguardando', 'Aguardando'),
+        ('promovida', 'Promovida'),
+        ('cancelada', 'Cancelada'),
+    ]
+    
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name='filas_espera',
+        verbose_name='Usuário'
+    )
+    
+    livro = models.ForeignKey(
+        Livro,
+        on_delete=models.CASCADE,
+        related_name='fila_espera',
+        verbose_name='Livro'
+    )
+    
+    posicao = models.PositiveBigIntegerField(verbose_name='Ordem de Chegada')
+    
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_FILA,
+        default='aguardando',
+        verbose_name='Status'
+    )
+    
+    data_entrada = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Data de Entrada'
+    )
+    
+    reserva = models.OneToOneField(
+        Reserva,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='origem_fila',
+        verbose_name='Reserva Gerada'
+    )
+    
+    class Meta:
+        verbose_name = 'Fila de Espera'
+        verbose_name_plural = 'Filas de Espera'
+        ordering = ['livro', 'posicao']
+        constraints = [
+            # Também serve de índice (livro, posicao) para achar o próximo da fila
+            models.UniqueConstraint(
+                fields=['livro', 'posicao'],
+                name='unique_posicao_fila_por_livro'
+            ),
+            models.UniqueConstraint(
+                fields=['usuario', 'livro'],
+                condition=models.Q(status='aguardando'),
+                name='unique_usuario_aguardando_por_livro'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.usuario.username} na fila de {self.livro.titulo} ({self.get_status_display()})"
+    
+    @classmethod
+    def entrar(cls, usuario, livro):
+        """
+        Coloca o usuário no fim da fila do livro (ou devolve a entrada que
+        ele já tem).
+        """
+        existente = cls.objects.filter(usuario=usuario, livro=livro, status='aguardando').first()
+        if existente:
+            return existente
+        
+        for _ in range(3):
+            ultima = (
+                cls.objects.filter(livro=livro)
+                .order_by('-posicao')
+                .values_list('posicao', flat=True)
+                .first()
+            )
+            try:
+                with transaction.atomic():
+                    entrada = cls.objects.create(
+                        usuario=usuario,
+                        livro=livro,
+                        posicao=(ultima or 0) + 1
+                    )
+                invalidar_cache_fila(livro.pk)
+                return entrada
+            except IntegrityError:
+                # Outra entrada ocupou a mesma posição; tentar de novo
+                continue
+        raise ValidationError("Não foi possível entrar na fila de espera. Tente novamente.")
+    
+    @classmethod
+    def promover_proximo(cls, livro):
+        """
+        Transforma o primeiro da fila em uma reserva ativa, se houver
+        exemplar disponível. Deve ser chamado dentro da transação que liberou
+        o exemplar; usa um número fixo de consultas (mais uma a cada 20
+        inscritos que já não podem receber a reserva).
+        
+        Returns:
+            Reserva | None: a reserva criada, ou None se não havia ninguém
+            elegível na fila
+        """
+        if livro.quantidade_disponivel <= 0:
+            return None
+        
+        with transaction.atomic():
+            proximo = cls._proximo_elegivel(livro)
+            if proximo is None:
+                invalidar_cache_fila(livro.pk)
+                return None
+            
+            reserva = Reserva(usuario_id=proximo.usuario_id, livro=livro, status='ativa')
+            reserva.save()
+            
+            proximo.status = 'promovida'
+            proximo.reserva = reserva
+            proximo.save(update_fields=['status', 'reserva'])
+        
+        invalidar_cache_fila(livro.pk)
+        return reserva
+    
+    @classmethod
+    def _proximo_elegivel(cls, livro, lote=20):
+        """
+        Primeiro da fila que ainda pode receber a reserva. Quem já tem
+        reserva ativa ou empréstimo ativo do livro (pegou o exemplar por
+        outro caminho depois de entrar na fila) é retirado da fila: criar a
+        reserva violaria unique_active_reservation_per_user_and_book e
+        desfaria a devolução que está liberando o exemplar. Quem está no
+        limite de reservas ativas (politica.max_reservas) é pulado, mas
+        mantém a posição para quando liberar uma reserva.
+        """
+        aguardando = (
+            cls.objects.select_for_update()
+            .filter(livro=livro, status='aguardando')
+            .annotate(
+                tem_reserva=models.Exists(Reserva.objects.filter(
+                    usuario_id=models.OuterRef('usuario_id'), livro=livro, status='ativa'
+                )),
+                tem_emprestimo=models.Exists(Emprestimo.objects.filter(
+                    usuario_id=models.OuterRef('usuario_id'), livro=livro, status='ativo'
+                )),
+                reservas_ativas=subconsulta_contagem(Reserva.objects.filter(
+                    usuario_id=models.OuterRef('usuario_id'), status='ativa'
+                )),
+            )
+            .order_by('posicao')
+        )
+        # Os pulados continuam aguardando: o próximo lote começa depois deles
+        pulados = 0
+        while True:
+            entradas = list(aguardando[pulados:pulados + lote])
+            inelegiveis = []
+            escolhida = None
+            for entrada in entradas:
+                if entrada.tem_reserva or entrada.tem_emprestimo:
+                    inelegiveis.append(entrada.pk)
+                elif entrada.reservas_ativas >= politica.max_reservas:
+                    pulados += 1
+                else:
+                    escolhida = entrada
+                    break
+            if inelegiveis:
+                cls.objects.filter(pk__in=inelegiveis).update(status='cancelada')
+            if escolhida is not None or len(entradas) < lote:
+                return escolhida
+
+    def cancelar(self):
+        if self.status != 'aguardando':
+            return False
+        self.status = 'cancelada'
+        self.save(update_fields=['status'])
+        invalidar_cache_fila(self.livro_id)
+        return True
+    
+    def posicao_atual(self):
+        """Posição (1 = próximo) entre os que ainda aguardam este livro."""
+        if self.status != 'aguardando':
+            return None
+        return FilaEspera.objects.filter(
+            livro_id=self.livro_id,
+            status='aguardando',
+            posicao__lte=self.posicao
+        ).count()
+
+
+
+class MovimentoEstoque(models.Model):
+    """
+    Livro-razão do estoque: cada mudança de quantidade_disponivel gera uma
+    linha com o delta e o motivo. As linhas nunca são alteradas nem
+    apagadas; a disponibilidade de um livro pelo razão é o último
+    SnapshotEstoque mais a soma dos movimentos posteriores a ele.
+    """
+    TIPO_MOVIMENTO = [
+        ('emprestimo', 'Empréstimo'),
+        ('devolucao', 'Devolução'),
+        ('reserva', 'Reserva'),
+        ('cancelamento', 'Cancelamento'),
+        ('expiracao', 'Expiração'),
+        ('ajuste', 'Ajuste'),
+    ]
+    
+    livro = models.ForeignKey(
+        Livro,
+        on_delete=models.CASCADE,
+        related_name='movimentos_estoque',
+        verbose_name='Livro'
+    )
+    tipo = models.CharField(max_length=15, choices=TIPO_MOVIMENTO, verbose_name='Tipo')
+    delta = models.IntegerField(verbose_name='Variação')
+    data = models.DateTimeField(auto_now_add=True, verbose_name='Data')
+    
+    class Meta:
+        verbose_name = 'Movimento de Estoque'
+        verbose_name_plural = 'Movimentos de Estoque'
+        ordering = ['id']
+        indexes = [
+            # Soma dos movimentos de um livro após o snapshot (id > último)
+            models.Index(fields=['livro', 'id'], name='movimento_livro_id_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.livro_id}: {self.delta:+d} ({self.get_tipo_display()})"
+    
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValidationError("Movimentos de estoque não podem ser alterados.")
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValidationError("Movimentos de estoque não podem ser apagados.")
+
+
+class SnapshotEstoque(models.Model):
+    """
+    Disponibilidade de um livro consolidada até o movimento
+    ``ultimo_movimento`` (inclusive). Atualizado pelo comando
+    ``reconciliar_estoque``.
+    """
+    livro = models.OneToOneField(
+        Livro,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='snapshot_estoque',
+        verbose_name='Livro'
+    )
+    quantidade_disponivel = models.IntegerField(verbose_name='Quantidade Disponível')
+    ultimo_movimento = models.BigIntegerField(default=0, verbose_name='Último Movimento')
+    data = models.DateTimeField(auto_now=True, verbose_name='Data')
+    
+    class Meta:
+        verbose_name = 'Snapshot de Estoque'
+        verbose_name_plural = 'Snapshots de Estoque'
+    
+    def __str__(self):
+        return f"{self.livro_id}: {self.quantidade_disponivel} até #{self.ultimo_movimento}"
+
+class LivroRecomendado(models.Model):
+    """
+    Um dos livros mais pegos pelos mesmos usuários que pegaram ``livro``
+    ("quem pegou este também pegou"). As linhas são calculadas pelo comando
+    ``calcular_recomendacoes`` (biblioteca.recomendacoes) e a página do livro
+    as lê pela chave única (livro, posicao).
+    """
+    livro = models.ForeignKey(
+        Livro,
+        on_delete=models.CASCADE,
+        related_name='recomendacoes',
+        # Coberto pelo índice único (livro, posicao)
+        db_index=False,
+        verbose_name='Livro'
+    )
+    posicao = models.PositiveSmallIntegerField(verbose_name='Posição')
+    recomendado = models.ForeignKey(
+        Livro,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Livro Recomendado'
+    )
+    pontuacao = models.FloatField(verbose_name='Pontuação')
+    usuarios_em_comum = models.PositiveIntegerField(verbose_name='Usuários em Comum')
+    
+    class Meta:
+        verbose_name = 'Livro Recomendado'
+        verbose_name_plural = 'Livros Recomendados'
+        ordering = ['livro', 'posicao']
+        constraints = [
+            models.UniqueConstraint(fields=['livro', 'posicao'], name='recomendacao_livro_posicao_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.livro_id} -> {self.recomendado_id} ({self.pontuacao:.3f})"
+    
+    @classmethod
+    def do_livro(cls, livro_id, limite=10):
+        """Recomendações de um livro com o livro e o autor de cada uma, em uma consulta."""
+        return (
+            cls.objects
+            .filter(livro_id=livro_id)
+            .select_related('recomendado__autor')
+            .order_by('posicao')[:limite]
+        )
+
+class ExecucaoRecomendacoes(models.Model):
+    """
+    Uma execução de ``calcular_recomendacoes``. ``ultimo_emprestimo`` é a
+    marca d'água: a próxima execução incremental parte dos empréstimos com
+    id maior que ele.
+    """
+    ultimo_emprestimo = models.BigIntegerField(verbose_name='Último Empréstimo')
+    completa = models.BooleanField(default=False, verbose_name='Reconstrução Completa')
+    livros_atualizados = models.PositiveIntegerField(default=0, verbose_name='Livros Atualizados')
+    duracao = models.FloatField(default=0, verbose_name='Duração (s)')
+    data = models.DateTimeField(auto_now_add=True, verbose_name='Data')
+    
+    class Meta:
+        verbose_name = 'Execução de Recomendações'
+        verbose_name_plural = 'Execuções de Recomendações'
+        ordering = ['-id']
+    
+    def __str__(self):
+        tipo = 'completa' if self.completa else 'incremental'
+        return f"{self.data:%d/%m/%Y %H:%M} ({tipo}) até #{self.ultimo_emprestimo}"
+
+class PopularidadeLivro(models.Model):
+    """
+    Popularidade de um livro: os empréstimos somados com decaimento
+    exponencial (biblioteca.popularidade). Fica fora de Livro para que um
+    ``livro.save()`` com a instância antiga não desfaça os incrementos; só
+    livros com empréstimos recentes têm linha.
+    """
+    livro = models.OneToOneField(
+        Livro,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='popularidade',
+        verbose_name='Livro'
+    )
+    pontuacao = models.FloatField(default=0, verbose_name='Pontuação')
+    
+    class Meta:
+        verbose_name = 'Popularidade do Livro'
+        verbose_name_plural = 'Popularidade dos Livros'
+        indexes = [
+            models.Index(fields=['-pontuacao', 'livro'], name='popularidade_pontuacao_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.livro_id}: {self.pontuacao:.2f}"
+
+class DecaimentoPopularidade(models.Model):
+    """
+    Instante de referência das pontuações de PopularidadeLivro. ``decair_popularidade``
+    multiplica todas por ``fator`` e registra a nova referência.
+    """
+    data = models.DateTimeField(verbose_name='Referência')
+    fator = models.FloatField(default=1, verbose_name='Fator Aplicado')
+    
+    class Meta:
+        verbose_name = 'Decaimento de Popularidade'
+        verbose_name_plural = 'Decaimentos de Popularidade'
+        ordering = ['-id']
+    
+    def __str__(self):
+        return f"{self.data:%d/%m/%Y %H:%M} (x{self.fator:.4f})"
+
+def _chave_versao_fila(livro_id):
+    return f'fila:{livro_id}:versao'
+
+
+def versao_cache_fila(livro_id):
+    from django.core.cache import cache
+    # Versão inicial baseada no relógio, como em chave_cache_usuario: se a
+    # chave de versão for descartada, a nova nunca coincide com posições
+    # antigas ainda guardadas
+    return cache.get_or_set(_chave_versao_fila(livro_id), time.time_ns, None)
+
+
+def invalidar_cache_fila(livro_id):
+    """Muda a versão da fila do livro, descartando as posições em cache."""
+    from django.core.cache import cache
+    try:
+        cache.incr(_chave_versao_fila(livro_id))
+    except ValueError:
+        cache.set(_chave_versao_fila(livro_id), time.time_ns(), None)
+
+
+def _chave_versao_usuario(usuario_id):
+    return f'usuario:{usuario_id}:versao'
+
+
+def chave_cache_usuario(usuario_id):
+    """Chave do Usuario em cache; muda sempre que o usuário é salvo."""
+    from django.core.cache import cache
+    # Versão inicial baseada no relógio: se a chave de versão for descartada
+    # pelo cache, a nova versão nunca coincide com um objeto antigo ainda guardado
+    versao = cache.get_or_set(_chave_versao_usuario(usuario_id), time.time_ns, None)
+    return f'usuario:{usuario_id}:{versao}'
+
+
+def invalidar_cache_usuario(usuario_id):
+    """Muda a versão do usuário, descartando o objeto em cache."""
+    from django.core.cache import cache
+    try:
+        cache.incr(_chave_versao_usuario(usuario_id))
+    except ValueError:
+        cache.set(_chave_versao_usuario(usuario_id), time.time_ns(), None)
@@ -0,0 +1,39 @@
+"""
+Regras de circulação da biblioteca (limites e prazos) em um só lugar.
+
+Modelos, formulários, views, operações em lote e templates (via o context
+processor ``biblioteca.context_processors.politica``) leem os valores daqui
+em vez de repetir números soltos.
+"""
+from datetime import timedelta
+
+
+class PoliticaCirculacao:
+    def __init__(
+        self,
+        max_emprestimos=3,
+        max_reservas=3,
+        max_renovacoes=2,
+        tolerancia_atraso_dias=7,
+        prazo_emprestimo_dias=15,
+        validade_reserva_dias=7,
+    ):
+        self.max_emprestimos = max_emprestimos
+        self.max_reservas = max_reservas
+        self.max_renovacoes = max_renovacoes
+        # Dias de atraso ainda aceitos para renovar um empréstimo
+        self.tolerancia_atraso_dias = tolerancia_atraso_dias
+        # Prazo de um empréstimo novo e de cada renovação
+        self.prazo_emprestimo_dias = prazo_emprestimo_dias
+        self.validade_reserva_dias = validade_reserva_dias
+
+    @property
+    def prazo_emprestimo(self):
+        return timedelta(days=self.prazo_emprestimo_dias)
+
+    @property
+    def validade_reserva(self):
+        return timedelta(days=self.validade_reserva_dias)
+
+
+politica = PoliticaCirculacao()
@@ -0,0 +1,110 @@
+"""
+Popularidade dos livros com decaimento exponencial no tempo.
+
+Um empréstimo feito em t vale hoje 2^(-(agora - t) / meia-vida), com a
+meia-vida de ``POPULARIDADE_MEIA_VIDA_DIAS``. Para não reescrever todas as
+pontuações a cada empréstimo, elas ficam na escala de um instante de
+referência R, a última linha de DecaimentoPopularidade. Um empréstimo em t
+soma 2^((t - R) / meia-vida): o seu peso de hoje multiplicado por um fator
+que é o mesmo para todos os livros. Assim a ordem fica correta a qualquer
+momento e o top-N é um ``ORDER BY pontuacao DESC LIMIT N`` no índice.
+
+``decair()`` (comando ``decair_popularidade``, uma vez por noite) move a
+referência para agora. Ele multiplica as pontuações pelo fator do período,
+para que os números não cresçam sem limite, e apaga os livros que esfriaram.
+"""
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef
+from django.utils import timezone
+
+from .models import DecaimentoPopularidade, Emprestimo, PopularidadeLivro
+from .utils import incrementar, subconsulta_contagem
+
+
+# Abaixo disso o livro sai da tabela (um empréstimo, depois de ~7 meias-vidas)
+PONTUACAO_MINIMA = 0.01
+
+
+def _peso(data, referencia):
+    meia_vida = settings.POPULARIDADE_MEIA_VIDA_DIAS * 86400
+    return 2 ** ((data - referencia).total_seconds() / meia_vida)
+
+
+def referencia():
+    """Instante em cuja escala estão as pontuações."""
+    data = DecaimentoPopularidade.objects.order_by('-id').values_list('data', flat=True).first()
+    if data is None:
+        data = DecaimentoPopularidade.objects.create(data=timezone.now()).data
+    return data
+
+
+def somar_emprestimo(emprestimo):
+    incrementar(
+        PopularidadeLivro, {'livro_id': emprestimo.livro_id},
+        pontuacao=_peso(emprestimo.data_emprestimo, referencia()),
+    )
+
+
+def somar_emprestimos(emprestimos):
+    """Versão em lote de somar_emprestimo: um incremento por livro."""
+    base = referencia()
+    por_livro = Counter()
+    for emprestimo in emprestimos:
+        por_livro[emprestimo.livro_id] += _peso(emprestimo.data_emprestimo, base)
+    for livro_id, pontuacao in por_livro.items():
+        incrementar(PopularidadeLivro, {'livro_id': livro_id}, pontuacao=pontuacao)
+
+
+def decair(agora=None):
+    """Traz todas as pontuações para a referência ``agora``."""
+    agora = agora or timezone.now()
+    with transaction.atomic():
+        fator = _peso(referencia(), agora)
+        PopularidadeLivro.objects.update(pontuacao=F('pontuacao') * fator)
+        removidos, _ = PopularidadeLivro.objects.filter(pontuacao__lt=PONTUACAO_MINIMA).delete()
+        decaimento = DecaimentoPopularidade.objects.create(data=agora, fator=fator)
+    return decaimento, removidos
+
+
+def recalcular(tamanho_bloco=5000):
+    """Refaz as pontuações a partir de todos os empréstimos, na referência de agora."""
+    agora = timezone.now()
+    por_livro = defaultdict(float)
+    emprestimos = Emprestimo.objects.order_by().values_list('livro_id', 'data_emprestimo')
+    for livro_id, data in emprestimos.iterator(chunk_size=tamanho_bloco):
+        por_livro[livro_id] += _peso(data, agora)
+
+    linhas = [
+        PopularidadeLivro(livro_id=livro_id, pontuacao=pontuacao)
+        for livro_id, pontuacao in por_livro.items()
+        if pontuacao >= PONTUACAO_MINIMA
+    ]
+    with transaction.atomic():
+        PopularidadeLivro.objects.all().delete()
+        PopularidadeLivro.objects.bulk_create(linhas, batch_size=tamanho_bloco)
+        DecaimentoPopularidade.objects.create(data=agora)
+    return len(linhas)
+
+
+def mais_populares(limite=10):
+    """
+    Os ``limite`` livros mais populares, com o autor e o total de
+    empréstimos (``total_emprestimos``) só desses livros.
+    """
+    ranking = (
+        PopularidadeLivro.objects
+        .select_related('livro__autor')
+        .annotate(total_emprestimos=subconsulta_contagem(
+            Emprestimo.objects.filter(livro_id=OuterRef('livro_id'))
+        ))
+        .order_by('-pontuacao', 'livro_id')[:limite]
+    )
+    livros = []
+    for linha in ranking:
+        linha.livro.total_emprestimos = linha.total_emprestimos
+        linha.livro.pontuacao_popularidade = linha.pontuacao
+        livros.append(linha.livro)
+    return livros
@@ -0,0 +1,267 @@
+"""
+Recomendações "quem pegou este também pegou" para a página do livro.
+
+Os empréstimos viram uma matriz esparsa usuário × livro B, com 1 onde o
+usuário já pegou o livro (quantas vezes for). Ela é lida em blocos com
+``values_list``, sem instanciar Emprestimo. Dois livros coocorrem tantas
+vezes quantos usuários pegaram os dois: C = Bᵀ·B. Os vizinhos de cada livro
+são ordenados pela similaridade do cosseno, C[a, b] / √(nₐ·n_b) (n = usuários
+que pegaram o livro), que não empurra os mesmos campeões de empréstimo para
+todas as páginas. Os K primeiros vão para ``LivroRecomendado``.
+
+Com NumPy/SciPy instalados o produto é feito com matrizes esparsas; sem
+eles, com um contador por livro em Python (mesmo resultado, mais lento).
+
+``atualizar()`` é incremental. Um empréstimo novo de (u, b) só muda as
+linhas de C dos livros que u já pegou, b incluído. Apenas essas linhas são
+recalculadas, a partir do histórico dos usuários que pegaram esses livros.
+O n dos vizinhos vem do histórico inteiro (``_leitores``), não só dos
+usuários carregados, então as listas recalculadas saem iguais às da
+reconstrução completa. A popularidade n_b também muda e, com ela, a
+pontuação de b na lista de livros fora desse conjunto; essa diferença
+pequena só é corrigida na próxima reconstrução completa
+(``calcular_recomendacoes --completo``).
+"""
+import heapq
+import math
+import time
+from array import array
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Exists, Max, OuterRef
+
+from .models import Emprestimo, ExecucaoRecomendacoes, LivroRecomendado
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+
+VIZINHOS = 10
+# Um único leitor em comum ainda é coincidência
+MINIMO_EM_COMUM = 2
+# Parâmetros por consulta no IN (o SQLite antigo aceita 999)
+_TAMANHO_IN = 500
+
+
+def motor():
+    return 'numpy/scipy' if sparse is not None else 'python'
+
+
+def _em_blocos(ids, tamanho=_TAMANHO_IN):
+    ids = sorted(ids)
+    for inicio in range(0, len(ids), tamanho):
+        yield ids[inicio:inicio + tamanho]
+
+
+def _pares(emprestimos, tamanho_bloco):
+    """Pares (usuário, livro) distintos como dois arrays de inteiros."""
+    usuarios, livros = array('q'), array('q')
+    consulta = emprestimos.order_by().values_list('usuario_id', 'livro_id').distinct()
+    for usuario_id, livro_id in consulta.iterator(chunk_size=tamanho_bloco):
+        usuarios.append(usuario_id)
+        livros.append(livro_id)
+    return usuarios, livros
+
+
+def _ordenar(livro_id, candidatos, k):
+    """Os ``k`` melhores (pontuação, em comum, vizinho), sem o próprio livro."""
+    return heapq.nlargest(
+        k,
+        ((pontuacao, comum, vizinho) for pontuacao, comum, vizinho in candidatos if vizinho != livro_id),
+        key=lambda item: (item[0], item[1], -item[2]),
+    )
+
+
+def _leitores(emprestimos, livro_ids):
+    """Usuários distintos que já pegaram cada livro de ``livro_ids`` (o n do cosseno)."""
+    leitores = {}
+    for bloco in _em_blocos(livro_ids):
+        leitores.update(
+            emprestimos.filter(livro_id__in=bloco).order_by()
+            .values('livro').annotate(total=Count('usuario', distinct=True))
+            .values_list('livro', 'total')
+        )
+    return leitores
+
+
+def _vizinhos_python(usuarios, livros, alvos, k, minimo, leitores=None):
+    livros_por_usuario = defaultdict(list)
+    usuarios_por_livro = defaultdict(list)
+    for usuario_id, livro_id in zip(usuarios, livros):
+        livros_por_usuario[usuario_id].append(livro_id)
+        usuarios_por_livro[livro_id].append(usuario_id)
+    if leitores is None:
+        leitores = {livro_id: len(ids) for livro_id, ids in usuarios_por_livro.items()}
+
+    for livro_id in alvos:
+        quem_pegou = usuarios_por_livro.get(livro_id)
+        if not quem_pegou:
+            yield livro_id, []
+            continue
+        comuns = Counter()
+        for usuario_id in quem_pegou:
+            comuns.update(livros_por_usuario[usuario_id])
+        yield livro_id, _ordenar(livro_id, (
+            (comum / math.sqrt(leitores[livro_id] * leitores[vizinho]), comum, vizinho)
+            for vizinho, comum in comuns.items()
+            if comum >= minimo
+        ), k)
+
+
+def _vizinhos_numpy(usuarios, livros, alvos, k, minimo, leitores=None, linhas_por_bloco=2000):
+    usuarios = np.frombuffer(usuarios, dtype=np.int64)
+    livros = np.frombuffer(livros, dtype=np.int64)
+    ids_usuarios, linha_usuario = np.unique(usuarios, return_inverse=True)
+    ids_livros, coluna_livro = np.unique(livros, return_inverse=True)
+    matriz = sparse.csr_matrix(
+        (np.ones(len(livros), dtype=np.int32), (linha_usuario, coluna_livro)),
+        shape=(len(ids_usuarios), len(ids_livros)),
+    )
+    if leitores is None:
+        leitores = np.asarray(matriz.sum(axis=0)).ravel()
+    else:
+        leitores = np.array([leitores[livro_id] for livro_id in ids_livros.tolist()], dtype=np.float64)
+    transposta = matriz.T.tocsr()
+
+    alvos = np.asarray(sorted(alvos), dtype=np.int64)
+    if not len(ids_livros):
+        for livro_id in alvos.tolist():
+            yield livro_id, []
+        return
+    posicoes = np.searchsorted(ids_livros, alvos)
+    presentes = (posicoes < len(ids_livros)) & (ids_livros[np.minimum(posicoes, len(ids_livros) - 1)] == alvos)
+    for livro_id in alvos[~presentes]:
+        yield int(livro_id), []
+    colunas = posicoes[presentes]
+
+    # Bᵀ·B por blocos de linhas: a matriz inteira de coocorrência não
+    # precisa caber na memória
+    for inicio in range(0, len(colunas), linhas_por_bloco):
+        bloco = colunas[inicio:inicio + linhas_por_bloco]
+        coocorrencia = (transposta[bloco] @ matriz).tocsr()
+        for linha, coluna in enumerate(bloco):
+            livro_id = int(ids_livros[coluna])
+            fatia = slice(coocorrencia.indptr[linha], coocorrencia.indptr[linha + 1])
+            vizinhos = coocorrencia.indices[fatia]
+            comuns = coocorrencia.data[fatia]
+            manter = (vizinhos != coluna) & (comuns >= minimo)
+            vizinhos, comuns = vizinhos[manter], comuns[manter]
+            pontuacoes = comuns / np.sqrt(leitores[coluna] * leitores[vizinhos])
+            if len(pontuacoes) > k:
+                # Mantém os empates com o k-ésimo: o desempate fica com _ordenar
+                melhores = pontuacoes >= np.partition(pontuacoes, -k)[-k]
+                vizinhos, comuns, pontuacoes = vizinhos[melhores], comuns[melhores], pontuacoes[melhores]
+            yield livro_id, _ordenar(livro_id, zip(
+                pontuacoes.tolist(), comuns.tolist(), ids_livros[vizinhos].tolist()
+            ), k)
+
+
+def calcular_vizinhos(usuarios, livros, alvos, k=VIZINHOS, minimo=MINIMO_EM_COMUM, leitores=None):
+    """
+    Gera (livro_id, [(pontuação, usuários em comum, vizinho_id), ...]) para
+    cada livro de ``alvos``, a partir dos pares (usuário, livro) distintos.
+    ``leitores`` ({livro_id: usuários distintos}) é obrigatório quando os
+    pares são só parte do histórico; sem ele o n sai dos próprios pares.
+    """
+    funcao = _vizinhos_numpy if sparse is not None else _vizinhos_python
+    yield from funcao(usuarios, livros, alvos, k, minimo, leitores)
+
+
+def _gravar(vizinhos, tamanho_lote=1000):
+    """Substitui as recomendações de cada livro gerado por ``vizinhos``. Devolve quantos livros."""
+    atualizados = 0
+    livros, linhas = [], []
+
+    def descarregar():
+        with transaction.atomic():
+            for bloco in _em_blocos(livros):
+                LivroRecomendado.objects.filter(livro_id__in=bloco).delete()
+            LivroRecomendado.objects.bulk_create(linhas, batch_size=tamanho_lote)
+        livros.clear()
+        linhas.clear()
+
+    for livro_id, melhores in vizinhos:
+        atualizados += 1
+        livros.append(livro_id)
+        linhas.extend(
+            LivroRecomendado(
+                livro_id=livro_id, posicao=posicao, recomendado_id=vizinho,
+                pontuacao=pontuacao, usuarios_em_comum=comum,
+            )
+            for posicao, (pontuacao, comum, vizinho) in enumerate(melhores, 1)
+        )
+        if len(livros) >= tamanho_lote:
+            descarregar()
+    descarregar()
+    return atualizados
+
+
+def reconstruir(k=VIZINHOS, minimo=MINIMO_EM_COMUM, tamanho_bloco=5000):
+    """Recalcula as recomendações de todos os livros a partir de todo o histórico."""
+    inicio = time.perf_counter()
+    # A marca é lida antes: empréstimos criados durante a execução ficam
+    # para a próxima
+    marca = Emprestimo.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0
+    usuarios, livros = _pares(Emprestimo.objects.filter(id__lte=marca), tamanho_bloco)
+
+    # Cada lote de livros é trocado na sua própria transação: a página do
+    # livro continua lendo a lista antiga enquanto a nova é calculada
+    atualizados = _gravar(calcular_vizinhos(usuarios, livros, set(livros), k, minimo))
+    LivroRecomendado.objects.filter(
+        ~Exists(Emprestimo.objects.filter(livro_id=OuterRef('livro_id')))
+    ).delete()
+    return ExecucaoRecomendacoes.objects.create(
+        ultimo_emprestimo=marca,
+        completa=True,
+        livros_atualizados=atualizados,
+        duracao=time.perf_counter() - inicio,
+    )
+
+
+def atualizar(k=VIZINHOS, minimo=MINIMO_EM_COMUM, tamanho_bloco=5000):
+    """
+    Recalcula só os livros afetados pelos empréstimos criados desde a última
+    execução. Sem execução anterior, faz a reconstrução completa.
+    """
+    ultima = ExecucaoRecomendacoes.objects.order_by('-id').first()
+    if ultima is None:
+        return reconstruir(k, minimo, tamanho_bloco)
+
+    inicio = time.perf_counter()
+    marca = Emprestimo.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0
+    historico = Emprestimo.objects.filter(id__lte=marca).order_by()
+    usuarios_novos = set(
+        historico.filter(id__gt=ultima.ultimo_emprestimo).values_list('usuario_id', flat=True).distinct()
+    )
+
+    # Livros cujas linhas de C mudaram: tudo o que esses usuários já pegaram
+    afetados = set()
+    for bloco in _em_blocos(usuarios_novos):
+        afetados.update(historico.filter(usuario_id__in=bloco).values_list('livro_id', flat=True).distinct())
+    # Para recalcular essas linhas basta o histórico de quem pegou esses livros
+    leitores = set()
+    for bloco in _em_blocos(afetados):
+        leitores.update(historico.filter(livro_id__in=bloco).values_list('usuario_id', flat=True).distinct())
+    usuarios, livros = array('q'), array('q')
+    for bloco in _em_blocos(leitores):
+        parte_usuarios, parte_livros = _pares(historico.filter(usuario_id__in=bloco), tamanho_bloco)
+        usuarios.extend(parte_usuarios)
+        livros.extend(parte_livros)
+
+    # Os pares carregados são só os desses usuários: o n de cada vizinho
+    # contado neles sairia menor que o real e inflaria a pontuação
+    leitores_totais = _leitores(historico, set(livros))
+
+    # Se a execução parar no meio a marca não avança e a próxima refaz os
+    # mesmos livros: o cálculo parte do histórico, não de incrementos
+    atualizados = _gravar(calcular_vizinhos(usuarios, livros, afetados, k, minimo, leitores_totais))
+    return ExecucaoRecomendacoes.objects.create(
+        ultimo_emprestimo=marca,
+        completa=False,
+        livros_atualizados=atualizados,
+        duracao=time.perf_counter() - inicio,
+    )
@@ -0,0 +1,139 @@
+"""
+Logs estruturados em JSON sem bloquear a requisição.
+
+O ``ManipuladorFila`` só enfileira o registro; uma thread (``QueueListener``)
+formata e grava em stderr e, se configurado, num arquivo. Assim a escrita em
+disco nunca acontece no caminho da requisição.
+
+Com o gunicorn todos os workers gravam no mesmo arquivo, então a rotação fica
+com o logrotate (sem ``copytruncate``): o ``WatchedFileHandler`` percebe que o
+arquivo foi movido e reabre o caminho em cada processo. Uma rotação feita pelo
+próprio Python renomearia o arquivo a partir de um worker enquanto os outros
+continuariam gravando no antigo.
+
+Os eventos de circulação usam ``registrar_evento``::
+
+    registrar_evento(logger, 'emprestimo.devolvido', usuario=..., emprestimo=..., livro=...)
+
+que vira uma linha como
+``{"data": "...", "nivel": "INFO", "logger": "biblioteca.views", "evento": "emprestimo.devolvido", ...}``.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import weakref
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+
+
+# Atributos que todo LogRecord tem; o que sobrar veio de extra=
+_ATRIBUTOS_PADRAO = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro, com os campos passados em ``extra``."""
+
+    def format(self, record):
+        dados = {
+            'data': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensagem': record.getMessage(),
+        }
+        for chave, valor in vars(record).items():
+            if chave not in _ATRIBUTOS_PADRAO and not chave.startswith('_'):
+                dados[chave] = valor
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            dados['excecao'] = record.exc_text
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class ManipuladorFila(QueueHandler):
+    """
+    QueueHandler que já traz o próprio QueueListener.
+
+    Args:
+        arquivo: caminho do log (rotação externa); None grava só em stderr
+    """
+
+    def __init__(self, arquivo=None):
+        super().__init__(queue.SimpleQueue())
+        formatador = FormatadorJSON()
+        destinos = [logging.StreamHandler(sys.stderr)]
+        if arquivo:
+            os.makedirs(os.path.dirname(os.path.abspath(arquivo)), exist_ok=True)
+            destinos.append(WatchedFileHandler(arquivo, delay=True))
+        for destino in destinos:
+            destino.setFormatter(formatador)
+        self.destinos = destinos
+        self.listener = None
+        self.iniciar()
+        _ativos.add(self)
+
+    def iniciar(self):
+        self.listener = QueueListener(self.queue, *self.destinos)
+        self.listener.start()
+
+    def parar(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def close(self):
+        # Chamado pelo dictConfig ao trocar a configuração e pelo
+        # logging.shutdown na saída: esvazia a fila antes de fechar os destinos
+        _ativos.discard(self)
+        self.parar()
+        for destino in self.destinos:
+            destino.close()
+        super().close()
+
+    def _reiniciar_no_filho(self):
+        self.queue = queue.SimpleQueue()
+        self.listener = None
+        self.iniciar()
+
+    def prepare(self, record):
+        # Guarda a mensagem e o traceback já renderizados, mas mantém os
+        # campos de extra no registro para o FormatadorJSON
+        record = logging.makeLogRecord(vars(record))
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+# Manipuladores com a thread ativa. Os ganchos de saída e de fork são
+# registrados uma vez só, aqui, e não a cada dictConfig; um manipulador
+# fechado sai do conjunto e deixa de ser reiniciado nos filhos.
+_ativos = weakref.WeakSet()
+
+
+def _parar_ativos():
+    for manipulador in list(_ativos):
+        manipulador.parar()
+
+
+def _reiniciar_ativos_no_filho():
+    # A thread não sobrevive ao fork (gunicorn com preload_app): cada
+    # worker começa com uma fila vazia e a sua própria thread
+    for manipulador in list(_ativos):
+        manipulador._reiniciar_no_filho()
+
+
+atexit.register(_parar_ativos)
+os.register_at_fork(after_in_child=_reiniciar_ativos_no_filho)
+
+
+def registrar_evento(logger, evento, nivel=logging.INFO, **campos):
+    """Registra um evento de circulação com os campos estruturados em ``campos``."""
+    if logger.isEnabledFor(nivel):
+        logger.log(nivel, evento, extra={'evento': evento, **campos})
@@ -0,0 +1,168 @@
+"""
+Tabelas de totais diários (rollups) usadas pelo RelatoriosView.
+
+Os rollups são atualizados a cada empréstimo e devolução e podem ser
+reconstruídos a partir dos empréstimos com ``manage.py reconstruir_rollups``.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Emprestimo, Livro, RollupCirculacaoDia, RollupLivroDia, RollupUsuarioDia
+from .utils import incrementar
+
+
+def _dia(data):
+    return timezone.localdate(data)
+
+
+def registrar_emprestimo(emprestimo):
+    dia = _dia(emprestimo.data_emprestimo)
+    incrementar(RollupCirculacaoDia, {'dia': dia}, emprestimos=1)
+    incrementar(RollupLivroDia, {'dia': dia, 'livro_id': emprestimo.livro_id}, emprestimos=1)
+    RollupUsuarioDia.objects.get_or_create(dia=dia, usuario_id=emprestimo.usuario_id)
+
+
+def registrar_devolucao(emprestimo):
+    campo = (
+        'devolvidos_no_prazo'
+        if emprestimo.data_devolucao <= emprestimo.data_devolucao_prevista
+        else 'devolvidos_atrasados'
+    )
+    incrementar(RollupCirculacaoDia, {'dia': _dia(emprestimo.data_emprestimo)}, **{campo: 1})
+
+
+def registrar_emprestimos(emprestimos):
+    """Versão em lote de registrar_emprestimo: um incremento por dia/livro."""
+    por_dia = Counter()
+    por_livro = Counter()
+    usuarios = set()
+    for emprestimo in emprestimos:
+        dia = _dia(emprestimo.data_emprestimo)
+        por_dia[dia] += 1
+        por_livro[(dia, emprestimo.livro_id)] += 1
+        usuarios.add((dia, emprestimo.usuario_id))
+
+    for dia, total in por_dia.items():
+        incrementar(RollupCirculacaoDia, {'dia': dia}, emprestimos=total)
+    for (dia, livro_id), total in por_livro.items():
+        incrementar(RollupLivroDia, {'dia': dia, 'livro_id': livro_id}, emprestimos=total)
+    RollupUsuarioDia.objects.bulk_create(
+        [RollupUsuarioDia(dia=dia, usuario_id=usuario_id) for dia, usuario_id in usuarios],
+        ignore_conflicts=True,
+    )
+
+
+def registrar_devolucoes(devolucoes):
+    """
+    Versão em lote de registrar_devolucao. ``devolucoes`` são dicionários com
+    data_emprestimo, data_devolucao e data_devolucao_prevista.
+    """
+    por_dia = Counter()
+    for devolucao in devolucoes:
+        campo = (
+            'devolvidos_no_prazo'
+            if devolucao['data_devolucao'] <= devolucao['data_devolucao_prevista']
+            else 'devolvidos_atrasados'
+        )
+        por_dia[(_dia(devolucao['data_emprestimo']), campo)] += 1
+
+    for (dia, campo), total in por_dia.items():
+        incrementar(RollupCirculacaoDia, {'dia': dia}, **{campo: total})
+
+
+def _filtro_periodo(inicio, fim, campo='dia'):
+    filtro = Q()
+    if inicio:
+        filtro &= Q(**{f'{campo}__gte': inicio})
+    if fim:
+        filtro &= Q(**{f'{campo}__lte': fim})
+    return filtro
+
+
+def reconstruir(inicio=None, fim=None, tamanho_lote=1000):
+    """Recalcula os rollups do período (datas inclusivas) a partir dos empréstimos."""
+    periodo = _filtro_periodo(inicio, fim)
+    emprestimos = (
+        Emprestimo.objects
+        .annotate(dia=TruncDate('data_emprestimo'))
+        .filter(periodo)
+        .order_by()
+    )
+    devolvidos = Q(status='devolvido')
+
+    with transaction.atomic():
+        RollupCirculacaoDia.objects.filter(periodo).delete()
+        RollupLivroDia.objects.filter(periodo).delete()
+        RollupUsuarioDia.objects.filter(periodo).delete()
+
+        RollupCirculacaoDia.objects.bulk_create(
+            (
+                RollupCirculacaoDia(**linha)
+                for linha in emprestimos.values('dia').annotate(
+                    emprestimos=Count('id'),
+                    devolvidos_no_prazo=Count('id', filter=devolvidos & Q(data_devolucao__lte=F('data_devolucao_prevista'))),
+                    devolvidos_atrasados=Count('id', filter=devolvidos & Q(data_devolucao__gt=F('data_devolucao_prevista'))),
+                )
+            ),
+            batch_size=tamanho_lote,
+        )
+        RollupLivroDia.objects.bulk_create(
+            (
+                RollupLivroDia(dia=linha['dia'], livro_id=linha['livro'], emprestimos=linha['total'])
+                for linha in emprestimos.values('dia', 'livro').annotate(total=Count('id'))
+            ),
+            batch_size=tamanho_lote,
+        )
+        RollupUsuarioDia.objects.bulk_create(
+            (
+                RollupUsuarioDia(dia=linha['dia'], usuario_id=linha['usuario'])
+                for linha in emprestimos.values('dia', 'usuario').distinct()
+            ),
+            batch_size=tamanho_lote,
+        )
+
+
+def resumo_periodo(inicio=None, fim=None, limite_populares=10):
+    """
+    Estatísticas do relatório para o período (datas inclusivas), somando
+    apenas linhas dos rollups: uma consulta por tabela de rollup.
+    """
+    periodo = _filtro_periodo(inicio, fim)
+
+    totais = RollupCirculacaoDia.objects.filter(periodo).aggregate(
+        emprestimos=Sum('emprestimos', default=0),
+        no_prazo=Sum('devolvidos_no_prazo', default=0),
+        atrasados=Sum('devolvidos_atrasados', default=0),
+    )
+    total_devolvidos = totais['no_prazo'] + totais['atrasados']
+    taxa_devolucao = (
+        (totais['no_prazo'] / total_devolvidos) * 100 if total_devolvidos > 0 else 0
+    )
+
+    # Não entra no aggregate acima: é outra tabela, sem relação com
+    # RollupCirculacaoDia, e o aggregate() do Django só aceita agregações
+    # (uma subconsulta escalar ali é recusada)
+    usuarios_ativos = (
+        RollupUsuarioDia.objects.filter(periodo)
+        .values('usuario').distinct().count()
+    )
+
+    # Ranking e livros (com autor) na mesma consulta: o filtro do período
+    # vem antes do Sum, então só as linhas do período são somadas
+    livros_populares = list(
+        Livro.objects.select_related('autor')
+        .filter(_filtro_periodo(inicio, fim, campo='rollups_diarios__dia'), rollups_diarios__isnull=False)
+        .annotate(total_emprestimos=Sum('rollups_diarios__emprestimos'))
+        .order_by('-total_emprestimos', 'pk')[:limite_populares]
+    )
+
+    return {
+        'total_emprestimos': totais['emprestimos'],
+        'usuarios_ativos': usuarios_ativos,
+        'taxa_devolucao': round(taxa_devolucao, 2),
+        'livros_populares': livros_populares,
+    }
@@ -0,0 +1,38 @@
+from contextvars import ContextVar
+
+from django.db import connections
+
+
+# Indica se as leituras da requisição atual podem ir para a réplica.
+# É ligado pelo ReplicaMiddleware apenas nas views marcadas com
+# ``usar_replica = True`` e quando a requisição não está fixada no primário.
+usar_replica = ContextVar('usar_replica', default=False)
+
+REPLICA_ALIAS = 'replica'
+
+
+def replica_configurada():
+    return REPLICA_ALIAS in connections.databases
+
+
+class ReplicaRouter:
+    """
+    Envia as leituras das views de relatório/listagem para a réplica e
+    mantém todas as escritas (e leituras do fluxo normal) no banco 'default'.
+    """
+
+    def db_for_read(self, model, **hints):
+        if usar_replica.get() and replica_configurada():
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primário e réplica têm os mesmos dados, então relações entre
+        # objetos lidos de bancos diferentes são permitidas.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
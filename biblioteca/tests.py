@@ -1,3 +1,1374 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from itertools import groupby
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections, transaction
+from django.db.models import Count, F
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from django.utils import timezone
+
+from . import aquecimento, consultas_lentas, metricas, popularidade, recomendacoes, registro, rollups
+from .armazenamento import ArmazenamentoEstatico
+from .autenticacao import CachedModelBackend
+from .circulacao import emprestar_em_lote, renovar_todos
+from .disponibilidade import broadcaster
+from .elegibilidade import Elegibilidade
+from .estoque import divergencias, quantidade_pelo_razao
+from .forms import EmprestimoForm
+from .middleware import ArquivosEstaticosMiddleware, CompressaoMiddleware
+from .models import (
+    Autor, Emprestimo, FilaEspera, Livro, LivroRecomendado, MovimentoEstoque, NotificacaoDisponibilidade,
+    PopularidadeLivro, Reserva, Usuario, invalidar_cache_fila, versao_cache_fila,
+)
+from .politicas import PoliticaCirculacao, politica
+from .views import disponibilidade
+
+
+def tempo_de_import(codigo):
+    """
+    Roda ``codigo`` em um Python novo com ``-X importtime`` e devolve o tempo
+    total de import em ms e os módulos importados.
+    """
+    resultado = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'{codigo}; import sys; print(*sys.modules)'],
+        cwd=settings.BASE_DIR,
+        env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'bibliotecasenac.settings'},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total_us = 0
+    for linha in resultado.stderr.splitlines():
+        if not linha.startswith('import time:'):
+            continue
+        _, acumulado, modulo = linha.split('|')
+        # Só os imports de primeiro nível: o acumulado deles já inclui os aninhados
+        if acumulado.strip().isdigit() and not modulo.startswith('  '):
+            total_us += int(acumulado)
+    return total_us / 1000, set(resultado.stdout.split())
+
+
+class TempoDeImportTests(SimpleTestCase):
+    """
+    Orçamento de partida do processo: é o que cada worker novo do gunicorn
+    (reciclagem, autoscaling no Render) paga antes da primeira requisição.
+    Ajuste os limites com ORCAMENTO_IMPORT_MS quando a máquina de CI for
+    mais lenta.
+    """
+    orcamento_ms = float(os.environ.get('ORCAMENTO_IMPORT_MS', 1000))
+
+    def medir(self, codigo, rodadas=3):
+        # O menor de algumas rodadas: o ruído da máquina só soma tempo
+        medidas = [tempo_de_import(codigo) for _ in range(rodadas)]
+        return min(ms for ms, _ in medidas), medidas[0][1]
+
+    def test_wsgi_dentro_do_orcamento(self):
+        ms, _ = self.medir('import bibliotecasenac.wsgi')
+        self.assertLess(ms, self.orcamento_ms, f'import bibliotecasenac.wsgi levou {ms:.0f} ms')
+
+    def test_urlconf_nao_importa_views(self):
+        ms, modulos = self.medir('import bibliotecasenac.wsgi, bibliotecasenac.urls')
+        self.assertLess(ms, self.orcamento_ms, f'wsgi + URLconf levaram {ms:.0f} ms')
+        # As views são importadas por grupo, na primeira requisição a cada um
+        carregadas = sorted(m for m in modulos if m.startswith('biblioteca.views.') or m == 'biblioteca.forms')
+        self.assertEqual(carregadas, [])
+
+    def test_exportadores_sob_demanda(self):
+        _, modulos = tempo_de_import(
+            'import bibliotecasenac.wsgi, bibliotecasenac.urls; import biblioteca.views.reservas'
+        )
+        self.assertFalse({'openpyxl', 'weasyprint'} & modulos)
+
+    def test_aquecimento_importa_todos_os_grupos_de_views(self):
+        _, modulos = tempo_de_import(
+            'import django; django.setup(); from biblioteca.aquecimento import aquecer; aquecer()'
+        )
+        pasta = os.path.join(settings.BASE_DIR, 'biblioteca', 'views')
+        grupos = {
+            f'biblioteca.views.{nome[:-3]}'
+            for nome in os.listdir(pasta)
+            if nome.endswith('.py') and nome != '__init__.py'
+        }
+        self.assertEqual(grupos - modulos, set())
+
+
+class DadosCirculacao:
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.admin = Usuario.objects.create_user('admin', 'admin@senac.br', 'x', tipo_usuario='admin')
+        self.ana = Usuario.objects.create_user('ana', 'ana@senac.br', 'x')
+        self.bruno = Usuario.objects.create_user('bruno', 'bruno@senac.br', 'x')
+        self.autor = Autor.objects.create(nome='Machado de Assis')
+        self.livro = Livro.objects.create(
+            titulo='Dom Casmurro', autor=self.autor, genero='ficcao', quantidade=2, quantidade_disponivel=2
+        )
+
+    def emprestar(self, usuario, livro=None):
+        livro = livro or self.livro
+        emprestimo = Emprestimo.objects.create(usuario=usuario, livro=livro)
+        livro.recalcular_quantidade_disponivel()
+        return emprestimo
+
+    def reservar(self, usuario, livro=None):
+        self.client.force_login(usuario)
+        return self.client.post(reverse('biblioteca:reservar_livro', args=[(livro or self.livro).pk]))
+
+
+class CirculacaoTestCase(DadosCirculacao, TestCase):
+    pass
+
+
+class FilaEsperaTests(CirculacaoTestCase):
+    def test_entra_na_fila_e_e_promovido_na_devolucao(self):
+        self.emprestar(self.ana)
+        emprestimo = self.emprestar(self.admin)
+        self.reservar(self.bruno)
+        entrada = FilaEspera.objects.get(usuario=self.bruno, livro=self.livro)
+        self.assertEqual(entrada.posicao_atual(), 1)
+
+        self.client.force_login(self.admin)
+        resposta = self.client.post(reverse('biblioteca:devolver_livro', args=[emprestimo.pk]))
+
+        self.assertEqual(resposta.status_code, 200)
+        entrada.refresh_from_db()
+        self.assertEqual(entrada.status, 'promovida')
+        self.assertEqual(entrada.reserva.usuario, self.bruno)
+        self.assertEqual(entrada.reserva.status, 'ativa')
+        self.livro.refresh_from_db()
+        self.assertEqual(self.livro.quantidade_disponivel, 0)
+
+    def test_promove_na_ordem_de_chegada(self):
+        primeiro = self.emprestar(self.admin)
+        segundo = self.emprestar(Usuario.objects.create_user('carla', 'carla@senac.br', 'x'))
+        self.reservar(self.ana)
+        self.reservar(self.bruno)
+
+        self.assertTrue(primeiro.devolver())
+
+        self.assertEqual(
+            list(FilaEspera.objects.filter(livro=self.livro).values_list('usuario__username', 'status')),
+            [('ana', 'promovida'), ('bruno', 'aguardando')],
+        )
+        self.assertTrue(segundo.devolver())
+        self.assertEqual(FilaEspera.objects.get(usuario=self.bruno).status, 'promovida')
+
+    def test_nao_entra_na_fila_com_reserva_ou_emprestimo_do_livro(self):
+        self.reservar(self.ana)
+        self.emprestar(self.bruno)
+        self.assertEqual(self.livro.quantidade_disponivel, 0)
+
+        self.reservar(self.ana)
+        self.reservar(self.bruno)
+
+        self.assertFalse(FilaEspera.objects.exists())
+        self.assertEqual(Reserva.objects.filter(usuario=self.ana, status='ativa').count(), 1)
+
+    def test_devolucao_pula_quem_ja_tem_reserva_do_livro(self):
+        carla = Usuario.objects.create_user('carla', 'carla@senac.br', 'x')
+        self.reservar(self.ana)
+        emprestimo = self.emprestar(self.bruno)
+        # Entradas anteriores à checagem da view
+        FilaEspera.entrar(self.ana, self.livro)
+        FilaEspera.entrar(carla, self.livro)
+
+        self.client.force_login(self.admin)
+        resposta = self.client.post(reverse('biblioteca:devolver_livro', args=[emprestimo.pk]))
+
+        self.assertEqual(resposta.status_code, 200)
+        emprestimo.refresh_from_db()
+        self.assertEqual(emprestimo.status, 'devolvido')
+        self.assertEqual(
+            list(FilaEspera.objects.filter(livro=self.livro).values_list('usuario__username', 'status')),
+            [('ana', 'cancelada'), ('carla', 'promovida')],
+        )
+
+    def test_devolucao_em_lote_pula_quem_ja_tem_o_livro(self):
+        from .circulacao import devolver_em_lote
+
+        self.emprestar(self.admin)
+        emprestimo = self.emprestar(self.bruno)
+        FilaEspera.entrar(self.ana, self.livro)
+        # Pegou o exemplar devolvido por outro caminho antes da promoção
+        Emprestimo.objects.create(usuario=self.ana, livro=self.livro)
+
+        resultados = devolver_em_lote([emprestimo.pk])
+
+        self.assertTrue(resultados[0]['sucesso'])
+        self.assertEqual(FilaEspera.objects.get(usuario=self.ana).status, 'cancelada')
+        self.assertFalse(Reserva.objects.exists())
+
+    def test_promocao_pula_quem_esta_no_limite_de_reservas_sem_tirar_da_fila(self):
+        carla = Usuario.objects.create_user('carla', 'carla@senac.br', 'x')
+        self.emprestar(self.admin)
+        emprestimo = self.emprestar(self.bruno)
+        FilaEspera.entrar(self.ana, self.livro)
+        FilaEspera.entrar(carla, self.livro)
+        for i in range(politica.max_reservas):
+            outro = Livro.objects.create(titulo=f'Outro {i}', autor=self.autor, genero='ficcao', quantidade=1)
+            Reserva.objects.create(usuario=self.ana, livro=outro, status='ativa')
+        # Lote de um: o pulado não pode esconder quem vem depois dele
+        with transaction.atomic():
+            self.assertEqual(FilaEspera._proximo_elegivel(self.livro, lote=1).usuario, carla)
+
+        self.assertTrue(emprestimo.devolver())
+
+        self.assertEqual(
+            list(FilaEspera.objects.filter(livro=self.livro).values_list('usuario__username', 'status')),
+            [('ana', 'aguardando'), ('carla', 'promovida')],
+        )
+        self.assertEqual(Reserva.objects.filter(usuario=self.ana, status='ativa').count(), politica.max_reservas)
+
+
+class DisponibilidadeLoteTests(CirculacaoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.outro = Livro.objects.create(titulo='Quincas Borba', autor=self.autor, genero='ficcao', quantidade=1)
+        self.url = reverse('biblioteca:disponibilidade_livros')
+
+    def test_um_get_responde_todos_os_livros_com_etag(self):
+        with self.assertNumQueries(1):
+            resposta = self.client.get(self.url, {'ids': f'{self.livro.pk},{self.outro.pk},0'})
+        self.assertEqual(resposta.json(), {str(self.livro.pk): [2, 2], str(self.outro.pk): [1, 1]})
+        etag = resposta['ETag']
+
+        resposta = self.client.get(
+            self.url, {'ids': [self.livro.pk, self.outro.pk]}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(resposta.status_code, 304)
+        self.assertEqual(resposta.content, b'')
+
+        self.emprestar(self.ana, self.outro)
+        resposta = self.client.get(self.url, {'ids': f'{self.livro.pk},{self.outro.pk}'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta['ETag'], etag)
+        self.assertEqual(resposta.json()[str(self.outro.pk)], [0, 1])
+
+    def test_post_com_json_e_ids_invalidos(self):
+        resposta = self.client.post(self.url, {'ids': [self.outro.pk]}, content_type='application/json')
+        self.assertEqual(resposta.json(), {str(self.outro.pk): [1, 1]})
+
+        resposta = self.client.get(self.url, {'ids': '1,abc'})
+        self.assertEqual(resposta.status_code, 400)
+        resposta = self.client.post(self.url, 'nao é json', content_type='application/json')
+        self.assertEqual(resposta.status_code, 400)
+        resposta = self.client.post(self.url, {'ids': list(range(1, 502))}, content_type='application/json')
+        self.assertEqual(resposta.status_code, 400)
+
+
+class CirculacaoLoteTests(CirculacaoTestCase):
+    def enviar(self, corpo):
+        self.client.force_login(self.admin)
+        return self.client.post(
+            reverse('biblioteca:circulacao_lote'), json.dumps(corpo), content_type='application/json'
+        )
+
+    def test_resultado_por_item_na_ordem_enviada(self):
+        emprestimo = self.emprestar(self.ana)
+        resposta = self.enviar({
+            'devolucoes': [emprestimo.pk, emprestimo.pk, 999],
+            'emprestimos': [
+                [self.bruno.pk, self.livro.pk],
+                {'usuario': self.bruno.pk, 'livro': self.livro.pk},
+                [999, self.livro.pk],
+                [self.ana.pk, 999],
+            ],
+        })
+
+        self.assertEqual(resposta.status_code, 200)
+        dados = resposta.json()
+        self.assertEqual([item['sucesso'] for item in dados['devolucoes']], [True, False])
+        self.assertEqual(dados['devolucoes'][1]['erro'], 'Empréstimo não encontrado.')
+        self.assertEqual(
+            [item.get('erro') for item in dados['emprestimos']],
+            [
+                None,
+                'Este usuário já possui um empréstimo ativo deste livro.',
+                'Usuário não encontrado ou inativo.',
+                'Livro não encontrado.',
+            ],
+        )
+        self.livro.refresh_from_db()
+        self.assertEqual(self.livro.quantidade_disponivel, 1)
+        self.assertEqual(Emprestimo.objects.filter(status='ativo').count(), 1)
+
+    def test_disponibilidade_consumida_dentro_do_lote(self):
+        resposta = self.enviar({'emprestimos': [
+            [self.ana.pk, self.livro.pk], [self.bruno.pk, self.livro.pk], [self.admin.pk, self.livro.pk],
+        ]})
+
+        self.assertEqual(
+            [item.get('erro') for item in resposta.json()['emprestimos']],
+            [None, None, 'Este livro não está disponível para empréstimo.'],
+        )
+        self.livro.refresh_from_db()
+        self.assertEqual(self.livro.quantidade_disponivel, 0)
+
+    def test_corpo_invalido_nao_aplica_nada(self):
+        emprestimo = self.emprestar(self.ana)
+        for emprestimos in ([[self.bruno.pk, 'x']], [[self.bruno.pk, self.livro.pk, 1]], ['12'], [{'usuario': 1}]):
+            with self.subTest(emprestimos=emprestimos):
+                resposta = self.enviar({'devolucoes': [emprestimo.pk], 'emprestimos': emprestimos})
+                self.assertEqual(resposta.status_code, 400)
+                emprestimo.refresh_from_db()
+                self.assertEqual(emprestimo.status, 'ativo')
+        self.assertEqual(self.enviar({'devolucoes': str(emprestimo.pk)}).status_code, 400)
+
+    def test_apenas_admins(self):
+        self.client.force_login(self.ana)
+        resposta = self.client.post(
+            reverse('biblioteca:circulacao_lote'), '{}', content_type='application/json'
+        )
+        self.assertNotEqual(resposta.status_code, 200)
+
+
+class ArquivosEstaticosTests(SimpleTestCase):
+    def setUp(self):
+        self.raiz = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.raiz)
+        for nome, conteudo in (('app.css', b'body{}'), ('app.css.br', b'br'), ('app.css.gz', b'gz')):
+            with open(os.path.join(self.raiz, nome), 'wb') as f:
+                f.write(conteudo)
+        with self.settings(STATIC_ROOT=self.raiz, STATIC_URL='/static/'):
+            self.middleware = ArquivosEstaticosMiddleware(lambda request: None)
+
+    def get(self, **cabecalhos):
+        response = self.middleware(RequestFactory().get('/static/app.css', **cabecalhos))
+        corpo = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, corpo
+
+    def test_respeita_q_zero(self):
+        casos = [
+            ('br, gzip', b'br'),
+            ('br;q=0, gzip', b'gz'),
+            ('gzip;q=0.5, br;q=0.2', b'gz'),
+            ('br;q=0, gzip;q=0', b'body{}'),
+            ('*;q=0', b'body{}'),
+            ('*', b'br'),
+            ('', b'body{}'),
+        ]
+        for cabecalho, esperado in casos:
+            with self.subTest(cabecalho=cabecalho):
+                _, corpo = self.get(HTTP_ACCEPT_ENCODING=cabecalho)
+                self.assertEqual(corpo, esperado)
+
+    def test_if_modified_since(self):
+        response, _ = self.get()
+        modificado = response['Last-Modified']
+
+        response, corpo = self.get(HTTP_IF_MODIFIED_SINCE=modificado)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(corpo, b'')
+        self.assertEqual(response['Last-Modified'], modificado)
+
+        response, _ = self.get(HTTP_IF_MODIFIED_SINCE='Thu, 01 Jan 1998 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+    def test_nome_original_so_sem_manifesto(self):
+        self.assertEqual(ArmazenamentoEstatico(location=self.raiz).stored_name('app.css'), 'app.css')
+
+        with open(os.path.join(self.raiz, 'staticfiles.json'), 'w') as f:
+            json.dump({'version': '1.1', 'hash': 'x', 'paths': {'app.css': 'app.0123456789ab.css'}}, f)
+        armazenamento = ArmazenamentoEstatico(location=self.raiz)
+        self.assertEqual(armazenamento.stored_name('app.css'), 'app.0123456789ab.css')
+        # Com o manifesto, um arquivo que ficou de fora é erro de deploy
+        with self.assertRaises(ValueError):
+            armazenamento.stored_name('esquecido.js')
+
+
+class CompressaoTests(SimpleTestCase):
+    def get(self, aceitas):
+        middleware = CompressaoMiddleware(lambda request: HttpResponse('a' * 2000, content_type='text/html'))
+        return middleware(RequestFactory().get('/', HTTP_ACCEPT_ENCODING=aceitas))
+
+    def test_respeita_q_zero(self):
+        self.assertEqual(self.get('gzip')['Content-Encoding'], 'gzip')
+        self.assertFalse(self.get('gzip;q=0').has_header('Content-Encoding'))
+        self.assertFalse(self.get('gzip;q=0, br;q=0').has_header('Content-Encoding'))
+        self.assertEqual(self.get('br;q=0, gzip;q=0.5')['Content-Encoding'], 'gzip')
+
+
+class ReplicaTests(DadosCirculacao, TransactionTestCase):
+    """
+    Nos testes a réplica espelha o banco de teste do principal (TEST
+    MIRROR), mas é outra conexão: só enxerga o que foi commitado, por isso
+    TransactionTestCase.
+    """
+
+    def consultas(self, metodo, url, **kwargs):
+        with CaptureQueriesContext(connections['default']) as primario, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = getattr(self.client, metodo)(url, **kwargs)
+        return response, len(primario), len(replica)
+
+    def test_get_marcado_le_da_replica(self):
+        self.client.force_login(self.admin)
+        response, _, na_replica = self.consultas('get', reverse('biblioteca:relatorios'))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(na_replica, 0)
+
+    def test_view_nao_marcada_fica_no_primario(self):
+        self.client.force_login(self.admin)
+        response, _, na_replica = self.consultas('get', reverse('biblioteca:emprestimo_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(na_replica, 0)
+
+    def test_escrita_fixa_as_leituras_no_primario(self):
+        self.client.force_login(self.ana)
+        response = self.client.post(reverse('biblioteca:reservar_livro', args=[self.livro.pk]))
+        self.assertEqual(response.status_code, 302)
+        cookie = response.cookies['fixar_primario']
+        self.assertEqual(cookie['max-age'], settings.REPLICA_FIXACAO_SEGUNDOS)
+
+        self.client.force_login(self.admin)
+        response, no_primario, na_replica = self.consultas('get', reverse('biblioteca:relatorios'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(na_replica, 0)
+        self.assertGreater(no_primario, 0)
+
+    def test_replica_enxerga_os_dados_do_teste(self):
+        self.emprestar(self.ana)
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('biblioteca:relatorios'))
+        self.assertEqual(len(response.context['emprestimos']), 1)
+
+
+# URLconf dos testes sob ASGI: as views que o biblioteca.urls usa com
+# DJANGO_VIEWS_ASYNC=1
+urlpatterns = [
+    path('disponiveis/', disponibilidade.livros_disponiveis_async, name='livros_disponiveis'),
+    path('disponibilidade/<int:livro_id>/', disponibilidade.verificar_disponibilidade_async, name='verificar'),
+    path('stream/', disponibilidade.stream_disponibilidade_async, name='stream'),
+]
+
+
+@override_settings(ROOT_URLCONF='biblioteca.tests')
+class ViewsAsyncTests(CirculacaoTestCase):
+    @override_settings(DEBUG=True, CONSULTAS_LENTAS_ATIVO=True)
+    def test_nenhum_middleware_e_adaptado_sob_asgi(self):
+        # Com DEBUG o Django registra cada middleware que precisou de uma
+        # thread (e os que ficaram fora da pilha)
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+    async def test_views_assincronas_respondem_sob_asgi(self):
+        with mock.patch.object(metricas.consultas_requisicao, 'observar') as observar:
+            resposta = await self.async_client.get(f'/disponibilidade/{self.livro.pk}/')
+        self.assertEqual(
+            resposta.json(), {'disponivel': True, 'quantidade_disponivel': 2, 'quantidade_total': 2}
+        )
+        # As consultas do ORM assíncrono também entram na contagem
+        observar.assert_called_once_with(1, view='verificar')
+
+        resposta = await self.async_client.get('/disponibilidade/0/')
+        self.assertEqual(resposta.status_code, 404)
+
+        resposta = await self.async_client.get('/disponiveis/')
+        self.assertEqual(
+            resposta.json(), {'livros': [{'id': self.livro.pk, 'titulo': 'Dom Casmurro', 'autor': 'Machado de Assis'}]}
+        )
+
+    @override_settings(SSE_INTERVALO=30)
+    @mock.patch.object(broadcaster, 'aguardar', side_effect=AssertionError('espera presa em uma thread'))
+    async def test_stream_acordado_pela_notificacao_sem_esperar_o_intervalo(self, _):
+        resposta = await self.async_client.get(f'/stream/?ids={self.livro.pk}')
+        self.assertEqual(resposta['Content-Type'], 'text/event-stream')
+        eventos = aiter(resposta.streaming_content)
+        self.assertTrue((await anext(eventos)).startswith(b'retry:'))
+        self.assertIn(b'"quantidade_disponivel": 2', await anext(eventos))
+        self.assertEqual(await anext(eventos), b': ping\n\n')
+
+        # A mudança é gravada e o aviso vem de outra thread, como o on_commit
+        # de uma view síncrona
+        await NotificacaoDisponibilidade.objects.acreate(livro=self.livro, quantidade_disponivel=1)
+        inicio = time.monotonic()
+        threading.Timer(0.2, broadcaster._acordar).start()
+        evento = await asyncio.wait_for(anext(eventos), 5)
+        self.assertIn(b'"quantidade_disponivel": 1', evento)
+        self.assertLess(time.monotonic() - inicio, 5)
+        await eventos.aclose()
+
+
+@override_settings(CONSULTAS_LENTAS_ATIVO=True, CONSULTAS_LENTAS_LIMITE_MS=0)
+class ConsultasLentasTests(CirculacaoTestCase):
+    def setUp(self):
+        super().setUp()
+        consultas_lentas.buffer_consultas.limpar()
+        self.addCleanup(consultas_lentas.buffer_consultas.limpar)
+        # Com limite zero toda consulta é lenta; o log fica fora da saída dos testes
+        self.enterContext(mock.patch.object(consultas_lentas.logger, 'handlers', [logging.NullHandler()]))
+        self.enterContext(mock.patch.object(consultas_lentas.logger, 'propagate', False))
+
+    def test_consultas_que_so_mudam_os_valores_tem_a_mesma_impressao(self):
+        normalizadas = {
+            consultas_lentas.normalizar_sql(sql)
+            for sql in (
+                "SELECT * FROM livro WHERE titulo = 'Dom Casmurro' AND id IN (1, 2, 3)",
+                "SELECT *  FROM livro\n WHERE titulo = 'O Alienista' AND id IN (%s, %s)",
+            )
+        }
+        self.assertEqual(normalizadas, {'SELECT * FROM livro WHERE titulo = ? AND id IN (...)'})
+
+    def test_consulta_registrada_com_a_origem_no_app(self):
+        with connection.execute_wrapper(consultas_lentas.monitorar()):
+            list(Livro.objects.filter(titulo='Dom Casmurro'))
+        consulta, = consultas_lentas.buffer_consultas.resumo()
+        self.assertIn('WHERE', consulta['sql'])
+        self.assertNotIn('Dom Casmurro', consulta['sql'])
+        self.assertEqual(consulta['banco'], 'default')
+        self.assertRegex(consulta['origem'], r'^biblioteca/tests\.py:\d+ em test_consulta_registrada_com_a_origem_no_app$')
+        self.assertTrue(consulta['plano'])
+
+    def test_explain_uma_vez_por_impressao(self):
+        url = reverse('biblioteca:livro_detail', args=[self.livro.pk])
+        with mock.patch.object(consultas_lentas, 'explicar', wraps=consultas_lentas.explicar) as explicar, \
+                self.assertLogs('biblioteca.consultas_lentas', 'WARNING') as logs:
+            self.client.get(url)
+            self.client.get(url)
+
+        consultas = consultas_lentas.buffer_consultas.resumo()
+        impressoes = {consulta['impressao'] for consulta in consultas}
+        self.assertEqual(len(consultas), 2 * len(impressoes))
+        self.assertEqual(explicar.call_count, len(impressoes))
+        self.assertEqual({consulta['view'] for consulta in consultas}, {'biblioteca:livro_detail'})
+        self.assertTrue(all(consulta['plano'] for consulta in consultas))
+        # O plano só vai para o log na primeira ocorrência
+        com_plano = [registro.plano for registro in logs.records if hasattr(registro, 'plano')]
+        self.assertEqual(len(com_plano), len(impressoes))
+        self.assertEqual({registro.evento for registro in logs.records}, {'consulta.lenta'})
+
+    def test_explain_com_erro_nao_aborta_a_transacao(self):
+        with transaction.atomic():
+            plano = consultas_lentas.explicar(connection, 'SELECT * FROM tabela_inexistente', [])
+            self.assertTrue(plano.startswith('EXPLAIN falhou'))
+            self.assertEqual(Livro.objects.count(), 1)
+        self.assertIsNone(consultas_lentas.explicar(connection, 'UPDATE biblioteca_livro SET quantidade = 3', []))
+        self.assertEqual(Livro.objects.get().quantidade, 2)
+
+    @override_settings(ROOT_URLCONF='biblioteca.tests')
+    async def test_view_assincrona_monitorada(self):
+        resposta = await self.async_client.get(f'/disponibilidade/{self.livro.pk}/')
+        self.assertEqual(resposta.status_code, 200)
+        consulta, = consultas_lentas.buffer_consultas.resumo()
+        self.assertEqual(consulta['view'], 'verificar')
+
+    def test_pagina_lista_e_limpa_o_buffer(self):
+        url = reverse('biblioteca:consultas_lentas')
+        self.client.force_login(self.bruno)
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(self.admin)
+        with connection.execute_wrapper(consultas_lentas.monitorar()):
+            list(Livro.objects.all())
+        impressao = consultas_lentas.buffer_consultas.resumo()[0]['impressao']
+        self.assertContains(self.client.get(url), impressao)
+
+        self.client.post(url)
+        self.assertEqual(consultas_lentas.buffer_consultas.resumo(), [])
+
+
+class RelatorioEmprestimosTests(DadosCirculacao, TransactionTestCase):
+    def test_limite_fora_da_faixa(self):
+        self.emprestar(self.ana)
+        self.emprestar(self.bruno)
+        self.client.force_login(self.admin)
+        url = reverse('biblioteca:relatorio_emprestimos')
+        for limite, linhas in (('0', 1), ('-5', 1), ('1', 1), ('1000', 2)):
+            with self.subTest(limite=limite):
+                response = self.client.get(url, {'limite': limite})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['emprestimos']), linhas)
+        self.assertEqual(self.client.get(url, {'limite': 'abc'}).status_code, 400)
+
+    def test_cursor_percorre_todas_as_paginas(self):
+        for usuario in (self.ana, self.bruno, self.admin):
+            self.emprestar(usuario)
+        self.client.force_login(self.admin)
+        url = reverse('biblioteca:relatorio_emprestimos')
+        vistos, cursor = [], None
+        while True:
+            dados = self.client.get(url, {'limite': 2, **({'cursor': cursor} if cursor else {})}).json()
+            vistos += [linha['id'] for linha in dados['emprestimos']]
+            cursor = dados['proximo_cursor']
+            if not cursor:
+                break
+        self.assertEqual(vistos, sorted(Emprestimo.objects.values_list('id', flat=True), reverse=True))
+
+    def test_periodo_em_dias_locais_sobre_a_coluna_crua(self):
+        noite = self.emprestar(self.ana)
+        manha = self.emprestar(self.bruno)
+        dia = timezone.localdate() - timedelta(days=3)
+        seguinte = dia + timedelta(days=1)
+        # 23:30 e 00:30 locais: em UTC os dois caem no mesmo dia
+        for emprestimo, data in ((noite, dia), (manha, seguinte)):
+            hora = 23 if emprestimo == noite else 0
+            Emprestimo.objects.filter(pk=emprestimo.pk).update(data_emprestimo=timezone.make_aware(
+                datetime(data.year, data.month, data.day, hora, 30)
+            ))
+        self.client.force_login(self.admin)
+        url = reverse('biblioteca:relatorio_emprestimos')
+
+        def ids(inicio, fim):
+            resposta = self.client.get(url, {'data_inicio': inicio.isoformat(), 'data_fim': fim.isoformat()})
+            return [linha['id'] for linha in resposta.json()['emprestimos']]
+
+        with CaptureQueriesContext(connections['replica']) as consultas:
+            self.assertEqual(ids(dia, dia), [noite.pk])
+        self.assertFalse([c for c in consultas if 'cast_date' in c['sql']])
+        self.assertEqual(ids(seguinte, seguinte), [manha.pk])
+        self.assertEqual(ids(dia, seguinte), [manha.pk, noite.pk])
+
+
+class RollupsTests(CirculacaoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.outro = Livro.objects.create(titulo='Quincas Borba', autor=self.autor, genero='ficcao', quantidade=5)
+        self.emprestar(self.ana)
+        atrasado = self.emprestar(self.bruno)
+        emprestar_em_lote([(self.ana.pk, self.outro.pk), (self.bruno.pk, self.outro.pk), (self.admin.pk, self.outro.pk)])
+        Emprestimo.objects.filter(pk=atrasado.pk).update(data_devolucao_prevista=timezone.now() - timedelta(days=1))
+        atrasado.refresh_from_db()
+        self.assertTrue(atrasado.devolver())
+        self.assertTrue(Emprestimo.objects.filter(livro=self.outro).first().devolver())
+
+    def contagem_direta(self):
+        devolvidos = Emprestimo.objects.filter(status='devolvido')
+        no_prazo = devolvidos.filter(data_devolucao__lte=F('data_devolucao_prevista')).count()
+        ranking = Livro.objects.annotate(total=Count('emprestimos')).filter(total__gt=0).order_by('-total', 'pk')
+        return {
+            'total_emprestimos': Emprestimo.objects.count(),
+            'usuarios_ativos': Emprestimo.objects.values('usuario').distinct().count(),
+            'taxa_devolucao': round(no_prazo / devolvidos.count() * 100, 2),
+            'livros_populares': [(livro.pk, livro.total) for livro in ranking],
+        }
+
+    def resumo(self, *args):
+        resumo = rollups.resumo_periodo(*args)
+        resumo['livros_populares'] = [(livro.pk, livro.total_emprestimos) for livro in resumo['livros_populares']]
+        return resumo
+
+    def test_rollups_incrementais_batem_com_a_contagem_direta(self):
+        with self.assertNumQueries(3):
+            rollups.resumo_periodo()
+        esperado = self.contagem_direta()
+        self.assertEqual(esperado['taxa_devolucao'], 50)
+        self.assertEqual(self.resumo(), esperado)
+
+        rollups.reconstruir()
+        self.assertEqual(self.resumo(), esperado)
+
+    def test_periodo(self):
+        hoje = timezone.localdate()
+        Emprestimo.objects.filter(livro=self.livro).update(data_emprestimo=timezone.now() - timedelta(days=10))
+        rollups.reconstruir()
+
+        resumo = self.resumo(hoje - timedelta(days=1), hoje)
+        self.assertEqual(resumo['total_emprestimos'], 3)
+        self.assertEqual(resumo['usuarios_ativos'], 3)
+        self.assertEqual(resumo['livros_populares'], [(self.outro.pk, 3)])
+        resumo = self.resumo(hoje - timedelta(days=10), hoje - timedelta(days=10))
+        self.assertEqual(resumo['livros_populares'], [(self.livro.pk, 2)])
+        self.assertEqual(resumo['taxa_devolucao'], 0)
+
+
+class ImportarCatalogoTests(CirculacaoTestCase):
+    def importar(self, conteudo, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as arquivo:
+            arquivo.write('titulo,autor,genero,quantidade\n' + conteudo)
+        self.addCleanup(os.remove, arquivo.name)
+        saida = io.StringIO()
+        call_command('importar_catalogo', arquivo.name, *args, stdout=saida)
+        return saida.getvalue()
+
+    def test_dry_run_nao_grava_nada(self):
+        saida = self.importar('Quincas Borba,Machado de Assis,Romance,3\nIracema,José de Alencar,romance,1\n', '--dry-run')
+
+        self.assertIn('DRY-RUN: 2 linhas lidas, 1 autores novos, 2 livros criados, 0 atualizados, 0 erros', saida)
+        self.assertEqual(Livro.objects.count(), 1)
+        self.assertEqual(Autor.objects.count(), 1)
+
+    def test_relatorio_de_erros_e_atualizacao_preservando_emprestados(self):
+        self.emprestar(self.ana)
+        saida = self.importar(
+            'Dom Casmurro, machado  de ASSIS ,ficcao,5\n'
+            ',Sem Título,ficcao,1\n'
+            'Helena,Machado de Assis,poesia,1\n'
+            'Iaiá Garcia,Machado de Assis,ficcao,-2\n'
+            'Memórias Póstumas,Machado de Assis,ficcao,2\n',
+            '--max-erros-lote', '2',
+        )
+
+        self.assertIn('Lote 1: 1 criados, 1 atualizados, 0 autores novos, 3 erros', saida)
+        self.assertIn('linha 3: Título vazio.', saida)
+        self.assertIn("linha 4: Gênero desconhecido: 'poesia'.", saida)
+        self.assertIn('... e mais 1 erros', saida)
+        self.livro.refresh_from_db()
+        # O exemplar emprestado continua fora da disponibilidade
+        self.assertEqual((self.livro.quantidade, self.livro.quantidade_disponivel), (5, 4))
+        self.assertEqual(quantidade_pelo_razao(self.livro.pk), 4)
+        self.assertTrue(Livro.objects.filter(titulo='Memórias Póstumas', autor=self.autor).exists())
+
+    def test_lote_desfeito_nao_deixa_autor_inexistente_no_mapa(self):
+        bulk_create = Livro.objects.bulk_create
+        chamadas = []
+
+        def falhar_no_primeiro(*args, **kwargs):
+            chamadas.append(args)
+            if len(chamadas) == 1:
+                raise DatabaseError('disco cheio')
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(Livro.objects, 'bulk_create', side_effect=falhar_no_primeiro):
+            saida = self.importar(
+                'Iracema,José de Alencar,romance,1\nO Guarani,José de Alencar,romance,1\n',
+                '--tamanho-lote', '1',
+            )
+
+        self.assertIn('linha 2: Lote não gravado: disco cheio', saida)
+        self.assertIn('Lote 2: 1 criados, 0 atualizados, 1 autores novos, 0 erros', saida)
+        guarani = Livro.objects.select_related('autor').get(titulo='O Guarani')
+        self.assertEqual(guarani.autor.nome, 'José de Alencar')
+        self.assertFalse(Livro.objects.filter(titulo='Iracema').exists())
+
+
+class MesclarAutoresTests(CirculacaoTestCase):
+    def setUp(self):
+        super().setUp()
+        # Duplicados de antes da normalização: nome_normalizado antigo, diferente
+        self.duplicados = []
+        for i, nome in enumerate(('MACHADO DE ASSIS', 'Machado  de Assís')):
+            autor = Autor.objects.create(nome=f'Temporário {i}')
+            Autor.objects.filter(pk=autor.pk).update(nome=nome, nome_normalizado=f'legado {i}')
+            Livro.objects.create(titulo=f'Livro {i}', autor=autor, genero='ficcao', quantidade=1)
+            self.duplicados.append(autor.pk)
+        self.outro = Autor.objects.create(nome='José de Alencar')
+        Autor.objects.filter(pk=self.autor.pk).update(nome_normalizado='machado de assis (antigo)')
+
+    def mesclar(self, *args):
+        saida = io.StringIO()
+        call_command('mesclar_autores', *args, stdout=saida)
+        return saida.getvalue()
+
+    def test_move_os_livros_para_o_autor_mais_antigo(self):
+        saida = self.mesclar()
+
+        removidos = ', '.join(f'#{pk}' for pk in self.duplicados)
+        self.assertIn(f'machado de assis: mantido #{self.autor.pk}, removidos {removidos}', saida)
+        self.assertIn('1 grupo(s) de duplicados, 2 autor(es) removidos.', saida)
+        self.assertEqual(
+            set(Autor.objects.values_list('pk', 'nome_normalizado')),
+            {(self.autor.pk, 'machado de assis'), (self.outro.pk, 'jose de alencar')},
+        )
+        self.assertEqual(
+            sorted(Livro.objects.filter(autor=self.autor).values_list('titulo', flat=True)),
+            ['Dom Casmurro', 'Livro 0', 'Livro 1'],
+        )
+
+    def test_dry_run_so_lista(self):
+        saida = self.mesclar('--dry-run')
+
+        self.assertIn('1 grupo(s) de duplicados, 2 autor(es) seriam removidos.', saida)
+        self.assertEqual(Autor.objects.count(), 4)
+        self.assertEqual(Livro.objects.filter(autor_id__in=self.duplicados).count(), 2)
+
+
+class AquecimentoTests(CirculacaoTestCase):
+    def test_templates_compilados_no_aquecimento(self):
+        from django.template import engines
+        from django.template.base import Template
+
+        pasta = os.path.join(settings.BASE_DIR, 'biblioteca', 'templates')
+        do_app = sum(len(arquivos) for _, _, arquivos in os.walk(pasta))
+        self.assertGreaterEqual(aquecimento.compilar_templates(), do_app)
+        # Com o loader em cache a primeira requisição já não compila nada
+        with mock.patch.object(Template, 'compile_nodelist') as compilar:
+            engines['django'].get_template('biblioteca/livro_detail.html')
+        compilar.assert_not_called()
+
+    def test_aquecer_registra_as_etapas(self):
+        with self.assertLogs('biblioteca.aquecimento', 'INFO') as logs:
+            etapas = aquecimento.aquecer()
+        evento, = logs.records
+        self.assertEqual(evento.evento, 'servidor.aquecido')
+        self.assertEqual((evento.urls, evento.templates), (etapas['urls'], etapas['templates']))
+        self.assertGreater(etapas['urls'], 0)
+        self.assertEqual(evento.pid, os.getpid())
+
+    def test_conectar_abre_as_conexoes_do_processo(self):
+        with self.assertNumQueries(1):
+            aquecimento.conectar()
+        for conexao in connections.all():
+            self.assertIsNotNone(conexao.connection)
+
+
+class RazaoEstoqueTests(CirculacaoTestCase):
+    def movimentos(self):
+        return list(MovimentoEstoque.objects.filter(livro=self.livro).values_list('tipo', 'delta'))
+
+    def test_movimentos_acompanham_a_coluna(self):
+        self.assertEqual(self.movimentos(), [('ajuste', 2)])
+        emprestimo = self.emprestar(self.ana)
+        emprestimo.devolver()
+        self.assertEqual(self.movimentos(), [('ajuste', 2), ('ajuste', -1), ('devolucao', 1)])
+        self.assertEqual(quantidade_pelo_razao(self.livro.pk), 2)
+        self.assertFalse(divergencias().exists())
+
+    def test_save_sem_a_coluna_carregada_nao_gera_movimento(self):
+        livro = Livro.objects.only('titulo', 'quantidade').get(pk=self.livro.pk)
+        livro.quantidade_disponivel = 1
+        livro.save()
+
+        self.assertEqual(self.movimentos(), [('ajuste', 2)])
+        self.assertEqual([d['id'] for d in divergencias()], [self.livro.pk])
+
+
+class MetricasMultiprocessoTests(SimpleTestCase):
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio)
+
+    def gravar(self, pid, valores):
+        arquivo = metricas.ArquivoMetricas(os.path.join(self.diretorio, f'metricas_{pid}.db'))
+        for chave, valor in valores.items():
+            arquivo.somar(chave, valor)
+        arquivo.fechar()
+
+    def test_worker_encerrado_vai_para_o_consolidado(self):
+        contador = metricas._chave('biblioteca_emprestimos_total', {'evento': 'criado'})
+        intervalo = metricas._chave('biblioteca_requisicao_consultas_bucket', {'view': 'home', 'le': '1.0'})
+        gauge = metricas._chave('biblioteca_conexoes_abertas', {})
+        self.gravar(101, {contador: 3, intervalo: 2, gauge: 7})
+        self.gravar(102, {contador: 4})
+        loja = metricas.ValoresMultiprocesso(self.diretorio)
+
+        metricas.consolidar_processo(101, self.diretorio)
+        metricas.consolidar_processo(102, self.diretorio)
+        metricas.consolidar_processo(103, self.diretorio)
+
+        self.assertEqual(
+            sorted(nome for nome in os.listdir(self.diretorio) if nome.endswith('.db')),
+            ['metricas_consolidado.db'],
+        )
+        self.assertEqual(loja.valores(), {contador: 7, intervalo: 2})
+
+    def test_limpar_diretorio_apaga_so_os_arquivos_de_metricas(self):
+        self.gravar(101, {metricas._chave('biblioteca_emprestimos_total', {'evento': 'criado'}): 1})
+        metricas.consolidar_processo(101, self.diretorio)
+        self.gravar(102, {})
+        open(os.path.join(self.diretorio, 'outro.db'), 'w').close()
+
+        with override_settings(METRICAS_DIR=self.diretorio):
+            metricas.limpar_diretorio()
+
+        self.assertEqual([nome for nome in os.listdir(self.diretorio) if nome.endswith('.db')], ['outro.db'])
+
+
+class RegistroTests(SimpleTestCase):
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio)
+        self.arquivo = os.path.join(self.diretorio, 'eventos.log')
+
+    def manipulador(self):
+        with mock.patch('sys.stderr', io.StringIO()):
+            manipulador = registro.ManipuladorFila(arquivo=self.arquivo)
+        self.addCleanup(manipulador.close)
+        logger = logging.getLogger(f'biblioteca.teste.{id(manipulador)}')
+        logger.handlers = [manipulador]
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        return manipulador, logger
+
+    def linhas(self):
+        with open(self.arquivo, encoding='utf-8') as arquivo:
+            return [json.loads(linha) for linha in arquivo]
+
+    def test_evento_gravado_com_os_campos_de_extra(self):
+        manipulador, logger = self.manipulador()
+        registro.registrar_evento(logger, 'emprestimo.devolvido', usuario='ana', emprestimo=7, livro=3)
+        try:
+            raise ValueError('estoque negativo')
+        except ValueError:
+            logger.exception('falha ao devolver %s', 7)
+        manipulador.close()
+
+        evento, erro = self.linhas()
+        self.assertEqual(
+            set(evento), {'data', 'nivel', 'logger', 'mensagem', 'evento', 'usuario', 'emprestimo', 'livro'},
+        )
+        self.assertEqual(evento['nivel'], 'INFO')
+        self.assertEqual(evento['logger'], logger.name)
+        self.assertEqual(evento['mensagem'], 'emprestimo.devolvido')
+        self.assertEqual(
+            (evento['evento'], evento['usuario'], evento['emprestimo'], evento['livro']),
+            ('emprestimo.devolvido', 'ana', 7, 3),
+        )
+        self.assertTrue(evento['data'].endswith('+00:00'))
+        self.assertEqual(erro['nivel'], 'ERROR')
+        self.assertEqual(erro['mensagem'], 'falha ao devolver 7')
+        self.assertIn('ValueError: estoque negativo', erro['excecao'])
+
+    def test_arquivo_movido_pelo_logrotate_e_reaberto(self):
+        manipulador, logger = self.manipulador()
+        registro.registrar_evento(logger, 'antes')
+        manipulador.parar()
+        os.rename(self.arquivo, f'{self.arquivo}.1')
+        manipulador.iniciar()
+        registro.registrar_evento(logger, 'depois')
+        manipulador.close()
+
+        self.assertEqual([linha['evento'] for linha in self.linhas()], ['depois'])
+
+    def test_ganchos_de_fork_registrados_uma_vez(self):
+        with mock.patch.object(registro.atexit, 'register') as saida, \
+                mock.patch.object(registro.os, 'register_at_fork') as fork:
+            primeiro, _ = self.manipulador()
+            segundo, _ = self.manipulador()
+        saida.assert_not_called()
+        fork.assert_not_called()
+
+        # O dictConfig fecha o manipulador antigo ao trocar a configuração
+        primeiro.close()
+        self.assertNotIn(primeiro, registro._ativos)
+        with mock.patch.object(registro.ManipuladorFila, '_reiniciar_no_filho', autospec=True) as reiniciar:
+            registro._reiniciar_ativos_no_filho()
+        reiniciados = [chamada.args[0] for chamada in reiniciar.call_args_list]
+        self.assertIn(segundo, reiniciados)
+        self.assertNotIn(primeiro, reiniciados)
+
+
+class VersaoCacheFilaTests(SimpleTestCase):
+    def test_versao_nao_volta_depois_de_descartada(self):
+        from django.core.cache import cache
+
+        livro_id = 987654
+        anteriores = set()
+        for _ in range(3):
+            anteriores.add(versao_cache_fila(livro_id))
+            invalidar_cache_fila(livro_id)
+            anteriores.add(versao_cache_fila(livro_id))
+            # Chave de versão descartada pelo cache (eviction, reinício)
+            cache.delete(f'fila:{livro_id}:versao')
+            self.assertNotIn(versao_cache_fila(livro_id), anteriores)
+
+
+class RenovarTodosTests(CirculacaoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.livros = [
+            Livro.objects.create(titulo=f'Livro {i}', autor=self.autor, genero='ficcao', quantidade=1)
+            for i in range(4)
+        ]
+
+    def emprestimo(self, livro, atraso_dias=None, renovacoes=0):
+        emprestimo = self.emprestar(self.ana, livro)
+        campos = {'renovacoes': renovacoes}
+        if atraso_dias is not None:
+            campos['data_devolucao_prevista'] = timezone.now() - timedelta(days=atraso_dias, hours=1)
+        Emprestimo.objects.filter(pk=emprestimo.pk).update(**campos)
+        emprestimo.refresh_from_db()
+        return emprestimo
+
+    def test_renova_so_os_elegiveis_e_explica_os_demais(self):
+        em_dia = self.emprestimo(self.livros[0])
+        na_tolerancia = self.emprestimo(self.livros[1], atraso_dias=politica.tolerancia_atraso_dias - 1)
+        no_limite = self.emprestimo(self.livros[2], renovacoes=politica.max_renovacoes)
+        muito_atrasado = self.emprestimo(self.livros[3], atraso_dias=politica.tolerancia_atraso_dias + 1)
+        Emprestimo.objects.create(usuario=self.ana, livro=self.livro).devolver()
+
+        with self.assertNumQueries(4):
+            resultado = renovar_todos(self.ana)
+
+        self.assertEqual(sorted(resultado['renovados']), sorted([em_dia.pk, na_tolerancia.pk]))
+        self.assertEqual(
+            {item['id']: item['motivo'] for item in resultado['ignorados']},
+            {
+                no_limite.pk: f'Limite de {politica.max_renovacoes} renovações atingido.',
+                muito_atrasado.pk: f'Atraso maior que {politica.tolerancia_atraso_dias} dias.',
+            },
+        )
+        for emprestimo in (em_dia, na_tolerancia, no_limite, muito_atrasado):
+            renovacoes_antes = emprestimo.renovacoes
+            pode = emprestimo.pode_renovar()
+            emprestimo.refresh_from_db()
+            # Mesma regra de Emprestimo.pode_renovar
+            self.assertEqual(pode, emprestimo.pk in resultado['renovados'])
+            if pode:
+                self.assertEqual(emprestimo.renovacoes, renovacoes_antes + 1)
+                self.assertEqual(emprestimo.data_devolucao_prevista, resultado['nova_data_devolucao'])
+            else:
+                self.assertEqual(emprestimo.renovacoes, renovacoes_antes)
+
+    def test_view_so_renova_os_de_outro_usuario_para_admin(self):
+        emprestimo = self.emprestimo(self.livros[0])
+        url = reverse('biblioteca:renovar_todos_emprestimos')
+
+        self.client.force_login(self.bruno)
+        self.assertEqual(self.client.post(url, {'usuario': self.ana.pk}).status_code, 403)
+        self.assertEqual(self.client.post(url).json()['renovados'], [])
+
+        self.client.force_login(self.admin)
+        resposta = self.client.post(url, {'usuario': self.ana.pk})
+        self.assertEqual(resposta.json()['renovados'], [emprestimo.pk])
+        resposta = self.client.post(url, {'usuario': 'ana'})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(resposta.json()['error'], 'Usuário inválido.')
+
+
+class EstatisticasUsuarioTests(CirculacaoTestCase):
+    def test_totais_sem_multiplicar_reservas_por_emprestimos(self):
+        outros = [
+            Livro.objects.create(titulo=f'Livro {i}', autor=self.autor, genero='ficcao', quantidade=1)
+            for i in range(3)
+        ]
+        Reserva.objects.create(usuario=self.ana, livro=outros[0], status='ativa')
+        Reserva.objects.create(usuario=self.ana, livro=outros[0], status='cancelada')
+        Reserva.objects.create(usuario=self.ana, livro=outros[1], status='expirada')
+        for livro in outros:
+            self.emprestar(self.ana, livro)
+        self.emprestar(self.ana).devolver()
+        self.emprestar(self.bruno)
+
+        usuario = Usuario.objects.get(pk=self.ana.pk)
+        with CaptureQueriesContext(connections['default']) as consultas:
+            self.assertEqual(usuario.estatisticas, {
+                'total_reservas': 3, 'reservas_ativas': 1, 'total_emprestimos': 4, 'emprestimos_ativos': 3,
+            })
+            self.assertTrue(usuario.pode_reservar())
+            self.assertEqual(usuario.get_total_loans(), 4)
+        self.assertEqual(len(consultas), 1)
+        self.assertNotIn('JOIN', consultas[0]['sql'])
+
+        usuario.invalidar_estatisticas()
+        Reserva.objects.filter(usuario=self.ana, status='expirada').update(status='ativa')
+        self.assertEqual(usuario.get_active_reservations(), 2)
+
+
+class AutenticacaoCacheTests(CirculacaoTestCase):
+    def test_usuario_em_cache_ate_ser_salvo(self):
+        backend = CachedModelBackend()
+        with self.assertNumQueries(1):
+            self.assertEqual(backend.get_user(self.ana.pk), self.ana)
+        with self.assertNumQueries(0):
+            self.assertEqual(backend.get_user(self.ana.pk).password, self.ana.password)
+
+        self.ana.set_password('nova')
+        self.ana.save()
+        with self.assertNumQueries(1):
+            self.assertTrue(backend.get_user(self.ana.pk).check_password('nova'))
+
+        self.ana.is_active = False
+        self.ana.save()
+        self.assertIsNone(backend.get_user(self.ana.pk))
+        self.assertIsNone(backend.get_user(0))
+
+    def test_sessoes_do_model_backend_continuam_validas(self):
+        self.client.force_login(self.ana, backend='django.contrib.auth.backends.ModelBackend')
+        self.assertEqual(self.client.get(reverse('biblioteca:profile')).status_code, 200)
+
+        self.client.force_login(self.ana)
+        self.assertEqual(
+            self.client.session['_auth_user_backend'], 'biblioteca.autenticacao.CachedModelBackend'
+        )
+        self.assertEqual(self.client.get(reverse('biblioteca:profile')).status_code, 200)
+
+
+class LivroDetalheTests(CirculacaoTestCase):
+    def test_consultas_da_pagina_de_detalhe(self):
+        self.emprestar(self.ana)
+        self.emprestar(self.bruno).devolver()
+        Reserva.objects.create(usuario=self.admin, livro=self.livro, status='ativa')
+        url = reverse('biblioteca:livro_detail', args=[self.livro.pk])
+
+        # Livro com autor e totais, outros livros do autor e recomendações
+        with self.assertNumQueries(3):
+            resposta = self.client.get(url)
+            livro = resposta.context['livro']
+            totais = (livro.get_total_loans(), livro.get_active_loans(), livro.get_active_reservations())
+        self.assertEqual(totais, (2, 1, 1))
+
+        # O administrador vê também o histórico, com os usuários (uma consulta)
+        self.client.force_login(self.admin)
+        self.client.get(url)
+        with self.assertNumQueries(4):
+            resposta = self.client.get(url)
+        self.assertContains(resposta, 'bruno')
+
+
+class ElegibilidadeTests(CirculacaoTestCase):
+    def test_uma_consulta_com_os_fatos_do_usuario_e_do_livro(self):
+        self.emprestar(self.ana)
+        Reserva.objects.create(usuario=self.ana, livro=self.livro, status='ativa')
+
+        with self.assertNumQueries(1):
+            elegibilidade = Elegibilidade.consultar(self.ana, self.livro)
+
+        self.assertEqual(elegibilidade.emprestimos_ativos, 1)
+        self.assertTrue(elegibilidade.emprestimo_do_livro)
+        self.assertEqual(elegibilidade.reservas_ativas, 1)
+        self.assertTrue(elegibilidade.reserva_do_livro)
+        self.assertEqual(elegibilidade.quantidade_disponivel, 0)
+
+    def test_limites_vem_da_politica(self):
+        restrita = PoliticaCirculacao(max_emprestimos=1, max_reservas=1)
+        outro = Livro.objects.create(titulo='Outro', autor=self.autor, genero='ficcao', quantidade=2)
+        self.emprestar(self.ana, outro)
+        Reserva.objects.create(usuario=self.ana, livro=outro, status='ativa')
+
+        self.assertIsNone(Elegibilidade.consultar(self.ana, self.livro).erro_emprestimo())
+        elegibilidade = Elegibilidade.consultar(self.ana, self.livro, politica=restrita)
+        self.assertEqual(
+            elegibilidade.erro_emprestimo(),
+            'Este usuário já atingiu o limite máximo de 1 empréstimos ativos.',
+        )
+        self.assertTrue(elegibilidade.atingiu_limite_reservas)
+        self.assertEqual(elegibilidade.erro_reserva(), 'O usuário não pode fazer mais reservas ativas.')
+
+    def test_ordem_dos_impedimentos(self):
+        self.emprestar(self.ana)
+        self.emprestar(self.bruno)
+        # Empréstimo duplicado vem antes da falta de exemplares
+        self.assertEqual(
+            Elegibilidade.consultar(self.ana, self.livro).erro_emprestimo(),
+            'Este usuário já possui um empréstimo ativo deste livro.',
+        )
+        self.assertEqual(
+            Elegibilidade.consultar(self.admin, self.livro).erro_emprestimo(),
+            'Este livro não está disponível para empréstimo.',
+        )
+
+    def test_limite_de_emprestimos_no_lote_e_no_formulario(self):
+        for i in range(politica.max_emprestimos):
+            self.emprestar(self.ana, Livro.objects.create(
+                titulo=f'Livro {i}', autor=self.autor, genero='ficcao', quantidade=1
+            ))
+        erro = f'Este usuário já atingiu o limite máximo de {politica.max_emprestimos} empréstimos ativos.'
+
+        resultado = emprestar_em_lote([(self.ana.pk, self.livro.pk), (self.bruno.pk, self.livro.pk)])
+        self.assertEqual([item.get('erro') for item in resultado], [erro, None])
+
+        formulario = EmprestimoForm(data={'usuario': self.ana.pk, 'livro': self.livro.pk})
+        self.assertFalse(formulario.is_valid())
+        self.assertEqual(formulario.non_field_errors(), [erro])
+
+        outro = Livro.objects.create(titulo='Outro', autor=self.autor, genero='ficcao', quantidade=1)
+        lote = emprestar_em_lote([(self.bruno.pk, outro.pk)], politica=PoliticaCirculacao(max_emprestimos=1))
+        self.assertEqual(lote[0]['erro'], 'Este usuário já atingiu o limite máximo de 1 empréstimos ativos.')
+
+    def test_prazos_da_politica(self):
+        emprestimo = self.emprestar(self.ana)
+        self.assertAlmostEqual(
+            (emprestimo.data_devolucao_prevista - emprestimo.data_emprestimo).total_seconds(),
+            politica.prazo_emprestimo.total_seconds(),
+            delta=5,
+        )
+        reserva = Reserva.objects.create(usuario=self.bruno, livro=self.livro, status='ativa')
+        self.assertAlmostEqual(
+            (reserva.data_expiracao - reserva.data_reserva).total_seconds(),
+            politica.validade_reserva.total_seconds(),
+            delta=5,
+        )
+
+    def test_templates_usam_o_limite_de_renovacoes_da_politica(self):
+        emprestimo = self.emprestar(self.ana)
+        Emprestimo.objects.filter(pk=emprestimo.pk).update(renovacoes=3)
+        self.client.force_login(self.admin)
+        detalhe = reverse('biblioteca:emprestimo_detail', args=[emprestimo.pk])
+
+        with mock.patch.object(politica, 'max_renovacoes', 4):
+            self.assertContains(self.client.get(reverse('biblioteca:emprestimo_create')), 'até <strong>4 vezes</strong>')
+            resposta = self.client.get(detalhe)
+        self.assertContains(resposta, '3/4 utilizadas')
+        self.assertContains(resposta, 'Renovar Empréstimo')
+        self.assertNotContains(resposta, 'Limite de renovações atingido')
+
+        with mock.patch.object(politica, 'max_renovacoes', 3):
+            resposta = self.client.get(detalhe)
+        self.assertContains(resposta, 'Este empréstimo já foi renovado 3 vezes.')
+        self.assertNotContains(resposta, 'Renovar Empréstimo')
+
+
+class RecomendacoesTests(CirculacaoTestCase):
+    def criar(self, livros, usuarios):
+        self.livros = [
+            Livro.objects.create(titulo=f'R{i}', autor=self.autor, genero='ficcao', quantidade=50)
+            for i in range(livros)
+        ]
+        self.usuarios = [Usuario.objects.create_user(f'leitor{i}', f'leitor{i}@senac.br') for i in range(usuarios)]
+
+    def pegar(self, usuario, *livros):
+        prazo = timezone.now() + politica.prazo_emprestimo
+        Emprestimo.objects.bulk_create([
+            Emprestimo(usuario=usuario, livro=livro, data_devolucao_prevista=prazo) for livro in livros
+        ])
+
+    def listas(self):
+        return {
+            livro_id: [(recomendado, round(pontuacao, 6)) for _, recomendado, pontuacao in linhas]
+            for livro_id, linhas in groupby(
+                LivroRecomendado.objects.order_by('livro', 'posicao')
+                .values_list('livro', 'posicao', 'recomendado', 'pontuacao'),
+                key=lambda linha: linha[0],
+            )
+            for linhas in [[linha[1:] for linha in linhas]]
+        }
+
+    def test_cosseno_e_ordem(self):
+        self.criar(3, 5)
+        a, b, c = self.livros
+        for usuario in self.usuarios[:2]:
+            self.pegar(usuario, a, b)
+        for usuario in self.usuarios[2:]:
+            self.pegar(usuario, b, c)
+
+        recomendacoes.reconstruir()
+
+        # B tem 5 leitores: 3 em comum com C (n=3) pesam mais que 2 com A (n=2)
+        self.assertEqual(
+            [(r.recomendado_id, round(r.pontuacao, 3)) for r in LivroRecomendado.do_livro(b.pk)],
+            [(c.pk, round(3 / math.sqrt(15), 3)), (a.pk, round(2 / math.sqrt(10), 3))],
+        )
+        self.assertEqual([r.recomendado_id for r in LivroRecomendado.do_livro(a.pk)], [b.pk])
+
+    def test_incremental_usa_o_total_de_leitores_do_vizinho(self):
+        self.criar(3, 6)
+        a, b, c = self.livros
+        for usuario in self.usuarios[:2]:
+            self.pegar(usuario, a, b)
+        for usuario in self.usuarios[2:5]:
+            self.pegar(usuario, b, c)
+        recomendacoes.reconstruir()
+
+        self.pegar(self.usuarios[5], a)
+        recomendacoes.atualizar()
+
+        # 2 em comum, n(A) = 3, n(B) = 5
+        self.assertAlmostEqual(LivroRecomendado.do_livro(a.pk)[0].pontuacao, 2 / math.sqrt(15))
+
+    def test_incremental_igual_ao_completo_nos_livros_afetados(self):
+        aleatorio = random.Random(7)
+        self.criar(40, 80)
+        for usuario in self.usuarios:
+            self.pegar(usuario, *aleatorio.sample(self.livros, 4))
+        motores = [('padrão', nullcontext())]
+        if recomendacoes.sparse is not None:
+            motores.append(('python', mock.patch.object(recomendacoes, 'sparse', None)))
+
+        for nome, contexto in motores:
+            with self.subTest(motor=nome), contexto:
+                recomendacoes.reconstruir()
+                novos = self.usuarios[:2]
+                for usuario in novos:
+                    self.pegar(usuario, *aleatorio.sample(self.livros, 2))
+                recomendacoes.atualizar()
+                incremental = self.listas()
+                recomendacoes.reconstruir()
+                completo = self.listas()
+
+                afetados = set(
+                    Emprestimo.objects.filter(usuario__in=novos).values_list('livro_id', flat=True)
+                )
+                self.assertTrue(afetados)
+                for livro_id in afetados:
+                    self.assertEqual(incremental.get(livro_id), completo.get(livro_id), livro_id)
+
+
+class DadosPopularidade(DadosCirculacao):
+    def setUp(self):
+        super().setUp()
+        self.recente = Livro.objects.create(titulo='Recente', autor=self.autor, genero='ficcao', quantidade=10)
+        self.antigo = Livro.objects.create(titulo='Antigo', autor=self.autor, genero='ficcao', quantidade=10)
+
+
+class PopularidadeTests(DadosPopularidade, TestCase):
+
+    def pontuacoes(self):
+        return dict(PopularidadeLivro.objects.values_list('livro_id', 'pontuacao'))
+
+    def test_emprestimos_antigos_pesam_menos(self):
+        meia_vida = settings.POPULARIDADE_MEIA_VIDA_DIAS
+        self.emprestar(self.ana, self.recente)
+        for usuario in (self.ana, self.bruno, self.admin):
+            emprestimo = Emprestimo.objects.create(usuario=usuario, livro=self.antigo)
+            Emprestimo.objects.filter(pk=emprestimo.pk).update(
+                data_emprestimo=timezone.now() - timedelta(days=4 * meia_vida)
+            )
+
+        popularidade.recalcular()
+
+        self.assertAlmostEqual(self.pontuacoes()[self.recente.pk], 1, places=3)
+        self.assertAlmostEqual(self.pontuacoes()[self.antigo.pk], 3 / 16, places=3)
+        populares = popularidade.mais_populares(2)
+        self.assertEqual([livro.pk for livro in populares], [self.recente.pk, self.antigo.pk])
+        self.assertEqual([livro.total_emprestimos for livro in populares], [1, 3])
+
+    def test_incremento_no_emprestimo_e_no_lote(self):
+        self.emprestar(self.ana, self.antigo)
+        emprestar_em_lote([(self.ana.pk, self.recente.pk), (self.bruno.pk, self.recente.pk)])
+
+        self.assertEqual(
+            {livro_id: round(pontuacao, 3) for livro_id, pontuacao in self.pontuacoes().items()},
+            {self.recente.pk: 2, self.antigo.pk: 1},
+        )
+
+    def test_decaimento_preserva_a_ordem_e_remove_os_frios(self):
+        self.emprestar(self.ana, self.recente)
+        self.emprestar(self.bruno, self.recente)
+        self.emprestar(self.ana, self.antigo)
+        meia_vida = timedelta(days=settings.POPULARIDADE_MEIA_VIDA_DIAS)
+
+        decaimento, removidos = popularidade.decair(popularidade.referencia() + meia_vida)
+        self.assertAlmostEqual(decaimento.fator, 0.5)
+        self.assertEqual(removidos, 0)
+        self.assertEqual(
+            {livro_id: round(pontuacao, 3) for livro_id, pontuacao in self.pontuacoes().items()},
+            {self.recente.pk: 1, self.antigo.pk: 0.5},
+        )
+        # Um empréstimo novo na escala da referência já movida vale o mesmo
+        # que os antigos valem hoje
+        self.emprestar(self.bruno, self.antigo)
+        self.assertAlmostEqual(self.pontuacoes()[self.antigo.pk], 0.5 + 0.5, places=3)
+
+        _, removidos = popularidade.decair(popularidade.referencia() + 10 * meia_vida)
+        self.assertEqual(removidos, 2)
+        self.assertEqual(popularidade.mais_populares(), [])
+
+
+class PopularidadeViewsTests(DadosPopularidade, TransactionTestCase):
+    # O dashboard lê da réplica, que só enxerga dados já commitados
+    def test_dashboard_e_lista_ordenados_pela_pontuacao(self):
+        self.emprestar(self.ana, self.antigo)
+        self.emprestar(self.ana, self.recente)
+        self.emprestar(self.bruno, self.recente)
+        self.client.force_login(self.admin)
+
+        resposta = self.client.get(reverse('biblioteca:dashboard'))
+        self.assertEqual(
+            [livro.pk for livro in resposta.context['livros_populares']], [self.recente.pk, self.antigo.pk]
+        )
+        resposta = self.client.get(reverse('biblioteca:livro_list'), {'ordenar': 'populares'})
+        self.assertEqual([livro.pk for livro in resposta.context['livros']], [self.recente.pk, self.antigo.pk])
+        resposta = self.client.get(reverse('biblioteca:livro_list'))
+        self.assertEqual(len(resposta.context['livros']), 3)
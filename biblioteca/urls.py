@@ -1,87 +1,113 @@
+from django.conf import settings
 from django.urls import path
 from django.shortcuts import redirect
-from . import views
+from .views import preguicosa
 
 app_name = 'biblioteca'
 
+# Cada view é importada na primeira requisição ao seu grupo (ver
+# biblioteca/views/__init__.py).
+# Sob ASGI os endpoints de polling usam as versões assíncronas (async ORM);
+# sob WSGI (gunicorn sync) continuam as versões síncronas. As assíncronas são
+# importadas já aqui: o handler precisa ver a coroutine para não tratá-las
+# como síncronas.
+if settings.VIEWS_ASYNC:
+    from .views import disponibilidade
+
+    livros_disponiveis_view = disponibilidade.livros_disponiveis_async
+    verificar_disponibilidade_view = disponibilidade.verificar_disponibilidade_async
+    stream_disponibilidade_view = disponibilidade.stream_disponibilidade_async
+else:
+    livros_disponiveis_view = preguicosa('disponibilidade.livros_disponiveis')
+    verificar_disponibilidade_view = preguicosa('disponibilidade.verificar_disponibilidade')
+    stream_disponibilidade_view = preguicosa('disponibilidade.stream_disponibilidade')
+
 def home_redirect(request):
     if request.user.is_authenticated and request.user.is_admin():
-        from .views import HomeView
+        from .views.painel import HomeView
         return HomeView.as_view()(request)
     return redirect('biblioteca:livro_list')
 
 urlpatterns = [
     path('', lambda request: redirect('/home'), name='home'),
-    path('home/', views.HomeView.as_view(), name='home'),
+    path('home/', preguicosa('painel.HomeView'), name='home'),
 
     # Autenticação
-    path('login/', views.LoginView.as_view(), name='login'),
-    path('logout/', views.LogoutView.as_view(), name='logout'),
-    path('register/', views.RegisterView.as_view(), name='register'),
-    path('profile/', views.ProfileView.as_view(), name='profile'),
+    path('login/', preguicosa('contas.LoginView'), name='login'),
+    path('logout/', preguicosa('contas.LogoutView'), name='logout'),
+    path('register/', preguicosa('contas.RegisterView'), name='register'),
+    path('profile/', preguicosa('contas.ProfileView'), name='profile'),
     
     # URLs para livros e autores
-    path('livros/', views.LivroListView.as_view(), name='livro_list'),
-    path('livros/<int:pk>/', views.LivroDetailView.as_view(), name='livro_detail'),
-    path('livros/buscar/', views.LivroBuscarView.as_view(), name='livro_buscar'),
+    path('livros/', preguicosa('catalogo.LivroListView'), name='livro_list'),
+    path('livros/<int:pk>/', preguicosa('catalogo.LivroDetailView'), name='livro_detail'),
+    path('livros/buscar/', preguicosa('catalogo.LivroBuscarView'), name='livro_buscar'),
     
     # URLs para administração de livros e autores
-    path('manage/livros/criar/', views.LivroCreateView.as_view(), name='livro_create'),
-    path('manage/livros/<int:pk>/editar/', views.LivroUpdateView.as_view(), name='livro_update'),
-    path('manage/livros/<int:pk>/deletar/', views.LivroDeleteView.as_view(), name='livro_delete'),
+    path('manage/livros/criar/', preguicosa('catalogo.LivroCreateView'), name='livro_create'),
+    path('manage/livros/<int:pk>/editar/', preguicosa('catalogo.LivroUpdateView'), name='livro_update'),
+    path('manage/livros/<int:pk>/deletar/', preguicosa('catalogo.LivroDeleteView'), name='livro_delete'),
 
     # URLs para administração de autores
-    path('manage/autores/criar/', views.AutorCreateView.as_view(), name='autor_create'),
-    path('manage/autores/<int:pk>/editar/', views.AutorUpdateView.as_view(), name='autor_update'),
-    path('manage/autores/<int:pk>/deletar/', views.AutorDeleteView.as_view(), name='autor_delete'),
+    path('manage/autores/criar/', preguicosa('catalogo.AutorCreateView'), name='autor_create'),
+    path('manage/autores/<int:pk>/editar/', preguicosa('catalogo.AutorUpdateView'), name='autor_update'),
+    path('manage/autores/<int:pk>/deletar/', preguicosa('catalogo.AutorDeleteView'), name='autor_delete'),
 
     # URLs para administração de usuários
-    path('manage/usuarios/', views.UsuarioListView.as_view(), name='usuario_list'),
-    path('manage/usuarios/<int:pk>/', views.UsuarioDetailView.as_view(), name='usuario_detail'),
-    path('manage/usuarios/<int:pk>/editar/', views.UsuarioUpdateView.as_view(), name='usuario_update'),
-    path('manage/usuarios/<int:pk>/deletar/', views.UsuarioDeleteView.as_view(), name='usuario_delete'),
+    path('manage/usuarios/', preguicosa('usuarios.UsuarioListView'), name='usuario_list'),
+    path('manage/usuarios/<int:pk>/', preguicosa('usuarios.UsuarioDetailView'), name='usuario_detail'),
+    path('manage/usuarios/<int:pk>/editar/', preguicosa('usuarios.UsuarioUpdateView'), name='usuario_update'),
+    path('manage/usuarios/<int:pk>/deletar/', preguicosa('usuarios.UsuarioDeleteView'), name='usuario_delete'),
 
     # URLs para administração de empréstimos
-    path('manage/emprestimos/criar/', views.EmprestimoCreateView.as_view(), name='emprestimo_create'),
+    path('manage/emprestimos/criar/', preguicosa('emprestimos.EmprestimoCreateView'), name='emprestimo_create'),
 
     # URLs para administração de categorias
-    path('manage/categorias/criar/', views.CategoriaCreateView.as_view(), name='categoria_create'),
-    path('manage/categorias/<int:pk>/editar/', views.CategoriaUpdateView.as_view(), name='categoria_update'),
-    path('manage/categorias/<int:pk>/deletar/', views.CategoriaDeleteView.as_view(), name='categoria_delete'),
+    path('manage/categorias/criar/', preguicosa('catalogo.CategoriaCreateView'), name='categoria_create'),
+    path('manage/categorias/<int:pk>/editar/', preguicosa('catalogo.CategoriaUpdateView'), name='categoria_update'),
+    path('manage/categorias/<int:pk>/deletar/', preguicosa('catalogo.CategoriaDeleteView'), name='categoria_delete'),
 
     # URLs para administração de dashboard e relatórios
-    path('manage/dashboard/', views.AdminDashboardView.as_view(), name='admin_dashboard'),
+    path('manage/dashboard/', preguicosa('painel.AdminDashboardView'), name='admin_dashboard'),
+    path('manage/consultas-lentas/', preguicosa('painel.ConsultasLentasView'), name='consultas_lentas'),
 
     # URLs para reservas de livros
-    path('reservas/', views.ReservaListView.as_view(), name='reserva_list'),
-    path('reservas/minhas/', views.MinhasReservasView.as_view(), name='minhas_reservas'),
-    path('livros/<int:livro_id>/reservar/', views.ReservarLivroView.as_view(), name='reservar_livro'),
-    path('reservas/<int:pk>/cancelar/', views.CancelarReservaView.as_view(), name='cancelar_reserva'),
-    path('reservas/<int:pk>/deletar/', views.DeletarReservaView.as_view(), name='deletar_reserva'),
-    path('reservas/exportar/', views.ExportarReservasView.as_view(), name='exportar_reservas'),
+    path('reservas/', preguicosa('reservas.ReservaListView'), name='reserva_list'),
+    path('reservas/minhas/', preguicosa('reservas.MinhasReservasView'), name='minhas_reservas'),
+    path('livros/<int:livro_id>/reservar/', preguicosa('reservas.ReservarLivroView'), name='reservar_livro'),
+    path('livros/<int:livro_id>/fila/posicao/', preguicosa('reservas.PosicaoFilaView'), name='posicao_fila'),
+    path('reservas/<int:pk>/cancelar/', preguicosa('reservas.CancelarReservaView'), name='cancelar_reserva'),
+    path('reservas/<int:pk>/deletar/', preguicosa('reservas.DeletarReservaView'), name='deletar_reserva'),
+    path('reservas/exportar/', preguicosa('reservas.ExportarReservasView'), name='exportar_reservas'),
     
     # URLs para empréstimos
-    path('emprestimos/', views.EmprestimoListView.as_view(), name='emprestimo_list'),
-    path('emprestimos/<int:pk>/', views.EmprestimoDetailView.as_view(), name='emprestimo_detail'),
-    path('emprestimos/<int:pk>/devolver/', views.devolver_livro, name='devolver_livro'),
-    path('emprestimos/<int:pk>/renovar/', views.renovar_emprestimo, name='renovar_emprestimo'),
+    path('emprestimos/', preguicosa('emprestimos.EmprestimoListView'), name='emprestimo_list'),
+    path('emprestimos/<int:pk>/', preguicosa('emprestimos.EmprestimoDetailView'), name='emprestimo_detail'),
+    path('emprestimos/renovar-todos/', preguicosa('emprestimos.renovar_todos_emprestimos'), name='renovar_todos_emprestimos'),
+    path('emprestimos/<int:pk>/devolver/', preguicosa('emprestimos.devolver_livro'), name='devolver_livro'),
+    path('emprestimos/<int:pk>/renovar/', preguicosa('emprestimos.renovar_emprestimo'), name='renovar_emprestimo'),
     
     # URLs para categorias
-    path('categorias/', views.CategoriaListView.as_view(), name='categoria_list'),
+    path('categorias/', preguicosa('catalogo.CategoriaListView'), name='categoria_list'),
     
     # URLs para relatórios e dashboard
-    path('relatorios/', views.RelatoriosView.as_view(), name='relatorios'),
-    path('dashboard/', views.DashboardView.as_view(), name='dashboard'),
+    path('relatorios/', preguicosa('relatorios.RelatoriosView'), name='relatorios'),
+    path('relatorios/emprestimos/', preguicosa('relatorios.RelatorioEmprestimosView'), name='relatorio_emprestimos'),
+    path('dashboard/', preguicosa('painel.DashboardView'), name='dashboard'),
     
     # AJAX URLs
-    path('ajax/livros-disponiveis/', views.livros_disponiveis, name='livros_disponiveis'),
-    path('ajax/verificar-disponibilidade/<int:livro_id>/', views.verificar_disponibilidade, name='ajax_verificar_disponibilidade'),
+    path('ajax/livros-disponiveis/', livros_disponiveis_view, name='livros_disponiveis'),
+    path('ajax/verificar-disponibilidade/<int:livro_id>/', verificar_disponibilidade_view, name='ajax_verificar_disponibilidade'),
     
     # URLs para administração
-    path('api/livros/disponibilidade/<int:livro_id>/', views.VerificarDisponibilidadeView.as_view(), name='verificar_disponibilidade'),
-    path('api/reservas/expirar/', views.ExpirarReservasView.as_view(), name='expirar_reservas'),
+    path('api/livros/disponibilidade/stream/', stream_disponibilidade_view, name='stream_disponibilidade'),
+    path('api/livros/disponibilidade/', preguicosa('disponibilidade.VerificarDisponibilidadeView'), name='disponibilidade_livros'),
+    path('api/livros/disponibilidade/<int:livro_id>/', preguicosa('disponibilidade.VerificarDisponibilidadeView'), name='verificar_disponibilidade'),
+    path('api/circulacao/lote/', preguicosa('emprestimos.CirculacaoLoteView'), name='circulacao_lote'),
+    path('api/reservas/expirar/', preguicosa('reservas.ExpirarReservasView'), name='expirar_reservas'),
+    path('metrics', preguicosa('painel.exportar_metricas'), name='metricas'),
 
     # URLs para autores (listagem e detalhes)
-    path('autores/', views.AutorListView.as_view(), name='autor_list'),
-    path('autores/<int:pk>/', views.AutorDetailView.as_view(), name='autor_detail'),
+    path('autores/', preguicosa('catalogo.AutorListView'), name='autor_list'),
+    path('autores/<int:pk>/', preguicosa('catalogo.AutorDetailView'), name='autor_detail'),
 ]
\ No newline at end of file
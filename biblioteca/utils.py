@@ -0,0 +1,47 @@
+import re
+import unicodedata
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Func, IntegerField, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def normalizar_nome(nome):
+    """
+    Forma canônica de um nome para comparação: sem acentos, em caixa baixa
+    (casefold) e com os espaços colapsados. "  Machado  de Assís" e
+    "machado de assis" viram a mesma chave.
+    """
+    decomposto = unicodedata.normalize('NFKD', nome or '')
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', sem_acentos).strip().casefold()
+
+
+def subconsulta_contagem(queryset):
+    """
+    ``(SELECT COUNT(*) ...)`` de ``queryset`` para usar em annotate(); pode
+    referenciar a consulta externa com OuterRef. Ao contrário de Count() em
+    várias relações, não multiplica as linhas do JOIN.
+    """
+    return Coalesce(
+        Subquery(
+            queryset.order_by()
+            .annotate(total=Func(Value(1), function='COUNT'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def incrementar(modelo, chave, **incrementos):
+    """Soma ``incrementos`` na linha ``chave``, criando-a se ainda não existir."""
+    valores = {campo: F(campo) + valor for campo, valor in incrementos.items()}
+    if modelo.objects.filter(**chave).update(**valores):
+        return
+    try:
+        with transaction.atomic():
+            modelo.objects.create(**chave, **incrementos)
+    except IntegrityError:
+        # Outra requisição criou a linha ao mesmo tempo
+        modelo.objects.filter(**chave).update(**valores)
@@ -0,0 +1,70 @@
+"""
+Views do app, separadas em um módulo por grupo de URLs.
+
+As URLs (biblioteca/urls.py) apontam para ``preguicosa('grupo.Nome')``: o
+módulo do grupo só é importado na primeira requisição que cai nele, então um
+worker novo não paga o import de todas as views e formulários antes de
+atender. ``from biblioteca import views; views.HomeView`` continua
+funcionando e importa o grupo sob demanda.
+"""
+from functools import cached_property
+from importlib import import_module
+
+
+GRUPOS = (
+    'contas', 'catalogo', 'reservas', 'emprestimos', 'painel',
+    'usuarios', 'relatorios', 'disponibilidade',
+)
+
+
+class ViewPreguicosa:
+    """
+    Callable de URL que importa a view na primeira chamada.
+
+    Atributos lidos pelo Django e pelos middlewares (``usar_replica``,
+    ``csrf_exempt``...) são repassados para a view, o que também importa o
+    grupo. ``view_class`` não é repassado: o resolver o consulta em todas as
+    URLs ao montar o reverse(), e isso importaria todos os grupos. Sem ele o
+    Django usa ``__module__`` e ``__name__``, que apontam para a mesma view.
+
+    Views assíncronas não podem passar por aqui: o handler decide entre sync
+    e async olhando o callable, antes de chamá-lo.
+    """
+
+    def __init__(self, caminho):
+        grupo, self.__name__ = caminho.rsplit('.', 1)
+        self.__module__ = f'{__name__}.{grupo}'
+        self.__qualname__ = self.__name__
+
+    @cached_property
+    def view(self):
+        alvo = getattr(import_module(self.__module__), self.__name__)
+        return alvo.as_view() if isinstance(alvo, type) else alvo
+
+    def __call__(self, request, *args, **kwargs):
+        return self.view(request, *args, **kwargs)
+
+    def __getattr__(self, nome):
+        if nome.startswith('__') or nome in ('view', 'view_class'):
+            raise AttributeError(nome)
+        view = self.view
+        if hasattr(view, nome):
+            return getattr(view, nome)
+        # Atributos de classe das CBVs (usar_replica) ficam na view_class
+        return getattr(getattr(view, 'view_class', view), nome)
+
+    def __repr__(self):
+        return f'<ViewPreguicosa {self.__module__}.{self.__name__}>'
+
+
+def preguicosa(caminho):
+    """``preguicosa('reservas.ReservaListView')`` para usar em path()."""
+    return ViewPreguicosa(caminho)
+
+
+def __getattr__(nome):
+    for grupo in GRUPOS:
+        modulo = import_module(f'{__name__}.{grupo}')
+        if hasattr(modulo, nome):
+            return getattr(modulo, nome)
+    raise AttributeError(f'module {__name__!r} has no attribute {nome!r}')
@@ -0,0 +1,8 @@
+"""Mixins compartilhados pelas views."""
+from django.contrib.auth.mixins import UserPassesTestMixin
+
+
+# Mixin for admin-only access
+class AdminRequiredMixin(UserPassesTestMixin):
+    def test_func(self):
+        return self.request.user.is_authenticated and self.request.user.is_admin()
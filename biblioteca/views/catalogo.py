@@ -0,0 +1,170 @@
+"""Catálogo: livros, autores e categorias."""
+from django.views.generic import TemplateView, ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.contrib import messages
+from django.db.models import Prefetch, Q
+from django.urls import reverse_lazy
+from ..forms import LivroForm, AutorForm, CategoriaForm
+from ..models import Livro, Autor, Categoria, Emprestimo, LivroRecomendado
+from ..utils import normalizar_nome
+from .base import AdminRequiredMixin
+
+
+# Livro views
+class LivroListView(ListView):
+    model = Livro
+    template_name = 'biblioteca/livro_list.html'
+    context_object_name = 'livros'
+    paginate_by = 12
+    
+    def get_queryset(self):
+        queryset = Livro.objects.select_related('autor').all()
+        
+        # Search functionality
+        query = self.request.GET.get('q')
+        if query:
+            queryset = queryset.filter(
+                Q(titulo__icontains=query) |
+                Q(autor__nome_normalizado__contains=normalizar_nome(query))
+            )
+        
+        # Filter by genre
+        genero = self.request.GET.get('genero')
+        if genero:
+            queryset = queryset.filter(genero=genero)
+
+        if self.request.GET.get('ordenar') == 'populares':
+            # Percorre o índice da pontuação; livros sem empréstimos recentes
+            # não têm pontuação e ficam de fora
+            return queryset.filter(popularidade__isnull=False).order_by(
+                '-popularidade__pontuacao', 'popularidade__livro_id'
+            )
+        return queryset.order_by('titulo')
+
+class LivroDetailView(DetailView):
+    model = Livro
+    template_name = 'biblioteca/livro_detail.html'
+    context_object_name = 'livro'
+    
+    def get_queryset(self):
+        # Autor e totais de circulação na mesma consulta do livro
+        queryset = Livro.anotar_circulacao(Livro.objects.select_related('autor'))
+        if self.request.user.is_authenticated and self.request.user.is_admin():
+            # Histórico de empréstimos exibido aos administradores
+            queryset = queryset.prefetch_related(
+                Prefetch('emprestimos', queryset=Emprestimo.objects.select_related('usuario'))
+            )
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Calculadas em lote (calcular_recomendacoes): só uma leitura pelo índice
+        context['recomendacoes'] = LivroRecomendado.do_livro(self.object.pk)
+        return context
+
+class LivroBuscarView(TemplateView):
+    template_name = 'biblioteca/livro_buscar.html'
+
+class LivroCreateView(AdminRequiredMixin, CreateView):
+    model = Livro
+    form_class = LivroForm
+    template_name = 'biblioteca/livro_form.html'
+    success_url = reverse_lazy('biblioteca:livro_list')
+    
+    def form_valid(self, form):
+        messages.success(self.request, 'Livro criado com sucesso!')
+        return super().form_valid(form)
+
+class LivroUpdateView(AdminRequiredMixin, UpdateView):
+    model = Livro
+    form_class = LivroForm
+    template_name = 'biblioteca/livro_form.html'
+    success_url = reverse_lazy('biblioteca:livro_list')
+    
+    def form_valid(self, form):
+        messages.success(self.request, 'Livro atualizado com sucesso!')
+        return super().form_valid(form)
+
+class LivroDeleteView(AdminRequiredMixin, DeleteView):
+    model = Livro
+    template_name = 'biblioteca/livro_confirm_delete.html'
+    success_url = reverse_lazy('biblioteca:livro_list')
+
+# Autor views
+class AutorListView(ListView):
+    model = Autor
+    template_name = 'biblioteca/autor_list.html'
+    context_object_name = 'autores'
+
+class AutorDetailView(DetailView):
+    model = Autor
+    template_name = 'biblioteca/autor_detail.html'
+    context_object_name = 'autor'
+
+class AutorCreateView(AdminRequiredMixin, CreateView):
+    model = Autor
+    form_class = AutorForm
+    template_name = 'biblioteca/autor_form.html'
+    success_url = reverse_lazy('biblioteca:autor_list')
+    
+    def form_valid(self, form):
+        messages.success(self.request, 'Autor criado com sucesso!')
+        return super().form_valid(form)
+
+class AutorUpdateView(AdminRequiredMixin, UpdateView):
+    model = Autor
+    form_class = AutorForm
+    template_name = 'biblioteca/autor_form.html'
+    success_url = reverse_lazy('biblioteca:autor_list')
+    
+    def form_valid(self, form):
+        messages.success(self.request, 'Autor atualizado com sucesso!')
+        return super().form_valid(form)
+
+class AutorDeleteView(AdminRequiredMixin, DeleteView):
+    model = Autor
+    template_name = 'biblioteca/autor_confirm_delete.html'
+    success_url = reverse_lazy('biblioteca:autor_list')
+    
+    def delete(self, request, *args, **kwargs):
+        messages.success(request, 'Autor excluído com sucesso!')
+        return super().delete(request, *args, **kwargs)
+
+# Categoria views
+class CategoriaListView(ListView):
+    model = Categoria
+    template_name = 'biblioteca/categoria_list.html'
+    context_object_name = 'categorias'
+
+class CategoriaDetailView(DetailView):
+    model = Categoria
+    template_name = 'biblioteca/categoria_detail.html'
+    context_object_name = 'categoria'
+
+class CategoriaCreateView(AdminRequiredMixin, CreateView):
+    model = Categoria
+    form_class = CategoriaForm
+    template_name = 'biblioteca/categoria_form.html'
+    success_url = reverse_lazy('biblioteca:categoria_list')
+    
+    def form_valid(self, form):
+        messages.success(self.request, 'Categoria criada com sucesso!')
+        return super().form_valid(form)
+
+class CategoriaUpdateView(AdminRequiredMixin, UpdateView):
+    model = Categoria
+    form_class = CategoriaForm
+    template_name = 'biblioteca/categoria_form.html'
+    success_url = reverse_lazy('biblioteca:categoria_list')
+    
+    def form_valid(self, form):
+        messages.success(self.request, 'Categoria atualizada com sucesso!')
+        return super().form_valid(form)
+
+class CategoriaDeleteView(AdminRequiredMixin, DeleteView):
+    model = Categoria
+    template_name = 'biblioteca/categoria_confirm_delete.html'
+    success_url = reverse_lazy('biblioteca:categoria_list')
+    
+    def delete(self, request, *args, **kwargs):
+        messages.success(request, 'Categoria excluída com sucesso!')
+        return super().delete(request, *args, **kwargs)
@@ -0,0 +1,84 @@
+"""Login, cadastro e perfil do usuário."""
+from django.shortcuts import render, redirect
+from django.views.generic import TemplateView
+from django.contrib.auth.views import LoginView as AuthLoginView, LogoutView as AuthLogoutView
+from django.contrib.auth import login
+from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.urls import reverse_lazy
+from ..forms import LoginForm, RegisterForm, ProfileForm
+
+
+class LoginView(AuthLoginView):
+    template_name = 'biblioteca/login.html'
+    form_class = LoginForm
+    
+    def get_success_url(self):
+        if self.request.user.is_admin():
+            return reverse_lazy('biblioteca:admin_dashboard')
+        return reverse_lazy('biblioteca:home')
+
+class LogoutView(AuthLogoutView):
+    next_page = 'biblioteca:home'
+
+class RegisterView(TemplateView):
+    template_name = 'biblioteca/register.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['form'] = RegisterForm()
+        return context
+    
+    def post(self, request, *args, **kwargs):
+        form = RegisterForm(request.POST)
+        if form.is_valid():
+            try:
+                user = form.save(commit=False)
+                # Definir tipo de usuário padrão como aluno
+                user.tipo_usuario = 'aluno'
+                user.save()
+                
+                # Fazer login automático após registro
+                login(request, user)
+                messages.success(request, 'Conta criada com sucesso! Bem-vindo à Biblioteca SENAC!')
+                return redirect('biblioteca:dashboard')
+            except Exception as e:
+                messages.error(request, f'Erro ao criar conta: {str(e)}')
+        else:
+            # Exibir erros de validação
+            for field, errors in form.errors.items():
+                for error in errors:
+                    messages.error(request, f'{form.fields[field].label}: {error}')
+        
+        context = self.get_context_data()
+        context['form'] = form
+        return render(request, self.template_name, context)
+
+class ProfileView(LoginRequiredMixin, TemplateView):
+    template_name = 'biblioteca/profile.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['form'] = ProfileForm(instance=self.request.user)
+        context['user'] = self.request.user
+        
+        # Estatísticas do usuário
+        context['total_reservas'] = self.request.user.get_total_reservations()
+        context['reservas_ativas'] = self.request.user.get_active_reservations()
+        context['total_emprestimos'] = self.request.user.get_total_loans()
+        context['emprestimos_ativos'] = self.request.user.get_active_loans()
+        
+        return context
+    
+    def post(self, request, *args, **kwargs):
+        form = ProfileForm(request.POST, instance=request.user)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Perfil atualizado com sucesso!')
+            return redirect('biblioteca:profile')
+        else:
+            messages.error(request, 'Erro ao atualizar perfil. Verifique os dados.')
+        
+        context = self.get_context_data()
+        context['form'] = form
+        return render(request, self.template_name, context)
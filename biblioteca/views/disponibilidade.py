@@ -0,0 +1,201 @@
+"""Consultas de disponibilidade: JSON, polling (síncrono e assíncrono) e stream SSE."""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from django.views import View
+from django.http import HttpResponse, JsonResponse, Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
+from ..models import Livro
+from ..disponibilidade import broadcaster
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class VerificarDisponibilidadeView(View):
+    """
+    Disponibilidade de vários livros em uma única consulta.
+
+    GET  api/livros/disponibilidade/?ids=1,2,3 (ou ?ids=1&ids=2)
+    POST api/livros/disponibilidade/ com JSON {"ids": [1, 2, 3]}
+
+    Responde {"<id>": [quantidade_disponivel, quantidade_total], ...} com ETag;
+    um GET com If-None-Match igual recebe 304. O POST não altera nada, por
+    isso dispensa o token CSRF.
+    """
+    max_livros = 500
+
+    def get(self, request, livro_id=None):
+        if livro_id is not None:
+            livro_ids = [livro_id]
+        else:
+            try:
+                livro_ids = _ler_ids(request.GET.getlist('ids'), self.max_livros)
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+        return self.responder(request, livro_ids)
+
+    def post(self, request, livro_id=None):
+        try:
+            corpo = json.loads(request.body or b'{}')
+            livro_ids = _ler_ids(corpo.get('ids', []), self.max_livros)
+        except (ValueError, AttributeError) as e:
+            return JsonResponse({'error': f'Corpo inválido: {e}'}, status=400)
+        return self.responder(request, livro_ids)
+
+    def responder(self, request, livro_ids):
+        disponibilidade = {
+            str(livro_id): [disponivel, total]
+            for livro_id, disponivel, total in Livro.objects
+            .filter(id__in=livro_ids)
+            .order_by('id')
+            .values_list('id', 'quantidade_disponivel', 'quantidade')
+        }
+        conteudo = json.dumps(disponibilidade, separators=(',', ':'))
+        etag = '"%s"' % hashlib.md5(conteudo.encode()).hexdigest()
+
+        if request.method == 'GET':
+            response = get_conditional_response(request, etag=etag)
+            if response is not None:
+                return response
+
+        response = HttpResponse(conteudo, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+def livros_disponiveis(request):
+    livros = Livro.objects.filter(quantidade_disponivel__gt=0).values('id', 'titulo', 'autor__nome')
+    data = [{'id': l['id'], 'titulo': l['titulo'], 'autor': l['autor__nome']} for l in livros]
+    return JsonResponse({'livros': data})
+
+def verificar_disponibilidade(request, livro_id):
+    livro = get_object_or_404(Livro, pk=livro_id)
+    return JsonResponse({
+        'disponivel': livro.is_available(),
+        'quantidade_disponivel': livro.quantidade_disponivel,
+        'quantidade_total': livro.quantidade
+    })
+
+# Versões assíncronas dos endpoints de polling (usadas quando o projeto roda sob ASGI)
+async def livros_disponiveis_async(request):
+    livros = Livro.objects.filter(quantidade_disponivel__gt=0).values('id', 'titulo', 'autor__nome')
+    data = [{'id': l['id'], 'titulo': l['titulo'], 'autor': l['autor__nome']} async for l in livros]
+    return JsonResponse({'livros': data})
+
+async def verificar_disponibilidade_async(request, livro_id):
+    try:
+        livro = await Livro.objects.only('quantidade', 'quantidade_disponivel').aget(pk=livro_id)
+    except Livro.DoesNotExist:
+        raise Http404('Livro não encontrado.')
+    return JsonResponse({
+        'disponivel': livro.is_available(),
+        'quantidade_disponivel': livro.quantidade_disponivel,
+        'quantidade_total': livro.quantidade
+    })
+
+# Stream SSE de disponibilidade
+MAX_LIVROS_STREAM = 200
+
+def _ler_ids(valores, limite):
+    """Converte ids vindos da query string (?ids=1&ids=2 ou ?ids=1,2) em uma lista de inteiros."""
+    ids = []
+    for valor in valores:
+        for parte in str(valor).split(','):
+            parte = parte.strip()
+            if not parte:
+                continue
+            if not parte.isdigit():
+                raise ValueError(f'ID inválido: {parte}')
+            ids.append(int(parte))
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > limite:
+        raise ValueError(f'No máximo {limite} livros por requisição.')
+    return ids
+
+def _evento_sse(evento_id, livro_id, quantidade):
+    dados = json.dumps({'livro': livro_id, 'quantidade_disponivel': quantidade})
+    return f'id: {evento_id}\nevent: disponibilidade\ndata: {dados}\n\n'
+
+def _estado_inicial_sse(livro_ids):
+    ultimo_id = broadcaster.ultimo_id()
+    atuais = Livro.objects.filter(id__in=livro_ids).values_list('id', 'quantidade_disponivel')
+    eventos = [_evento_sse(ultimo_id, livro_id, quantidade) for livro_id, quantidade in atuais]
+    return ultimo_id, eventos
+
+def _inicio_stream(request):
+    try:
+        livro_ids = _ler_ids(request.GET.getlist('ids'), MAX_LIVROS_STREAM)
+    except ValueError as e:
+        return None, None, HttpResponseBadRequest(str(e))
+    if not livro_ids:
+        return None, None, HttpResponseBadRequest('Informe ao menos um livro em ?ids=.')
+
+    ultimo_id = request.headers.get('Last-Event-ID')
+    ultimo_id = int(ultimo_id) if ultimo_id and ultimo_id.isdigit() else None
+    return livro_ids, ultimo_id, None
+
+def _resposta_sse(conteudo):
+    response = StreamingHttpResponse(conteudo, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def stream_disponibilidade(request):
+    """
+    Envia por Server-Sent Events as mudanças de quantidade_disponivel dos
+    livros em ?ids=. Sob WSGI cada conexão ocupa uma thread, então o stream
+    é encerrado depois de SSE_DURACAO_MAXIMA segundos e o navegador reconecta
+    sozinho (continuando do Last-Event-ID).
+    """
+    livro_ids, ultimo_id, erro = _inicio_stream(request)
+    if erro:
+        return erro
+
+    def eventos():
+        nonlocal ultimo_id
+        yield f'retry: {settings.SSE_RECONEXAO_MS}\n\n'
+        if ultimo_id is None:
+            ultimo_id, iniciais = _estado_inicial_sse(livro_ids)
+            yield from iniciais
+
+        limite = time.monotonic() + settings.SSE_DURACAO_MAXIMA
+        while time.monotonic() < limite:
+            mudancas = broadcaster.mudancas_desde(ultimo_id, livro_ids)
+            for ultimo_id, livro_id, quantidade in mudancas:
+                yield _evento_sse(ultimo_id, livro_id, quantidade)
+            if not mudancas:
+                yield ': ping\n\n'
+            broadcaster.aguardar(settings.SSE_INTERVALO)
+
+    return _resposta_sse(eventos())
+
+async def stream_disponibilidade_async(request):
+    """Versão ASGI do stream: a espera não ocupa uma thread do servidor."""
+    livro_ids, ultimo_id, erro = _inicio_stream(request)
+    if erro:
+        return erro
+
+    async def eventos():
+        nonlocal ultimo_id
+        yield f'retry: {settings.SSE_RECONEXAO_MS}\n\n'
+        if ultimo_id is None:
+            ultimo_id, iniciais = await sync_to_async(_estado_inicial_sse)(livro_ids)
+            for evento in iniciais:
+                yield evento
+
+        mudancas_desde = sync_to_async(broadcaster.mudancas_desde)
+        limite = time.monotonic() + settings.SSE_DURACAO_MAXIMA_ASYNC
+        while time.monotonic() < limite:
+            mudancas = await mudancas_desde(ultimo_id, livro_ids)
+            for ultimo_id, livro_id, quantidade in mudancas:
+                yield _evento_sse(ultimo_id, livro_id, quantidade)
+            if not mudancas:
+                yield ': ping\n\n'
+            await broadcaster.aguardar_async(settings.SSE_INTERVALO)
+
+    return _resposta_sse(eventos())
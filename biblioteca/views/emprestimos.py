@@ -0,0 +1,348 @@
+"""Empréstimos: cadastro, devolução, renovação e circulação em lote."""
+import json
+import logging
+import time
+
+from django.db import transaction
+from django.shortcuts import redirect, get_object_or_404
+from django.views import View
+from django.views.generic import ListView, DetailView, CreateView
+from django.contrib import messages
+from django.http import JsonResponse
+from django.urls import reverse_lazy
+from ..forms import EmprestimoForm
+from ..models import Livro, Emprestimo, Usuario
+from ..circulacao import devolver_em_lote, emprestar_em_lote, renovar_todos
+from ..politicas import politica
+from ..estoque import motivo
+from ..registro import registrar_evento
+from .. import metricas
+from .base import AdminRequiredMixin
+
+logger = logging.getLogger(__name__)
+
+
+# Emprestimo views
+class EmprestimoListView(AdminRequiredMixin, ListView):
+    model = Emprestimo
+    template_name = 'biblioteca/emprestimo_list.html'
+    context_object_name = 'emprestimos'
+
+class EmprestimoDetailView(DetailView):
+    model = Emprestimo
+    template_name = 'biblioteca/emprestimo_detail.html'
+    context_object_name = 'emprestimo'
+
+class EmprestimoCreateView(AdminRequiredMixin, CreateView):
+    model = Emprestimo
+    form_class = EmprestimoForm
+    template_name = 'biblioteca/emprestimo_form.html'
+    success_url = reverse_lazy('biblioteca:emprestimo_list')
+    
+    def get_initial(self):
+        initial = super().get_initial()
+        # Se um livro foi especificado na URL, pré-seleciona ele
+        livro_id = self.request.GET.get('livro')
+        if livro_id:
+            try:
+                livro = Livro.objects.get(pk=livro_id)
+                initial['livro'] = livro
+            except Livro.DoesNotExist:
+                pass
+        return initial
+    
+    def form_valid(self, form):
+        try:
+            # Verificar se o livro está disponível
+            livro = form.instance.livro
+            if livro.quantidade_disponivel > 0:
+                # Salvar o empréstimo primeiro
+                emprestimo = form.save()
+                
+                # Recalcular quantidade disponível do livro
+                with motivo('emprestimo'):
+                    livro.recalcular_quantidade_disponivel()
+                
+                registrar_evento(
+                    logger, 'emprestimo.criado',
+                    usuario=self.request.user.username, emprestimo=emprestimo.pk, livro=livro.pk,
+                )
+                messages.success(self.request, f'Empréstimo criado com sucesso! O livro "{livro.titulo}" foi emprestado para {form.instance.usuario.get_full_name() or form.instance.usuario.username}.')
+                return redirect('biblioteca:emprestimo_list')
+            else:
+                metricas.conflitos_disponibilidade.inc(operacao='emprestimo')
+                form.add_error('livro', 'Este livro não está disponível para empréstimo.')
+                messages.error(self.request, 'Livro não disponível para empréstimo.')
+                return self.form_invalid(form)
+        except Exception as e:
+            logger.exception('Erro ao criar empréstimo', extra={'evento': 'emprestimo.criar_erro', 'usuario': self.request.user.username})
+            messages.error(self.request, f'Erro ao criar empréstimo: {str(e)}')
+            return self.form_invalid(form)
+    
+    def form_invalid(self, form):
+        messages.error(self.request, 'Por favor, corrija os erros abaixo.')
+        return super().form_invalid(form)
+
+# Function-based views
+def devolver_livro(request, pk):
+    """
+    View para devolver um livro emprestado.
+    Apenas admins ou o próprio usuário podem devolver o livro.
+    """
+    if request.method != 'POST':
+        return JsonResponse({
+            'success': False, 
+            'error': 'Método não permitido. Use POST.'
+        }, status=405)
+    
+    try:
+        emprestimo = get_object_or_404(Emprestimo, pk=pk)
+        
+        # Verificar se o usuário tem permissão (admin ou próprio usuário)
+        if not (request.user.is_authenticated and 
+                (request.user.is_admin() or request.user == emprestimo.usuario)):
+            return JsonResponse({
+                'success': False, 
+                'error': 'Você não tem permissão para devolver este livro.'
+            }, status=403)
+        
+        # Verificar se o empréstimo já foi devolvido
+        if emprestimo.status == 'devolvido':
+            return JsonResponse({
+                'success': False, 
+                'error': 'Este empréstimo já foi devolvido.'
+            }, status=400)
+        
+        # Verificar se o empréstimo está ativo
+        if emprestimo.status != 'ativo':
+            return JsonResponse({
+                'success': False, 
+                'error': f'Não é possível devolver um empréstimo com status "{emprestimo.get_status_display()}".'
+            }, status=400)
+        
+        # Tentar devolver
+        inicio = time.perf_counter()
+        if emprestimo.devolver():
+            # Log da devolução
+            registrar_evento(
+                logger, 'emprestimo.devolvido',
+                usuario=request.user.username,
+                emprestimo=emprestimo.pk,
+                livro=emprestimo.livro_id,
+                latencia_ms=round((time.perf_counter() - inicio) * 1000, 2),
+            )
+            
+            messages.success(request, 'Livro devolvido com sucesso!')
+            
+            return JsonResponse({
+                'success': True,
+                'message': 'Livro devolvido com sucesso!',
+                'data_devolucao': emprestimo.data_devolucao.strftime("%d/%m/%Y %H:%M") if emprestimo.data_devolucao else None
+            })
+        else:
+            return JsonResponse({
+                'success': False, 
+                'error': 'Erro interno ao devolver o livro. Tente novamente.'
+            }, status=500)
+        
+    except Emprestimo.DoesNotExist:
+        return JsonResponse({
+            'success': False, 
+            'error': 'Empréstimo não encontrado.'
+        }, status=404)
+    except Exception:
+        logger.exception(
+            'Erro ao devolver livro %s', pk,
+            extra={'evento': 'emprestimo.devolver_erro', 'usuario': request.user.username, 'emprestimo': pk},
+        )
+        return JsonResponse({
+            'success': False, 
+            'error': 'Erro interno do servidor. Tente novamente.'
+        }, status=500)
+
+def renovar_emprestimo(request, pk):
+    """
+    View para renovar um empréstimo.
+    Apenas empréstimos ativos, não atrasados e com menos de 2 renovações podem ser renovados.
+    """
+    if request.method != 'POST':
+        return JsonResponse({
+            'success': False, 
+            'error': 'Método não permitido. Use POST.'
+        }, status=405)
+    
+    try:
+        emprestimo = get_object_or_404(Emprestimo, pk=pk)
+        
+        # Verificar se o usuário tem permissão (admin ou próprio usuário)
+        if not (request.user.is_authenticated and 
+                (request.user.is_admin() or request.user == emprestimo.usuario)):
+            return JsonResponse({
+                'success': False, 
+                'error': 'Você não tem permissão para renovar este empréstimo.'
+            }, status=403)
+        
+        # Validações antes de renovar
+        if emprestimo.status != 'ativo':
+            return JsonResponse({
+                'success': False, 
+                'error': f'Não é possível renovar um empréstimo com status "{emprestimo.get_status_display()}".'
+            })
+        
+        if emprestimo.is_atrasado():
+            return JsonResponse({
+                'success': False, 
+                'error': 'Não é possível renovar um empréstimo em atraso.'
+            })
+        
+        if emprestimo.renovacoes >= politica.max_renovacoes:
+            return JsonResponse({
+                'success': False, 
+                'error': f'Este empréstimo já atingiu o limite máximo de {politica.max_renovacoes} renovações.'
+            })
+        
+        # Tentar renovar
+        inicio = time.perf_counter()
+        if emprestimo.renovar():
+            # Log da renovação
+            registrar_evento(
+                logger, 'emprestimo.renovado',
+                usuario=request.user.username,
+                emprestimo=emprestimo.pk,
+                livro=emprestimo.livro_id,
+                renovacoes=emprestimo.renovacoes,
+                latencia_ms=round((time.perf_counter() - inicio) * 1000, 2),
+            )
+            
+            messages.success(
+                request, 
+                f'Empréstimo renovado com sucesso! Nova data de devolução: {emprestimo.data_devolucao_prevista.strftime("%d/%m/%Y")}'
+            )
+            
+            return JsonResponse({
+                'success': True,
+                'message': 'Empréstimo renovado com sucesso!',
+                'nova_data_devolucao': emprestimo.data_devolucao_prevista.strftime("%d/%m/%Y"),
+                'renovacoes_restantes': emprestimo.get_renovacoes_restantes()
+            })
+        else:
+            return JsonResponse({
+                'success': False, 
+                'error': 'Erro interno ao renovar o empréstimo.'
+            })
+            
+    except Emprestimo.DoesNotExist:
+        return JsonResponse({
+            'success': False, 
+            'error': 'Empréstimo não encontrado.'
+        }, status=404)
+    except Exception:
+        logger.exception(
+            'Erro ao renovar empréstimo %s', pk,
+            extra={'evento': 'emprestimo.renovar_erro', 'usuario': request.user.username, 'emprestimo': pk},
+        )
+        return JsonResponse({
+            'success': False, 
+            'error': 'Erro interno do servidor. Tente novamente.'
+        }, status=500)
+
+def renovar_todos_emprestimos(request):
+    """
+    View para renovar todos os empréstimos elegíveis do usuário de uma vez.
+    Admins podem informar outro usuário no campo "usuario".
+    """
+    if request.method != 'POST':
+        return JsonResponse({
+            'success': False, 
+            'error': 'Método não permitido. Use POST.'
+        }, status=405)
+    
+    if not request.user.is_authenticated:
+        return JsonResponse({
+            'success': False, 
+            'error': 'Você não tem permissão para renovar estes empréstimos.'
+        }, status=403)
+    
+    usuario = request.user
+    usuario_id = request.POST.get('usuario')
+    if usuario_id and not usuario_id.isdigit():
+        return JsonResponse({
+            'success': False,
+            'error': 'Usuário inválido.'
+        }, status=400)
+    if usuario_id and str(usuario_id) != str(request.user.pk):
+        if not request.user.is_admin():
+            return JsonResponse({
+                'success': False, 
+                'error': 'Você não tem permissão para renovar estes empréstimos.'
+            }, status=403)
+        usuario = get_object_or_404(Usuario, pk=usuario_id)
+    
+    resultado = renovar_todos(usuario)
+    nova_data = resultado['nova_data_devolucao'].strftime("%d/%m/%Y")
+    
+    if resultado['renovados']:
+        messages.success(
+            request, 
+            f'{len(resultado["renovados"])} empréstimo(s) renovado(s)! Nova data de devolução: {nova_data}'
+        )
+    
+    return JsonResponse({
+        'success': True,
+        'renovados': resultado['renovados'],
+        'nova_data_devolucao': nova_data,
+        'ignorados': resultado['ignorados'],
+    })
+
+class CirculacaoLoteView(AdminRequiredMixin, View):
+    """
+    Balcão de circulação em lote (JSON, apenas admins).
+
+    POST {"devolucoes": [<emprestimo_id>, ...],
+          "emprestimos": [[<usuario_id>, <livro_id>], ...]}
+
+    O corpo inteiro é validado antes e as duas listas são aplicadas em uma
+    única transação; a resposta traz um resultado por item, na ordem enviada.
+    """
+    max_itens = 1000
+
+    @staticmethod
+    def _lista(corpo, chave):
+        itens = corpo.get(chave, [])
+        if not isinstance(itens, list):
+            raise TypeError(f'"{chave}" deve ser uma lista')
+        return itens
+
+    @staticmethod
+    def _par(item):
+        if isinstance(item, dict):
+            usuario_id, livro_id = item['usuario'], item['livro']
+        elif isinstance(item, list) and len(item) == 2:
+            usuario_id, livro_id = item
+        else:
+            raise ValueError(f'par inválido: {item!r}')
+        return int(usuario_id), int(livro_id)
+
+    def post(self, request):
+        # Tudo é validado antes de aplicar qualquer item: um erro no corpo
+        # não pode deixar as devoluções feitas e os empréstimos não
+        try:
+            corpo = json.loads(request.body or b'{}')
+            devolucoes = [int(pk) for pk in self._lista(corpo, 'devolucoes')]
+            emprestimos = [self._par(item) for item in self._lista(corpo, 'emprestimos')]
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            return JsonResponse({'success': False, 'error': f'Corpo inválido: {e}'}, status=400)
+
+        if len(devolucoes) + len(emprestimos) > self.max_itens:
+            return JsonResponse({
+                'success': False,
+                'error': f'No máximo {self.max_itens} itens por requisição.'
+            }, status=400)
+
+        with transaction.atomic():
+            resultado = {
+                'success': True,
+                'devolucoes': devolver_em_lote(devolucoes) if devolucoes else [],
+                'emprestimos': emprestar_em_lote(emprestimos) if emprestimos else [],
+            }
+        return JsonResponse(resultado)
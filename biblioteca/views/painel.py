@@ -0,0 +1,90 @@
+"""Página inicial, dashboards e ferramentas do administrador."""
+from django.conf import settings
+from django.shortcuts import redirect
+from django.views.generic import TemplateView
+from django.contrib import messages
+from django.http import HttpResponse
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.utils.cache import patch_cache_control
+from ..models import Livro, Emprestimo, Reserva, Usuario
+from .. import metricas
+from ..consultas_lentas import buffer_consultas
+from ..popularidade import mais_populares
+from .base import AdminRequiredMixin
+
+
+# Basic views
+class HomeView(AdminRequiredMixin, TemplateView):
+    template_name = 'biblioteca/home.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['total_livros'] = Livro.objects.count()
+        context['total_usuarios'] = Usuario.objects.count()
+        context['emprestimos_ativos'] = Emprestimo.objects.filter(status='ativa').count()
+        context['reservas_ativas'] = Reserva.objects.filter(status='ativa').count()
+        return context
+
+# Admin views
+class AdminDashboardView(AdminRequiredMixin, TemplateView):
+    template_name = 'biblioteca/admin_dashboard.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['total_livros'] = Livro.objects.count()
+        context['total_usuarios'] = Usuario.objects.count()
+        context['emprestimos_ativos'] = Emprestimo.objects.filter(status='ativa').count()
+        context['reservas_ativas'] = Reserva.objects.filter(status='ativa').count()
+        # Optionally add more context for alerts and recent activities
+        context['emprestimos_vencidos'] = Emprestimo.objects.filter(status='vencido')
+        context['reservas_expirando'] = Reserva.objects.filter(status='expirada')
+        context['livros_sem_estoque'] = Livro.objects.filter(quantidade_disponivel=0)
+        context['atividades_recentes'] = []  # Add your logic for recent activities here
+        return context
+
+class ConsultasLentasView(AdminRequiredMixin, TemplateView):
+    """Últimas consultas lentas deste processo, com o plano de execução."""
+    template_name = 'biblioteca/consultas_lentas.html'
+
+    def post(self, request, *args, **kwargs):
+        buffer_consultas.limpar()
+        messages.success(request, 'Registro de consultas lentas limpo.')
+        return redirect('biblioteca:consultas_lentas')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['ativo'] = settings.CONSULTAS_LENTAS_ATIVO
+        context['limite_ms'] = settings.CONSULTAS_LENTAS_LIMITE_MS
+        context['consultas'] = buffer_consultas.resumo()
+        return context
+
+class DashboardView(LoginRequiredMixin, TemplateView):
+    template_name = 'biblioteca/dashboard.html'
+    usar_replica = True
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Estatísticas principais
+        context['stats'] = {
+            'total_livros': Livro.objects.count(),
+            'total_usuarios': Usuario.objects.filter(is_active=True).count(),
+            'emprestimos_ativos': Emprestimo.objects.filter(status='ativa').count(),
+            'emprestimos_atrasados': Emprestimo.objects.filter(status='vencido').count(),
+        }
+        # Livros mais populares: empréstimos recentes pesam mais
+        context['livros_populares'] = mais_populares(10)
+        return context
+
+def exportar_metricas(request):
+    """
+    Métricas no formato de exposição do Prometheus. Liberado para os IPs de
+    METRICAS_IPS_PERMITIDOS (o coletor) e para administradores logados.
+    """
+    permitido = request.META.get('REMOTE_ADDR') in settings.METRICAS_IPS_PERMITIDOS or (
+        request.user.is_authenticated and request.user.is_admin()
+    )
+    if not permitido:
+        return HttpResponse('Acesso negado.', status=403, content_type='text/plain; charset=utf-8')
+    response = HttpResponse(metricas.exposicao(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    patch_cache_control(response, no_store=True)
+    return response
@@ -0,0 +1,125 @@
+"""Relatórios de circulação."""
+import base64
+import binascii
+import datetime
+
+from django.views import View
+from django.views.generic import TemplateView
+from django.http import JsonResponse
+from django.db.models import Q
+from django.utils import timezone
+from ..models import Emprestimo
+from ..rollups import resumo_periodo
+from .base import AdminRequiredMixin
+
+
+# Dashboard views
+class RelatoriosView(AdminRequiredMixin, TemplateView):
+    template_name = 'biblioteca/relatorios.html'
+    usar_replica = True
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        data_inicio = _ler_data(self.request.GET.get('data_inicio'))
+        data_fim = _ler_data(self.request.GET.get('data_fim'))
+        tipo_relatorio = self.request.GET.get('tipo_relatorio')
+
+        # Estatísticas a partir dos totais diários (rollups), sem varrer os empréstimos
+        resumo = resumo_periodo(data_inicio, data_fim)
+
+        context['stats'] = {
+            'total_emprestimos': resumo['total_emprestimos'],
+            'livros_populares': len(resumo['livros_populares']),
+            'usuarios_ativos': resumo['usuarios_ativos'],
+            'taxa_devolucao': resumo['taxa_devolucao'],
+        }
+        # Só a primeira página do detalhamento; as demais vêm de RelatorioEmprestimosView
+        emprestimos, proximo_cursor = _pagina_emprestimos(data_inicio, data_fim)
+        context['emprestimos'] = emprestimos
+        context['proximo_cursor'] = proximo_cursor
+        context['livros_populares'] = resumo['livros_populares']
+        context['today'] = datetime.date.today()
+        return context
+
+class RelatorioEmprestimosView(AdminRequiredMixin, View):
+    """
+    Páginas seguintes do detalhamento de empréstimos do relatório (JSON),
+    navegadas por cursor em (data_emprestimo, id) para que o custo dependa
+    só do tamanho da página.
+    """
+    usar_replica = True
+
+    def get(self, request):
+        try:
+            limite = max(1, min(int(request.GET.get('limite', TAMANHO_PAGINA_RELATORIO)), 200))
+            emprestimos, proximo_cursor = _pagina_emprestimos(
+                _ler_data(request.GET.get('data_inicio')),
+                _ler_data(request.GET.get('data_fim')),
+                cursor=request.GET.get('cursor'),
+                limite=limite,
+            )
+        except ValueError:
+            return JsonResponse({'error': 'Parâmetros inválidos.'}, status=400)
+
+        for emprestimo in emprestimos:
+            for campo in ('data_emprestimo', 'data_devolucao_prevista', 'data_devolucao'):
+                if emprestimo[campo]:
+                    emprestimo[campo] = timezone.localtime(emprestimo[campo]).strftime('%d/%m/%Y')
+        return JsonResponse({'emprestimos': emprestimos, 'proximo_cursor': proximo_cursor})
+
+TAMANHO_PAGINA_RELATORIO = 50
+
+def _ler_data(valor):
+    try:
+        return datetime.date.fromisoformat(valor) if valor else None
+    except ValueError:
+        return None
+
+def _inicio_do_dia(data):
+    return timezone.make_aware(datetime.datetime.combine(data, datetime.time.min))
+
+def _pagina_emprestimos(data_inicio, data_fim, cursor=None, limite=TAMANHO_PAGINA_RELATORIO):
+    """
+    Retorna (linhas, próximo cursor) dos empréstimos do período, do mais
+    recente para o mais antigo, já com usuário, livro e autor (values).
+    O cursor é "<data_emprestimo ISO>|<id>" codificado em base64.
+    """
+    # Limites como instantes no fuso local, sobre a coluna crua: com
+    # __date o banco converteria cada linha e não usaria emprestimo_data_id_idx
+    emprestimos = Emprestimo.objects.all()
+    if data_inicio:
+        emprestimos = emprestimos.filter(data_emprestimo__gte=_inicio_do_dia(data_inicio))
+    if data_fim:
+        emprestimos = emprestimos.filter(
+            data_emprestimo__lt=_inicio_do_dia(data_fim + datetime.timedelta(days=1))
+        )
+
+    if cursor:
+        try:
+            data, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            data, pk = datetime.datetime.fromisoformat(data), int(pk)
+        except (ValueError, UnicodeDecodeError, binascii.Error):
+            raise ValueError('Cursor inválido.')
+        emprestimos = emprestimos.filter(
+            Q(data_emprestimo__lt=data) | Q(data_emprestimo=data, id__lt=pk)
+        )
+
+    linhas = list(
+        emprestimos
+        .order_by('-data_emprestimo', '-id')
+        .values(
+            'id', 'status', 'renovacoes',
+            'data_emprestimo', 'data_devolucao_prevista', 'data_devolucao',
+            'usuario__username', 'usuario__first_name', 'usuario__last_name',
+            'livro__titulo', 'livro__autor__nome',
+        )[:limite + 1]
+    )
+
+    proximo_cursor = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        ultima = linhas[-1]
+        proximo_cursor = base64.urlsafe_b64encode(
+            f"{ultima['data_emprestimo'].isoformat()}|{ultima['id']}".encode()
+        ).decode()
+    return linhas, proximo_cursor
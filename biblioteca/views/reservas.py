@@ -0,0 +1,380 @@
+"""Reservas, fila de espera e exportação das reservas."""
+import logging
+
+from django.core.cache import cache
+from django.db import router, transaction
+from django.shortcuts import render, redirect, get_object_or_404
+from django.views import View
+from django.views.generic import TemplateView, ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.contrib import messages
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import Q
+from django.urls import reverse_lazy
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from ..models import Livro, Reserva, FilaEspera, versao_cache_fila
+from ..utils import normalizar_nome
+from ..elegibilidade import Elegibilidade
+from ..politicas import politica
+from ..estoque import motivo
+from ..registro import registrar_evento
+from ..exportacao import CABECALHO_RESERVAS, ExportacaoIndisponivel, linha_reserva, pdf_reservas, planilha_reservas
+from .base import AdminRequiredMixin
+
+logger = logging.getLogger(__name__)
+
+
+# Reserva views
+class ReservaListView(AdminRequiredMixin, ListView):
+    model = Reserva
+    template_name = 'biblioteca/reserva_list.html'
+    usar_replica = True
+    context_object_name = 'reservas'
+    paginate_by = 20
+    
+    def get_queryset(self):
+        queryset = Reserva.objects.select_related('usuario', 'livro', 'livro__autor').all()
+        
+        # Search functionality
+        query = self.request.GET.get('q')
+        if query:
+            queryset = queryset.filter(
+                Q(usuario__username__icontains=query) |
+                Q(usuario__first_name__icontains=query) |
+                Q(usuario__last_name__icontains=query) |
+                Q(usuario__email__icontains=query) |
+                Q(livro__titulo__icontains=query) |
+                Q(livro__autor__nome_normalizado__contains=normalizar_nome(query)) |
+                Q(status__icontains=query)
+            )
+        
+        # Filter by status
+        status = self.request.GET.get('status')
+        if status:
+            queryset = queryset.filter(status=status)
+            
+        # Filter by user type
+        tipo_usuario = self.request.GET.get('tipo_usuario')
+        if tipo_usuario:
+            queryset = queryset.filter(usuario__tipo_usuario=tipo_usuario)
+            
+        # Filter by date
+        data_inicio = self.request.GET.get('data_inicio')
+        if data_inicio:
+            queryset = queryset.filter(data_reserva__date__gte=data_inicio)
+            
+        return queryset.order_by('-data_reserva')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        
+        # Add current time for expiration checking
+        context['now'] = timezone.now()
+        
+        # Add statistics
+        queryset = self.get_queryset()
+        context['total_reservas'] = queryset.count()
+        context['reservas_ativas'] = queryset.filter(status='ativa').count()
+        context['reservas_expiradas'] = queryset.filter(status='expirada').count()
+        context['reservas_canceladas'] = queryset.filter(status='cancelada').count()
+        
+        return context
+
+class MinhasReservasView(LoginRequiredMixin, ListView):
+    model = Reserva
+    template_name = 'biblioteca/minhas_reservas.html'
+    context_object_name = 'reservas'
+
+    def get_queryset(self):
+        # This is not used by the template, so we override get_context_data
+        return Reserva.objects.filter(usuario=self.request.user)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        user_reservas = Reserva.objects.filter(usuario=self.request.user)
+        context['reservas_ativas'] = user_reservas.filter(status='ativa')
+        context['reservas_historico'] = user_reservas.exclude(status='ativa')
+        context['reservas_expiradas'] = user_reservas.filter(status='expirada')
+        context['reservas_canceladas'] = user_reservas.filter(status='cancelada')
+        context['total_reservas'] = user_reservas.count()
+        return context
+
+class ReservarLivroView(LoginRequiredMixin, CreateView):
+    model = Reserva
+    template_name = 'biblioteca/reservar_livro.html'
+    fields = []
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['livro'] = get_object_or_404(Livro, pk=self.kwargs['livro_id'])
+        return context
+    
+    def post(self, request, *args, **kwargs):
+        livro = get_object_or_404(Livro, pk=self.kwargs['livro_id'])
+        
+        # Limites do usuário e disponibilidade do livro em uma consulta
+        elegibilidade = Elegibilidade.consultar(request.user, livro)
+        
+        # Verificar se o usuário pode fazer mais reservas
+        if elegibilidade.atingiu_limite_reservas:
+            messages.error(
+                request,
+                f'Você já possui o limite máximo de reservas ativas ({politica.max_reservas}).'
+            )
+            return render(request, self.template_name, {
+                'livro': livro,
+                'form': self.get_form()
+            })
+        
+        # Livro indisponível: entrar na fila de espera
+        if elegibilidade.quantidade_disponivel <= 0:
+            erro = elegibilidade.erro_fila()
+            if erro:
+                messages.error(request, erro)
+                return redirect('biblioteca:livro_detail', pk=livro.pk)
+            try:
+                entrada = FilaEspera.entrar(request.user, livro)
+            except ValidationError as e:
+                messages.error(request, str(e))
+                return redirect('biblioteca:livro_detail', pk=livro.pk)
+            messages.info(
+                request,
+                f'Este livro não está disponível no momento. Você está na posição '
+                f'{entrada.posicao_atual()} da fila de espera e receberá uma reserva '
+                f'assim que um exemplar for devolvido.'
+            )
+            return redirect('biblioteca:minhas_reservas')
+        
+        # Create the reservation instance manually
+        reserva = Reserva(
+            usuario=request.user,
+            livro=livro,
+            status='ativa'
+        )
+        
+        try:
+            # Validar com os fatos já consultados
+            erro = elegibilidade.erro_reserva()
+            if erro:
+                raise ValidationError(erro)
+            reserva.save()
+            
+            # Recalcular quantidade disponível do livro
+            with motivo('reserva'):
+                livro.recalcular_quantidade_disponivel()
+            
+            registrar_evento(
+                logger, 'reserva.criada',
+                usuario=request.user.username, reserva=reserva.pk, livro=livro.pk,
+            )
+            messages.success(request, 'Reserva realizada com sucesso!')
+            return redirect('biblioteca:minhas_reservas')
+        except ValidationError as e:
+            messages.error(request, str(e))
+            return render(request, self.template_name, {
+                'livro': livro,
+                'form': self.get_form()
+            })
+    
+    def get_success_url(self):
+        return reverse_lazy('biblioteca:minhas_reservas')
+
+class CancelarReservaView(LoginRequiredMixin, UpdateView):
+    model = Reserva
+    fields = []
+    http_method_names = ['post']  # Apenas aceita POST
+    
+    def post(self, request, *args, **kwargs):
+        try:
+            reserva = self.get_object()
+            
+            # Verificar permissões
+            if reserva.usuario != request.user and not request.user.is_admin():
+                messages.error(request, 'Você não tem permissão para cancelar esta reserva.')
+                return redirect('biblioteca:minhas_reservas')
+            
+            # Verificar se a reserva pode ser cancelada
+            if reserva.status != 'ativa':
+                messages.warning(request, f'Esta reserva não pode ser cancelada (status: {reserva.get_status_display()}).')
+                return redirect('biblioteca:minhas_reservas')
+            
+            with transaction.atomic():
+                # Cancelar a reserva
+                reserva.status = 'cancelada'
+                reserva.save()
+                
+                # Atualizar quantidade disponível do livro
+                livro = reserva.livro
+                with motivo('cancelamento'):
+                    livro.recalcular_quantidade_disponivel()
+                
+                # Passar o exemplar liberado para o próximo da fila de espera
+                FilaEspera.promover_proximo(livro)
+            
+            # Log da ação
+            registrar_evento(
+                logger, 'reserva.cancelada',
+                usuario=request.user.username, reserva=reserva.pk, livro=reserva.livro_id,
+            )
+            messages.success(request, f'Reserva do livro "{reserva.livro.titulo}" cancelada com sucesso!')
+            
+            # Redirecionar baseado no usuário
+            if request.user.is_admin():
+                return redirect('biblioteca:admin_dashboard')
+            else:
+                return redirect('biblioteca:minhas_reservas')
+                
+        except Reserva.DoesNotExist:
+            messages.error(request, 'Reserva não encontrada.')
+            return redirect('biblioteca:minhas_reservas')
+        except Exception as e:
+            messages.error(request, f'Erro ao cancelar reserva: {str(e)}')
+            return redirect('biblioteca:minhas_reservas')
+
+class PosicaoFilaView(LoginRequiredMixin, View):
+    """
+    Posição do usuário na fila de espera de um livro (JSON). A resposta fica
+    em cache até a fila do livro mudar (entrada, promoção ou cancelamento).
+    """
+    cache_segundos = 30
+
+    def get(self, request, livro_id):
+        chave = f'fila:{livro_id}:v{versao_cache_fila(livro_id)}:usuario:{request.user.pk}'
+        dados = cache.get(chave)
+        if dados is None:
+            entrada = (
+                FilaEspera.objects
+                .filter(livro_id=livro_id, usuario=request.user, status='aguardando')
+                .first()
+            )
+            dados = {
+                'na_fila': entrada is not None,
+                'posicao': entrada.posicao_atual() if entrada else None,
+            }
+            cache.set(chave, dados, self.cache_segundos)
+
+        response = JsonResponse(dados)
+        patch_cache_control(response, private=True, max_age=self.cache_segundos)
+        return response
+
+class ReservaDetailView(DetailView):
+    model = Reserva
+    template_name = 'biblioteca/reserva_detail.html'
+    context_object_name = 'reserva'
+
+class ExpirarReservasView(AdminRequiredMixin, TemplateView):
+    template_name = 'biblioteca/expirar_reservas.html'
+
+# View para deletar reserva (admin only)
+class DeletarReservaView(AdminRequiredMixin, DeleteView):
+    model = Reserva
+    template_name = 'biblioteca/reserva_confirm_delete.html'
+    success_url = reverse_lazy('biblioteca:reserva_list')
+    
+    def delete(self, request, *args, **kwargs):
+        reserva = self.get_object()
+        
+        # Se a reserva estiver ativa, liberar o livro
+        if reserva.status == 'ativa':
+            livro = reserva.livro
+            if livro.quantidade_disponivel < livro.quantidade:
+                livro.quantidade_disponivel += 1
+                with motivo('cancelamento'):
+                    livro.save()
+        
+        messages.success(request, f'Reserva deletada com sucesso!')
+        return super().delete(request, *args, **kwargs)
+
+# View para exportar reservas
+class ExportarReservasView(AdminRequiredMixin, TemplateView):
+    template_name = 'biblioteca/exportar_reservas.html'
+    usar_replica = True
+    
+    def get(self, request, *args, **kwargs):
+        format_type = request.GET.get('format', 'csv')
+        
+        # Aplicar os mesmos filtros da listagem
+        queryset = Reserva.objects.select_related('usuario', 'livro', 'livro__autor').all()
+        
+        query = request.GET.get('q')
+        if query:
+            queryset = queryset.filter(
+                Q(usuario__username__icontains=query) |
+                Q(usuario__first_name__icontains=query) |
+                Q(usuario__last_name__icontains=query) |
+                Q(usuario__email__icontains=query) |
+                Q(livro__titulo__icontains=query) |
+                Q(livro__autor__nome_normalizado__contains=normalizar_nome(query)) |
+                Q(status__icontains=query)
+            )
+        
+        status = request.GET.get('status')
+        if status:
+            queryset = queryset.filter(status=status)
+            
+        tipo_usuario = request.GET.get('tipo_usuario')
+        if tipo_usuario:
+            queryset = queryset.filter(usuario__tipo_usuario=tipo_usuario)
+            
+        data_inicio = request.GET.get('data_inicio')
+        if data_inicio:
+            queryset = queryset.filter(data_reserva__date__gte=data_inicio)
+        
+        if format_type == 'csv':
+            return self.export_csv(queryset)
+        elif format_type == 'excel':
+            return self.export_excel(queryset)
+        elif format_type == 'pdf':
+            return self.export_pdf(queryset)
+        else:
+            return self.export_csv(queryset)
+    
+    def export_csv(self, queryset):
+        import csv
+        import io
+        
+        # A resposta é consumida depois que a view retorna, quando o
+        # ReplicaMiddleware já desligou a réplica; fixar o banco agora
+        queryset = queryset.using(router.db_for_read(Reserva))
+        
+        def linhas(linhas_por_bloco=500):
+            # Enviar blocos de linhas: cada parte do stream é comprimida e
+            # enviada separadamente, e partes de uma linha só comprimem mal
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(CABECALHO_RESERVAS)
+            for numero, reserva in enumerate(queryset.iterator(chunk_size=2000), 1):
+                writer.writerow(linha_reserva(reserva))
+                if numero % linhas_por_bloco == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        
+        response = StreamingHttpResponse(linhas(), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="reservas.csv"'
+        return response
+    
+    def export_excel(self, queryset):
+        response = HttpResponse(
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        response['Content-Disposition'] = 'attachment; filename="reservas.xlsx"'
+        try:
+            planilha_reservas(queryset, response)
+        except ExportacaoIndisponivel as e:
+            messages.error(self.request, str(e))
+            return redirect('biblioteca:reserva_list')
+        return response
+
+    def export_pdf(self, queryset):
+        try:
+            pdf = pdf_reservas(queryset)
+        except ExportacaoIndisponivel as e:
+            messages.error(self.request, str(e))
+            return redirect('biblioteca:reserva_list')
+        response = HttpResponse(pdf, content_type='application/pdf')
+        response['Content-Disposition'] = 'attachment; filename="reservas.pdf"'
+        return response
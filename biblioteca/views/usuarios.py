@@ -0,0 +1,93 @@
+"""Administração de usuários."""
+import datetime
+
+from django.views.generic import ListView, DetailView, UpdateView, DeleteView
+from django.contrib import messages
+from django.db.models import Q
+from django.urls import reverse_lazy
+from ..models import Emprestimo, Reserva, Usuario
+from .base import AdminRequiredMixin
+
+
+class UsuarioListView(AdminRequiredMixin, ListView):
+    model = Usuario
+    template_name = 'biblioteca/usuario_list.html'
+    usar_replica = True
+    context_object_name = 'usuarios'
+    paginate_by = 12
+
+    def get_queryset(self):
+        queryset = Usuario.objects.all()
+        search = self.request.GET.get('search')
+        tipo_usuario = self.request.GET.get('tipo_usuario')
+        status = self.request.GET.get('status')
+        ordenar = self.request.GET.get('ordenar')
+
+        if search:
+            queryset = queryset.filter(
+                Q(username__icontains=search) |
+                Q(email__icontains=search) |
+                Q(first_name__icontains=search) |
+                Q(last_name__icontains=search)
+            )
+        if tipo_usuario:
+            queryset = queryset.filter(tipo_usuario=tipo_usuario)
+        if status:
+            if status == 'ativo':
+                queryset = queryset.filter(is_active=True)
+            elif status == 'inativo':
+                queryset = queryset.filter(is_active=False)
+        if ordenar:
+            if ordenar == 'nome':
+                queryset = queryset.order_by('first_name', 'last_name')
+            elif ordenar == 'data_cadastro':
+                queryset = queryset.order_by('-date_joined')
+            elif ordenar == 'ultimo_acesso':
+                queryset = queryset.order_by('-last_login')
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        usuarios = context['usuarios']
+
+        # Estatísticas
+        now = datetime.datetime.now()
+        context['total_usuarios'] = Usuario.objects.count()
+        context['usuarios_ativos'] = Usuario.objects.filter(is_active=True).count()
+        context['usuarios_admin'] = Usuario.objects.filter(tipo_usuario='admin').count()
+        context['novos_usuarios_mes'] = Usuario.objects.filter(
+            date_joined__month=now.month,
+            date_joined__year=now.year
+        ).count()
+
+        # Estatísticas individuais
+        for usuario in usuarios:
+            usuario.emprestimos_count = Emprestimo.objects.filter(usuario=usuario).count()
+            usuario.reservas_count = Reserva.objects.filter(usuario=usuario).count()
+            usuario.pendencias_count = Emprestimo.objects.filter(usuario=usuario, status='vencido').count()
+
+        return context
+
+class UsuarioDetailView(AdminRequiredMixin, DetailView):
+    model = Usuario
+    template_name = 'biblioteca/usuario_detail.html'
+    context_object_name = 'usuario'
+
+class UsuarioUpdateView(AdminRequiredMixin, UpdateView):
+    model = Usuario
+    template_name = 'biblioteca/usuario_form.html'
+    fields = ['first_name', 'last_name', 'email', 'tipo_usuario', 'is_active']
+    success_url = reverse_lazy('biblioteca:usuario_list')
+    
+    def form_valid(self, form):
+        messages.success(self.request, 'Usuário atualizado com sucesso!')
+        return super().form_valid(form)
+
+class UsuarioDeleteView(AdminRequiredMixin, DeleteView):
+    model = Usuario
+    template_name = 'biblioteca/usuario_confirm_delete.html'
+    success_url = reverse_lazy('biblioteca:usuario_list')
+    
+    def delete(self, request, *args, **kwargs):
+        messages.success(request, 'Usuário excluído com sucesso!')
+        return super().delete(request, *args, **kwargs)
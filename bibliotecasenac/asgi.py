@@ -5,6 +5,28 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Perfil de implantação ASGI
+--------------------------
+Os endpoints de polling (``livros_disponiveis`` e ``verificar_disponibilidade``)
+e o stream SSE têm versões assíncronas, ativadas automaticamente quando o
+projeto é carregado por este módulo (DJANGO_VIEWS_ASYNC=1). Todos os
+middlewares da pilha aceitam async, então essas requisições não passam
+inteiras por uma thread. Mas o ORM assíncrono do Django 4.2 ainda executa
+cada consulta com sync_to_async, na thread da requisição
+(ThreadSensitiveContext): a thread só fica livre enquanto a view espera
+entre uma consulta e outra (no stream SSE, a maior parte do tempo).
+Acrescentar um middleware só síncrono volta a prender uma thread por
+requisição. Para rodar no Render:
+
+    gunicorn bibliotecasenac.asgi:application -k uvicorn.workers.UvicornWorker
+
+ou, sem gunicorn:
+
+    uvicorn bibliotecasenac.asgi:application --workers 2
+
+As demais views continuam síncronas e são executadas pelo Django em threads.
+Para comparar com o perfil WSGI use ``python manage.py benchmark_disponibilidade``.
 """
 
 import os
@@ -12,5 +34,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bibliotecasenac.settings')
+os.environ.setdefault('DJANGO_VIEWS_ASYNC', '1')
 
 application = get_asgi_application()
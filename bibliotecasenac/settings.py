@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,10 +44,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'biblioteca.middleware.ArquivosEstaticosMiddleware',
+    'biblioteca.middleware.MetricasMiddleware',
+    'biblioteca.middleware.ConsultasLentasMiddleware',
+    'biblioteca.middleware.CompressaoMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'biblioteca.middleware.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -63,6 +69,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'biblioteca.context_processors.politica',
             ],
         },
     },
@@ -70,6 +77,17 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'bibliotecasenac.wsgi.application'
 
+# Ative (DJANGO_VIEWS_ASYNC=1) quando o projeto for servido por ASGI (uvicorn),
+# para que os endpoints de polling usem as views assíncronas.
+VIEWS_ASYNC = os.environ.get('DJANGO_VIEWS_ASYNC') == '1'
+
+# Stream SSE de disponibilidade (segundos). Sob WSGI a conexão é encerrada
+# antes para liberar a thread; o navegador reconecta após SSE_RECONEXAO_MS.
+SSE_INTERVALO = 5
+SSE_DURACAO_MAXIMA = 60
+SSE_DURACAO_MAXIMA_ASYNC = 600
+SSE_RECONEXAO_MS = 3000
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -78,10 +96,125 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    },
+    # Réplica de leitura usada pelos relatórios e listagens. Sem a variável
+    # DJANGO_DB_REPLICA ela aponta para o mesmo arquivo do banco principal;
+    # nos testes ela espelha o banco de teste do principal, para que as
+    # views roteadas para a réplica leiam os dados criados pelo teste.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DJANGO_DB_REPLICA', BASE_DIR / 'db.sqlite3'),
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['biblioteca.routers.ReplicaRouter']
+
+# Tempo (em segundos) que as leituras de um cliente ficam fixadas no banco
+# principal depois de uma escrita.
+REPLICA_FIXACAO_SEGUNDOS = 10
+
+
+# Cache
+# Com DJANGO_REDIS_URL o cache é compartilhado entre os workers; sem ela cada
+# processo tem o seu cache em memória.
+
+if os.environ.get('DJANGO_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['DJANGO_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
+
+# Sessões: "cached_db" (padrão) lê a sessão do cache e só consulta a tabela em
+# cache miss; "signed_cookies" guarda a sessão assinada no próprio cookie e
+# dispensa a tabela; "db" é o comportamento original do Django.
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[os.environ.get('DJANGO_SESSION_ENGINE', 'cached_db')]
+
+# Tempo (em segundos) que o Usuario autenticado fica em cache. Salvar o
+# usuário invalida o cache na hora, mas só no cache onde a invalidação roda:
+# sem o Redis cada worker tem o seu cache em memória e os outros continuariam
+# com a cópia antiga (senha, is_active) até ela expirar, então o tempo fica
+# em poucos segundos.
+USUARIO_CACHE_SEGUNDOS = 300 if os.environ.get('DJANGO_REDIS_URL') else 5
+
+
+# Logs
+# Registros em JSON enfileirados e gravados por uma thread à parte
+# (biblioteca.registro). DJANGO_LOG_LEVEL controla o nível dos loggers do
+# app; com DJANGO_LOG_FILE os registros também vão para esse arquivo, que é
+# compartilhado pelos workers do gunicorn e rotacionado pelo logrotate.
+LOG_LEVEL = os.environ.get('DJANGO_LOG_LEVEL', 'INFO').upper()
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'fila': {
+            '()': 'biblioteca.registro.ManipuladorFila',
+            'arquivo': os.environ.get('DJANGO_LOG_FILE') or None,
+        },
+    },
+    'root': {
+        'handlers': ['fila'],
+        'level': 'WARNING',
+    },
+    'loggers': {
+        'biblioteca': {
+            'handlers': ['fila'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        'django': {
+            'handlers': ['fila'],
+            'level': os.environ.get('DJANGO_LOG_LEVEL_DJANGO', 'WARNING').upper(),
+            'propagate': False,
+        },
+    },
 }
 
 
+# Métricas (biblioteca.metricas), expostas em /metrics no formato do
+# Prometheus. Com vários workers do gunicorn, DJANGO_METRICAS_DIR aponta para
+# um diretório local em que cada processo grava os seus valores; o endpoint
+# soma todos. O acesso é liberado para administradores logados e para os IPs
+# de METRICAS_IPS_PERMITIDOS (o coletor).
+METRICAS_DIR = os.environ.get('DJANGO_METRICAS_DIR') or None
+METRICAS_IPS_PERMITIDOS = [
+    ip.strip() for ip in os.environ.get('DJANGO_METRICAS_IPS', '127.0.0.1,::1').split(',') if ip.strip()
+]
+
+
+# Log de consultas lentas (biblioteca.consultas_lentas): consultas acima do
+# limite vão para o log e para a página "Consultas lentas" da administração,
+# com o EXPLAIN capturado uma vez por consulta normalizada.
+CONSULTAS_LENTAS_ATIVO = os.environ.get('DJANGO_CONSULTAS_LENTAS') == '1'
+CONSULTAS_LENTAS_LIMITE_MS = float(os.environ.get('DJANGO_CONSULTAS_LENTAS_MS', 100))
+CONSULTAS_LENTAS_MAXIMO = 200
+
+
+# Popularidade dos livros (biblioteca.popularidade): cada empréstimo perde
+# metade do peso a cada POPULARIDADE_MEIA_VIDA_DIAS. Rode
+# ``manage.py decair_popularidade`` uma vez por noite.
+POPULARIDADE_MEIA_VIDA_DIAS = float(os.environ.get('DJANGO_POPULARIDADE_MEIA_VIDA_DIAS', 30))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -122,6 +255,17 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# collectstatic grava nomes com hash do conteúdo e cópias .gz/.br, servidas
+# pelo ArquivosEstaticosMiddleware com cache longo
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'biblioteca.armazenamento.ArmazenamentoEstatico',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -130,6 +274,16 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom User Model
 AUTH_USER_MODEL = 'biblioteca.Usuario'
 
+# Igual ao ModelBackend, mas carrega o usuário da sessão a partir do cache
+# O ModelBackend continua na lista para as sessões abertas antes do backend
+# com cache: a sessão guarda o caminho do backend que autenticou, e um backend
+# fora da lista desloga o usuário. Pode sair depois de SESSION_COOKIE_AGE;
+# até lá uma senha errada é conferida pelos dois backends.
+AUTHENTICATION_BACKENDS = [
+    'biblioteca.autenticacao.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 # Login/Logout redirects
 LOGIN_REDIRECT_URL = 'biblioteca:home'
 LOGOUT_REDIRECT_URL = 'biblioteca:home'
@@ -0,0 +1,74 @@
+"""
+Configuração do gunicorn para o deploy (render.yaml).
+
+A aplicação é carregada e aquecida uma vez no processo mestre (preload_app +
+biblioteca.aquecimento) e os workers nascem por fork já prontos, em vez de
+cada um pagar imports, URLconf e templates na primeira requisição.
+
+Variáveis de ambiente:
+    PORT                  porta (padrão 8000)
+    WEB_CONCURRENCY       número de workers (padrão CPUs + 1, até 8)
+    GUNICORN_THREADS      threads por worker (padrão 4)
+    GUNICORN_MAX_REQUESTS reciclagem de workers (padrão 1000, 0 desliga)
+"""
+import multiprocessing
+import os
+
+
+wsgi_app = 'bibliotecasenac.wsgi:application'
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+preload_app = True
+
+# Com threads em cada worker, um processo por CPU (mais um) já ocupa a
+# máquina; mais processos só disputam a CPU quando são reciclados juntos
+workers = int(os.environ.get('WEB_CONCURRENCY') or min(multiprocessing.cpu_count() + 1, 8))
+# Threads seguram as conexões SSE e as requisições que esperam o banco sem
+# ocupar um worker inteiro
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Recicla os workers de tempos em tempos; o jitter evita que todos reiniciem
+# juntos. Como o mestre já está aquecido, um worker novo nasce pronto.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max(max_requests // 10, 0)
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = None
+errorlog = '-'
+loglevel = os.environ.get('DJANGO_LOG_LEVEL', 'info').lower()
+
+
+def on_starting(server):
+    from biblioteca.metricas import limpar_diretorio
+
+    # Arquivos de métricas de uma execução anterior não podem somar nesta
+    limpar_diretorio()
+
+
+def when_ready(server):
+    from django.db import connections
+
+    from biblioteca.aquecimento import aquecer
+
+    aquecer()
+    # Conexões abertas no mestre seriam compartilhadas pelos workers
+    connections.close_all()
+
+
+def child_exit(server, worker):
+    # Leva os contadores do worker que saiu (reciclagem, timeout) para o
+    # arquivo consolidado em vez de deixar um arquivo por PID para sempre
+    if os.environ.get('DJANGO_METRICAS_DIR'):
+        from biblioteca.metricas import consolidar_processo
+
+        consolidar_processo(worker.pid)
+
+
+def post_fork(server, worker):
+    from biblioteca.aquecimento import conectar
+
+    conectar()